@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+So sánh encoder SentenceTransformer (PyTorch) với bản ONNX int8 chạy bằng onnxruntime:
+độ trễ encode một câu hỏi (p50/p95), tốc độ encode document theo lô, độ tương đồng cosine
+giữa vector của hai encoder và mức trùng khớp top-k khi tìm kiếm trên cùng tập document.
+
+Tạo model ONNX trước rồi chạy sau khi đã sync dữ liệu:
+    python -m src.nlp_model.export_onnx
+    python benchmarks/encoder_benchmark.py --documents 1000 --k 10
+"""
+
+import sys
+import os
+import argparse
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chromadb.utils import embedding_functions
+from src.config.config import Config
+from src.nlp_model.vector_store import get_collection, get_onnx_model_dir
+from src.nlp_model.onnx_encoder import OnnxEmbeddingFunction, ONNX_MODEL_FILE, QUANTIZED_MODEL_FILE
+from benchmarks.quantization_recall import DEFAULT_QUERIES, recall_at_k, mean
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def query_latencies(encoder, queries, warmup=3):
+    """Thời gian (ms) encode từng câu hỏi một, giống luồng xử lý một request"""
+    for query in queries[:warmup]:
+        encoder([query])
+    latencies = []
+    for query in queries:
+        started_at = time.perf_counter()
+        encoder([query])
+        latencies.append((time.perf_counter() - started_at) * 1000)
+    return latencies
+
+
+def encode_documents(encoder, documents, batch_size):
+    """Encode document theo lô, trả về (ma trận float32, số document/giây)"""
+    started_at = time.perf_counter()
+    embeddings = []
+    for start in range(0, len(documents), batch_size):
+        embeddings.extend(encoder(documents[start:start + batch_size]))
+    elapsed = time.perf_counter() - started_at
+    return np.asarray(embeddings, dtype=np.float32), len(documents) / elapsed if elapsed > 0 else 0.0
+
+
+def normalize(matrix):
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def top_k_ids(query_matrix, document_matrix, k):
+    scores = normalize(query_matrix) @ normalize(document_matrix).T
+    return np.argsort(-scores, axis=1, kind='stable')[:, :k].tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency and cosine agreement of the ONNX encoder')
+    parser.add_argument('--documents', type=int, default=1000, help='Number of documents from the collection')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--model-dir', default=get_onnx_model_dir())
+    args = parser.parse_args()
+
+    collection = get_collection(create_if_missing=False)
+    documents = collection.get(limit=args.documents, include=['documents'])['documents']
+    queries = DEFAULT_QUERIES
+    print(f"{len(documents)} documents, {len(queries)} queries, k={args.k}")
+
+    encoders = {
+        'sentence_transformers': embedding_functions.SentenceTransformerEmbeddingFunction(
+            model_name=Config.EMBEDDING_MODEL_NAME
+        )
+    }
+    for name, model_file in (('onnx float32', ONNX_MODEL_FILE), ('onnx int8', QUANTIZED_MODEL_FILE)):
+        if os.path.exists(os.path.join(args.model_dir, model_file)):
+            encoders[name] = OnnxEmbeddingFunction(args.model_dir, model_file=model_file, batch_size=args.batch_size)
+    if len(encoders) == 1:
+        print(f"Không tìm thấy model ONNX trong {args.model_dir}, chạy python -m src.nlp_model.export_onnx trước")
+        return
+
+    rows = []
+    reference = None
+    for name, encoder in encoders.items():
+        latencies = query_latencies(encoder, queries)
+        document_matrix, docs_per_second = encode_documents(encoder, documents, args.batch_size)
+        query_matrix = np.asarray(encoder(queries), dtype=np.float32)
+        result_ids = top_k_ids(query_matrix, document_matrix, args.k)
+
+        if reference is None:
+            reference = (document_matrix, query_matrix, result_ids)
+        cosines = np.sum(normalize(document_matrix) * normalize(reference[0]), axis=1)
+        rows.append({
+            'name': name,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'docs_per_second': docs_per_second,
+            'cosine_mean': float(cosines.mean()),
+            'cosine_min': float(cosines.min()),
+            'overlap': mean([recall_at_k(e, a, args.k) for e, a in zip(reference[2], result_ids)])
+        })
+
+    print()
+    print(f"{'encoder':<24}{'p50 ms':>9}{'p95 ms':>9}{'docs/s':>10}{'cos mean':>10}{'cos min':>10}{'top-k overlap':>15}")
+    for row in rows:
+        print(f"{row['name']:<24}{row['p50']:>9.2f}{row['p95']:>9.2f}{row['docs_per_second']:>10.1f}"
+              f"{row['cosine_mean']:>10.4f}{row['cosine_min']:>10.4f}{row['overlap']:>15.4f}")
+
+
+if __name__ == '__main__':
+    main()
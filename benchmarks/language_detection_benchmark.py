@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark nhận biết ngôn ngữ trên câu hỏi ngắn: so sánh bộ nhận biết cục bộ theo bảng chữ
+(detect_script_language) với langdetect thuần. Báo cáo độ chính xác theo từng ngôn ngữ,
+tỷ lệ nhận đúng câu không được hỗ trợ và thời gian nhận biết mỗi câu. Chạy offline.
+
+    python benchmarks/language_detection_benchmark.py
+    python benchmarks/language_detection_benchmark.py --show-errors --repeat 20
+"""
+
+import sys
+import os
+import json
+import argparse
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langdetect import detect
+from langdetect.lang_detect_exception import LangDetectException
+from src.services.ai.language_detector import detect_script_language
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+UNSUPPORTED = 'unsupported'
+LANGDETECT_CODES = {
+    'vi': 'vietnamese', 'en': 'english', 'zh-cn': 'chinese', 'zh-tw': 'chinese',
+    'ja': 'japanese', 'ko': 'korean'
+}
+
+
+def load_queries(paths):
+    """Câu hỏi đã gán nhãn ngôn ngữ ('unsupported' cho ngôn ngữ không hỗ trợ), bỏ câu trùng"""
+    queries = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for item in json.load(f):
+                queries.setdefault(item['query'], item['language'])
+    return list(queries.items())
+
+
+def script_detector(text):
+    result = detect_script_language(text)
+    return result['language'] if result['is_supported'] else UNSUPPORTED
+
+
+def langdetect_detector(text):
+    try:
+        return LANGDETECT_CODES.get(detect(text), UNSUPPORTED)
+    except LangDetectException:
+        return UNSUPPORTED
+
+
+DETECTORS = {
+    'script': script_detector,
+    'langdetect': langdetect_detector
+}
+
+
+def run_detector(detector, queries, repeat):
+    """Trả về (dự đoán cho từng câu, thời gian trung bình mỗi câu tính bằng µs)"""
+    predictions = [detector(query) for query, _ in queries]
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        for query, _ in queries:
+            detector(query)
+    elapsed = time.perf_counter() - started_at
+    return predictions, elapsed * 1e6 / max(len(queries) * repeat, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy and latency of local language detection on short queries')
+    parser.add_argument('--queries', nargs='+', default=[
+        os.path.join(FIXTURES_DIR, 'language_queries.json'),
+        os.path.join(FIXTURES_DIR, 'golden_queries.json')
+    ])
+    parser.add_argument('--repeat', type=int, default=10, help='Timed passes over the query set')
+    parser.add_argument('--show-errors', action='store_true', help='Print misclassified queries')
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    labels = sorted({label for _, label in queries})
+    print(f"{len(queries)} queries, {args.repeat} timed passes")
+
+    rows = []
+    for name, detector in DETECTORS.items():
+        predictions, microseconds = run_detector(detector, queries, args.repeat)
+        correct = [prediction == label for prediction, (_, label) in zip(predictions, queries)]
+        by_label = {
+            label: float(np.mean([ok for ok, (_, item_label) in zip(correct, queries) if item_label == label]))
+            for label in labels
+        }
+        rows.append((name, float(np.mean(correct)), microseconds, by_label))
+
+        if args.show_errors:
+            print(f"\n{name} errors:")
+            for prediction, (query, label) in zip(predictions, queries):
+                if prediction != label:
+                    print(f"  {label:<12} -> {prediction:<12} {query}")
+
+    print()
+    print(f"{'detector':<12}{'accuracy':>10}{'µs/query':>11}" + ''.join(f"{label:>13}" for label in labels))
+    for name, accuracy, microseconds, by_label in rows:
+        print(f"{name:<12}{accuracy:>10.3f}{microseconds:>11.1f}" + ''.join(f"{by_label[label]:>13.3f}" for label in labels))
+
+
+if __name__ == '__main__':
+    main()
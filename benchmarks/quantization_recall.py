@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+So sánh recall@k của index NumPy lượng tử hóa (float16 / int8, có và không chấm lại bằng float32)
+với kết quả của collection ChromaDB đang hoạt động và với tìm kiếm chính xác float32.
+
+Chạy sau khi đã sync dữ liệu (POST /api/travel-chatbot/sync-diadiem):
+    python benchmarks/quantization_recall.py --k 10
+    python benchmarks/quantization_recall.py --k 5 --queries my_queries.txt
+"""
+
+import sys
+import os
+import argparse
+import random
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.nlp_model.vector_store import get_collection, get_embedding_function
+from src.nlp_model.search_backends import NumpySearchBackend, INDEX_DTYPES
+
+# Câu hỏi mẫu bằng 5 ngôn ngữ, được bổ sung thêm tên địa điểm lấy ngẫu nhiên từ collection
+DEFAULT_QUERIES = [
+    'Quán cà phê yên tĩnh ở quận 1',
+    'Chợ Bến Thành mở cửa mấy giờ',
+    'Địa điểm vui chơi cho trẻ em',
+    'Bảo tàng lịch sử miễn phí',
+    'Quiet coffee shop in District 1',
+    'Where can I buy souvenirs cheaply?',
+    'Best rooftop bar with a city view',
+    'Historical sites near the city center',
+    '第一郡安静的咖啡馆',
+    '适合孩子的游乐场所',
+    '1区の静かなカフェ',
+    '子供向けの遊び場',
+    '1군의 조용한 카페',
+    '아이들과 함께 갈 만한 곳',
+]
+
+
+def load_queries(path, collection, sample_size, seed):
+    """Đọc câu hỏi từ file (mỗi dòng một câu) hoặc dùng câu hỏi mẫu + tên địa điểm ngẫu nhiên"""
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip()]
+
+    metadatas = collection.get(include=['metadatas'])['metadatas']
+    names = sorted({str(metadata.get('ten_dia_diem', '')).strip() for metadata in metadatas if metadata})
+    names = [name for name in names if name]
+    random.Random(seed).shuffle(names)
+    return DEFAULT_QUERIES + names[:sample_size]
+
+
+def recall_at_k(expected, actual, k):
+    """Tỷ lệ id trong top-k kỳ vọng xuất hiện trong top-k thực tế"""
+    expected = expected[:k]
+    if not expected:
+        return 1.0
+    return len(set(expected) & set(actual[:k])) / len(expected)
+
+
+def mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall@k of quantised NumPy indexes')
+    parser.add_argument('--k', type=int, default=10, help='Number of results per query')
+    parser.add_argument('--queries', help='File with one query per line (default: built-in queries)')
+    parser.add_argument('--sample', type=int, default=200, help='Number of location names added as queries')
+    parser.add_argument('--rescore-factor', type=int, default=4, help='Candidates re-scored = k * factor')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    collection = get_collection(create_if_missing=False)
+    queries = load_queries(args.queries, collection, args.sample, args.seed)
+    print(f"Collection: {collection.name} ({collection.count()} vectors), {len(queries)} queries, k={args.k}")
+
+    embeddings = get_embedding_function()(queries)
+    chroma_ids = collection.query(query_embeddings=embeddings, n_results=args.k, include=['distances'])['ids']
+
+    rows = []
+    exact_ids = None
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for dtype in INDEX_DTYPES:
+            index_dir = os.path.join(tmp_dir, dtype)
+            NumpySearchBackend.build(collection, index_dir, dtype=dtype)
+
+            for rescore in ([False] if dtype == 'float32' else [False, True]):
+                backend = NumpySearchBackend(index_dir, rescore=rescore, rescore_factor=args.rescore_factor)
+                started_at = time.perf_counter()
+                result_ids = backend.query(query_embeddings=embeddings, n_results=args.k, include=[])['ids']
+                elapsed_ms = (time.perf_counter() - started_at) * 1000
+
+                if dtype == 'float32':
+                    exact_ids = result_ids
+                rows.append({
+                    'mode': f"{dtype}{' + rescore' if rescore else ''}",
+                    'bytes': backend.search_matrix.nbytes,
+                    'recall_chroma': mean([recall_at_k(e, a, args.k) for e, a in zip(chroma_ids, result_ids)]),
+                    'recall_exact': mean([recall_at_k(e, a, args.k) for e, a in zip(exact_ids, result_ids)]),
+                    'ms_per_query': elapsed_ms / len(queries)
+                })
+
+    print()
+    print(f"{'mode':<20}{'index size':>12}{'recall@k vs chroma':>20}{'recall@k vs exact':>20}{'ms/query':>10}")
+    for row in rows:
+        print(f"{row['mode']:<20}{row['bytes'] / 1024:>10.0f}KB{row['recall_chroma']:>20.4f}"
+              f"{row['recall_exact']:>20.4f}{row['ms_per_query']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
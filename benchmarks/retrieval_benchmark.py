@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Benchmark tìm kiếm địa điểm: build index từ file CSV mẫu (cùng định dạng diadiem.csv) vào một
+thư mục tạm, rồi chạy bộ câu hỏi đã gán nhãn bằng 5 ngôn ngữ qua combined_search_with_filters.
+Báo cáo độ trễ p50/p95, throughput, recall@k và MRR cho từng chế độ tìm kiếm.
+
+Các bước phụ thuộc OpenAI (nhận diện ngôn ngữ, trích xuất thực thể) được thay bằng nhãn
+có sẵn trong file câu hỏi nên benchmark chạy offline, không cần OPENAI_API_KEY.
+
+    python benchmarks/retrieval_benchmark.py
+    python benchmarks/retrieval_benchmark.py --k 10 --repeat 5 --modes chroma numpy+hybrid
+    python benchmarks/retrieval_benchmark.py --csv src/scape/diadiem.csv --queries my_queries.json
+"""
+
+import sys
+import os
+import json
+import shutil
+import argparse
+import tempfile
+import time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config.config import Config
+from src.nlp_model.process_diadiem import process_diadiem
+from src.nlp_model.query_cache import query_embedding_cache
+from src.nlp_model.search_backends import reset_search_backend
+import src.services.travel_chatbot_service as travel_chatbot_service
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+MODES = ['chroma', 'chroma+hybrid', 'numpy', 'numpy+hybrid']
+
+
+def load_queries(path):
+    """Đọc câu hỏi đã gán nhãn: query, language, extracted_features, relevant_ids"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def stub_openai_stages(queries):
+    """
+    Thay các bước gọi OpenAI bằng nhãn trong file câu hỏi; mọi lời gọi OpenAI còn sót lại sẽ báo lỗi
+    thay vì gửi request ra ngoài
+    """
+    labels = {item['query']: item for item in queries}
+
+    def detect_language(text):
+        return {'language': labels[text]['language'], 'is_supported': True, 'confidence': 1.0}
+
+    def extract_user_intent_and_features(question):
+        return {'original_question': question, 'intent': 'benchmark', 'confidence': 1.0,
+                'extracted_features': labels[question].get('extracted_features', {})}
+
+    def offline_chat_completion(*args, **kwargs):
+        raise RuntimeError('OpenAI is disabled in the retrieval benchmark')
+
+    travel_chatbot_service.detect_language = detect_language
+    travel_chatbot_service.extract_user_intent_and_features = extract_user_intent_and_features
+    travel_chatbot_service.openai.ChatCompletion.create = offline_chat_completion
+
+
+def configure_workspace(work_dir):
+    """Trỏ ChromaDB và các index phụ vào thư mục tạm để không đụng tới dữ liệu thật"""
+    Config.CHROMA_DB_PATH = os.path.join(work_dir, 'chroma_db')
+    Config.NUMPY_INDEX_DIR = os.path.join(work_dir, 'numpy_index')
+    Config.KEYWORD_INDEX_DIR = os.path.join(work_dir, 'keyword_index')
+    Config.INGEST_WORKERS = 1
+
+
+def set_mode(mode):
+    backend, _, hybrid = mode.partition('+')
+    Config.SEARCH_BACKEND = backend
+    Config.HYBRID_SEARCH_ENABLED = hybrid == 'hybrid'
+    reset_search_backend()
+
+
+def recall_at_k(relevant, result_ids, k):
+    """Tỷ lệ id liên quan xuất hiện trong top-k"""
+    if not relevant:
+        return 1.0
+    return len(set(relevant) & set(result_ids[:k])) / len(relevant)
+
+
+def reciprocal_rank(relevant, result_ids):
+    """1 / hạng của kết quả liên quan đầu tiên (0 nếu không có)"""
+    for rank, doc_id in enumerate(result_ids, start=1):
+        if doc_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def run_query(item, k):
+    """Chạy một câu hỏi qua các bước giống process_travel_question, trả về (id kết quả, ms tìm kiếm)"""
+    question = item['query']
+    language = travel_chatbot_service.detect_language(question)['language']
+    features = travel_chatbot_service.extract_user_intent_and_features(question)['extracted_features']
+
+    started_at = time.perf_counter()
+    search_result = travel_chatbot_service.combined_search_with_filters(
+        question=question,
+        extracted_features=features,
+        n_results=k,
+        language=language
+    )
+    elapsed_ms = (time.perf_counter() - started_at) * 1000
+
+    if not search_result.get('success'):
+        raise RuntimeError(f"Search failed for '{question}': {search_result.get('message')}")
+    return [result['id'] for result in search_result['results']], elapsed_ms
+
+
+def run_mode(mode, queries, k, repeat):
+    """Chạy toàn bộ câu hỏi repeat lần; cache embedding câu hỏi được xóa trước mỗi lượt"""
+    set_mode(mode)
+    # Lượt khởi động: load model / mở index, không tính vào kết quả
+    run_query(queries[0], k)
+
+    latencies = []
+    metrics = {}
+    for _ in range(repeat):
+        query_embedding_cache.clear()
+        for item in queries:
+            result_ids, elapsed_ms = run_query(item, k)
+            latencies.append(elapsed_ms)
+            metrics.setdefault(item['language'], []).append((
+                recall_at_k(item['relevant_ids'], result_ids, k),
+                reciprocal_rank(item['relevant_ids'], result_ids)
+            ))
+
+    all_metrics = [value for values in metrics.values() for value in values]
+    return {
+        'mode': mode,
+        'p50': float(np.percentile(latencies, 50)),
+        'p95': float(np.percentile(latencies, 95)),
+        'qps': len(latencies) / (sum(latencies) / 1000) if latencies else 0.0,
+        'recall': float(np.mean([recall for recall, _ in all_metrics])),
+        'mrr': float(np.mean([rr for _, rr in all_metrics])),
+        'by_language': {
+            language: (float(np.mean([r for r, _ in values])), float(np.mean([rr for _, rr in values])))
+            for language, values in metrics.items()
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline retrieval benchmark with golden queries')
+    parser.add_argument('--csv', default=os.path.join(FIXTURES_DIR, 'diadiem_sample.csv'))
+    parser.add_argument('--queries', default=os.path.join(FIXTURES_DIR, 'golden_queries.json'))
+    parser.add_argument('--k', type=int, default=5, help='Number of results per query')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the query set')
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--work-dir', help='Directory for the benchmark index (default: temporary)')
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='retrieval_benchmark_')
+    configure_workspace(work_dir)
+    stub_openai_stages(queries)
+
+    try:
+        started_at = time.perf_counter()
+        stats = process_diadiem(csv_path=args.csv)
+        print(f"Index built from {args.csv}: {stats['total']} documents in "
+              f"{time.perf_counter() - started_at:.1f}s ({work_dir})")
+        print(f"{len(queries)} queries, k={args.k}, {args.repeat} passes")
+
+        rows = [run_mode(mode, queries, args.k, args.repeat) for mode in args.modes]
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print(f"{'mode':<16}{'p50 ms':>9}{'p95 ms':>9}{'q/s':>9}{'recall@k':>10}{'MRR':>8}")
+    for row in rows:
+        print(f"{row['mode']:<16}{row['p50']:>9.2f}{row['p95']:>9.2f}{row['qps']:>9.1f}"
+              f"{row['recall']:>10.4f}{row['mrr']:>8.4f}")
+
+    print()
+    print('recall@k / MRR by language')
+    languages = sorted({language for row in rows for language in row['by_language']})
+    print(f"{'mode':<16}" + ''.join(f"{language:>16}" for language in languages))
+    for row in rows:
+        cells = ''.join(
+            f"{row['by_language'][language][0]:>8.2f} / {row['by_language'][language][1]:<5.2f}"
+            for language in languages
+        )
+        print(f"{row['mode']:<16}{cells}")
+
+
+if __name__ == '__main__':
+    main()
@@ -33,4 +33,79 @@ class Config:
     DB_NAME = os.getenv('DB_NAME')
     DB_USER = os.getenv('DB_USER')
     DB_PASSWORD = os.getenv('DB_PASSWORD')
-    DB_PORT = os.getenv('DB_PORT')
\ No newline at end of file
+    DB_PORT = os.getenv('DB_PORT')
+
+    # Vector store
+    CHROMA_DB_PATH = os.getenv('CHROMA_DB_PATH')
+    CHROMA_COLLECTION_NAME = os.getenv('CHROMA_COLLECTION_NAME', 'diadiem_collection')
+    EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL_NAME', 'paraphrase-multilingual-MiniLM-L12-v2')
+    # Encoder: 'sentence_transformers' (PyTorch) hoặc 'onnx' (bản ONNX int8 chạy bằng onnxruntime trên CPU,
+    # tạo bằng python -m src.nlp_model.export_onnx). Request encode song song, mỗi lần chạy dùng
+    # ONNX_THREADS luồng; ONNX_THREADS = 0 thì chia đều số core cho ONNX_CONCURRENCY lần chạy song song
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'sentence_transformers').lower()
+    ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR')
+    ONNX_MODEL_FILE = os.getenv('ONNX_MODEL_FILE', 'model_quantized.onnx')
+    ONNX_THREADS = int(os.getenv('ONNX_THREADS', 0))
+    ONNX_CONCURRENCY = int(os.getenv('ONNX_CONCURRENCY', 4))
+    # Số phiên bản collection được giữ lại sau mỗi lần sync (tính cả phiên bản đang hoạt động)
+    INDEX_VERSIONS_TO_KEEP = int(os.getenv('INDEX_VERSIONS_TO_KEEP', 2))
+    # Vai trò của process với index: 'standalone' (mặc định, đọc/ghi ChromaDB trực tiếp),
+    # 'writer' (sync dữ liệu và publish snapshot chỉ đọc) hoặc 'reader' (worker chỉ tìm kiếm trên
+    # snapshot memory-mapped, không mở ChromaDB cho tìm kiếm và không được sync)
+    INDEX_ROLE = os.getenv('INDEX_ROLE', 'standalone').lower()
+    INDEX_SNAPSHOT_DIR = os.getenv('INDEX_SNAPSHOT_DIR')
+    # Ingest: số dòng encode mỗi lô, số dòng ghi mỗi lần gọi ChromaDB, số process encode (0 = số core CPU)
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 512))
+    INGEST_WRITE_BATCH_SIZE = int(os.getenv('INGEST_WRITE_BATCH_SIZE', 256))
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 0))
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', 1024))
+    # Cache câu trả lời theo ngữ nghĩa: câu hỏi cùng ngôn ngữ có cosine >= ANSWER_CACHE_SIMILARITY
+    # với câu hỏi đã trả lời thì dùng lại kết quả (xóa khi phiên bản index thay đổi)
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+    ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 512))
+    ANSWER_CACHE_TTL_SECONDS = int(os.getenv('ANSWER_CACHE_TTL_SECONDS', 3600))
+    ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', 0.92))
+
+    # Pipeline câu hỏi du lịch: nhận diện ngôn ngữ, trích xuất thực thể và encode câu hỏi chạy song song
+    # trên pool CHAT_PIPELINE_WORKERS thread dùng chung, mỗi bước có timeout riêng (giây)
+    CHAT_PIPELINE_WORKERS = int(os.getenv('CHAT_PIPELINE_WORKERS', 12))
+    LANGUAGE_DETECTION_TIMEOUT = float(os.getenv('LANGUAGE_DETECTION_TIMEOUT', 10))
+    INTENT_EXTRACTION_TIMEOUT = float(os.getenv('INTENT_EXTRACTION_TIMEOUT', 20))
+    QUERY_EMBEDDING_TIMEOUT = float(os.getenv('QUERY_EMBEDDING_TIMEOUT', 10))
+
+    # Tiêu đề cuộc trò chuyện được sinh trên pool riêng, song song với câu trả lời và chỉ khi chưa có
+    TITLE_GENERATION_WORKERS = int(os.getenv('TITLE_GENERATION_WORKERS', 4))
+
+    # Cache phản hồi OpenAI trên đĩa (SQLite), khóa là hash của model / messages / tools / temperature...
+    # LLM_CACHE_DISABLED_SITES: danh sách call site không dùng cache, cách nhau bởi dấu phẩy
+    # (intent_extraction, natural_response, conversation_title, chat_response). Mặc định tắt cho
+    # natural_response và chat_response: câu trả lời sinh với temperature 0.7 và cache dùng chung
+    # mọi worker, nếu cache thì mọi người hỏi cùng một câu sẽ nhận lại cùng một câu trả lời
+    LLM_CACHE_ENABLED = os.getenv('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+    LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH')
+    LLM_CACHE_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 10000))
+    LLM_CACHE_DISABLED_SITES = os.getenv('LLM_CACHE_DISABLED_SITES', 'natural_response,chat_response')
+
+    # Search backend: 'chroma' hoặc 'numpy' (brute-force trên ma trận float32 memory-mapped)
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'chroma').lower()
+    NUMPY_INDEX_DIR = os.getenv('NUMPY_INDEX_DIR')
+    # Kiểu vector của index NumPy: float32, float16 hoặc int8 (hệ số theo từng chiều);
+    # với float16/int8 có thể chấm lại điểm top (k * NUMPY_RESCORE_FACTOR) ứng viên bằng float32
+    NUMPY_INDEX_DTYPE = os.getenv('NUMPY_INDEX_DTYPE', 'float32').lower()
+    NUMPY_RESCORE = os.getenv('NUMPY_RESCORE', 'True').lower() == 'true'
+    NUMPY_RESCORE_FACTOR = int(os.getenv('NUMPY_RESCORE_FACTOR', 4))
+
+    # Phân vùng index theo ngôn ngữ (cột ngon_ngu): truy vấn có lọc ngôn ngữ chỉ tìm trong phân vùng đó
+    LANGUAGE_PARTITIONS_ENABLED = os.getenv('LANGUAGE_PARTITIONS_ENABLED', 'True').lower() == 'true'
+
+    # Tìm kiếm kết hợp BM25 (index từ khóa) + vector bằng Reciprocal Rank Fusion
+    HYBRID_SEARCH_ENABLED = os.getenv('HYBRID_SEARCH_ENABLED', 'True').lower() == 'true'
+    RRF_K = int(os.getenv('RRF_K', 60))
+    KEYWORD_INDEX_DIR = os.getenv('KEYWORD_INDEX_DIR')
+
+    # Xếp hạng theo vị trí người dùng: điểm = (1 - w) * độ liên quan + w * exp(-khoảng cách / scale),
+    # xét n_results * GEO_CANDIDATE_FACTOR ứng viên
+    GEO_RANKING_WEIGHT = float(os.getenv('GEO_RANKING_WEIGHT', 0.4))
+    GEO_DISTANCE_SCALE_KM = float(os.getenv('GEO_DISTANCE_SCALE_KM', 3.0))
+    GEO_CANDIDATE_FACTOR = int(os.getenv('GEO_CANDIDATE_FACTOR', 3))
\ No newline at end of file
@@ -1,10 +1,12 @@
 from flask_restx import Resource, fields, Namespace, reqparse
 from werkzeug.datastructures import FileStorage
-from flask import request
-from src.services.chatting_service import create_conversation, get_user_conversations, get_conversation_messages, save_message, end_conversation, save_message_update
+from flask import request, Response, stream_with_context
+from src.services.chatting_service import create_conversation, get_user_conversations, get_conversation_messages, save_message, end_conversation, save_message_update, stream_message_update
 from src.services.ai.speech_service import SpeechService
+from src.nlp_model.geo import parse_location
 from werkzeug.utils import secure_filename
 import os
+import json
 from src import db
 
 chatting_ns = Namespace('chatting', description='Chatting operations')
@@ -49,7 +51,9 @@ message_update_create_model = chatting_ns.model('MessageUpdateCreate', {
     'message_text': fields.String(required=True, description='Content of the message'),
     'translated_text': fields.String(description='Translated text of the message'),
     'message_type': fields.String(description='Type of the message', default='text'),
-    'voice_url': fields.String(description='URL of the voice message if any')
+    'voice_url': fields.String(description='URL of the voice message if any'),
+    'latitude': fields.Float(description='Optional user latitude, used to rank places by distance'),
+    'longitude': fields.Float(description='Optional user longitude, used to rank places by distance')
 })
 
 voice_message_parser = reqparse.RequestParser()
@@ -253,6 +257,11 @@ class MessageResource(Resource):
         required_fields = ['conversation_id', 'sender', 'message_text']
         if not all(field in data for field in required_fields):
             return {'message': 'Missing required fields'}, 400
+        
+        try:
+            user_location = parse_location(data.get('latitude'), data.get('longitude'))
+        except ValueError as e:
+            return {'message': str(e)}, 400
             
         success, result = save_message_update(
             conversation_id=data['conversation_id'],
@@ -260,7 +269,8 @@ class MessageResource(Resource):
             message_text=data['message_text'],
             translated_text=data.get('translated_text'),
             message_type=data.get('message_type', 'text'),
-            voice_url=data.get('voice_url')
+            voice_url=data.get('voice_url'),
+            user_location=user_location
         )
         
         if not success:
@@ -274,6 +284,56 @@ class MessageResource(Resource):
             'data': result
         }, 201
 
+def _format_sse(events):
+    """Encode (event, data) pairs as server-sent events"""
+    for event, data in events:
+        yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@chatting_ns.route('/messages/update/stream')
+class MessageStreamResource(Resource):
+    @chatting_ns.expect(message_update_create_model)
+    @chatting_ns.response(200, 'Server-sent events: user_message, delta ({"text"}), then done (same data as /messages/update) or error')
+    @chatting_ns.response(400, 'Invalid request data')
+    @chatting_ns.response(404, 'Conversation not found')
+    @chatting_ns.response(500, 'Internal server error')
+    def post(self):
+        """Save a user message and stream the bot reply as server-sent events"""
+        data = chatting_ns.payload
+        
+        # Validate required fields
+        required_fields = ['conversation_id', 'sender', 'message_text']
+        if not all(field in data for field in required_fields):
+            return {'message': 'Missing required fields'}, 400
+        
+        try:
+            user_location = parse_location(data.get('latitude'), data.get('longitude'))
+        except ValueError as e:
+            return {'message': str(e)}, 400
+        
+        success, result = stream_message_update(
+            conversation_id=data['conversation_id'],
+            sender=data['sender'],
+            message_text=data['message_text'],
+            translated_text=data.get('translated_text'),
+            message_type=data.get('message_type', 'text'),
+            voice_url=data.get('voice_url'),
+            user_location=user_location
+        )
+        
+        if not success:
+            if result == "Conversation not found":
+                return {'message': result}, 404
+            if result == "Only user messages can be streamed":
+                return {'message': result}, 400
+            return {'message': f'Failed to save message: {result}'}, 500
+        
+        # Tắt buffer của proxy (nginx) để từng delta tới client ngay
+        return Response(
+            stream_with_context(_format_sse(result)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
 @chatting_ns.route('/messages/voice')
 class VoiceMessageResource(Resource):
     @chatting_ns.expect(voice_message_parser)
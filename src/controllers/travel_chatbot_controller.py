@@ -1,20 +1,29 @@
 from flask_restx import Namespace, Resource, fields, reqparse
-from flask import request
-from src.nlp_model.process_diadiem import process_diadiem
+from flask import request, Response, stream_with_context
+from src.services.reindex_job_service import reindex_job_manager, ReindexJobBusy
 from src.services.travel_chatbot_service import (
     extract_user_intent_and_features, 
     format_extraction_result, 
     combined_search_with_filters,
+    combined_search_batch,
+    format_search_results,
     detect_language,
     get_language_info,
     create_chatbot_response
 )
+from src.nlp_model.vector_store import get_collection, get_collection_for_version, get_active_index_version
+from src.nlp_model.query_cache import query_embedding_cache
+from src.nlp_model.answer_cache import semantic_answer_cache
+from src.services.ai.llm_cache import llm_response_cache
+from src.nlp_model.filter_fields import SUPPORTED_LANGUAGES
+from src.nlp_model.geo import parse_location
+from src.nlp_model.embedding_export import EXPORT_DTYPES, build_export_dtype, iter_npy_export
+from src.config.config import Config
 import os
-import chromadb
-from chromadb.utils import embedding_functions
 import numpy as np
 import json
 import math
+import base64
 import openai
 from datetime import datetime
 import traceback
@@ -26,14 +35,39 @@ travel_chatbot_ns = Namespace('travel-chatbot', description='Travel chatbot oper
 pagination_parser = reqparse.RequestParser()
 pagination_parser.add_argument('page', type=int, default=1, help='Page number (starts from 1)')
 pagination_parser.add_argument('limit', type=int, default=10, help='Number of items per page')
-pagination_parser.add_argument('sort_by', type=str, default='id', help='Field to sort by')
+pagination_parser.add_argument('sort_by', type=str, default='id',
+                               help="Field to sort by ('storage' = index storage order, fastest but differs between index versions)")
 pagination_parser.add_argument('sort_order', type=str, default='asc', help='Sort order (asc/desc)')
+pagination_parser.add_argument('cursor', type=str, help='Cursor returned as next_cursor by the previous page (overrides page)')
+
+# Parser cho export embedding dạng nhị phân
+export_parser = reqparse.RequestParser()
+export_parser.add_argument('dtype', type=str, default='float32', help='Embedding dtype (float32/float16)')
+export_parser.add_argument('chunk_size', type=int, default=1000, help='Number of rows read and streamed per chunk')
 
 # Định nghĩa model cho request/response
 question_model = travel_chatbot_ns.model('Question', {
-    'question': fields.String(required=True, description='User question about travel in Ho Chi Minh City')
+    'question': fields.String(required=True, description='User question about travel in Ho Chi Minh City'),
+    'latitude': fields.Float(description='Optional user latitude, used to rank places by distance'),
+    'longitude': fields.Float(description='Optional user longitude, used to rank places by distance')
+})
+
+batch_question_model = travel_chatbot_ns.model('BatchQuestion', {
+    'questions': fields.List(fields.String, required=True, description='List of user questions'),
+    'extracted_features': fields.List(fields.Raw, description='Optional extracted features for each question'),
+    'n_results': fields.Integer(description='Maximum number of results per question', default=10),
+    'language': fields.String(description='Optional language filter (vietnamese, english, chinese, japanese, korean)')
+})
+
+batch_search_response_model = travel_chatbot_ns.model('BatchSearchResponse', {
+    'status': fields.String(description='Status of the operation'),
+    'message': fields.String(description='Detailed message'),
+    'results': fields.List(fields.Raw, description='Search result for each question, same shape as a single search')
 })
 
+# Số câu hỏi tối đa trong một lô tìm kiếm
+MAX_BATCH_QUESTIONS = 100
+
 answer_model = travel_chatbot_ns.model('Answer', {
     'id': fields.String(description='Location ID'),
     'ten_dia_diem': fields.String(description='Location name'),
@@ -42,13 +76,39 @@ answer_model = travel_chatbot_ns.model('Answer', {
     'khu_vuc': fields.String(description='Area/Region'),
     'dia_chi': fields.String(description='Address'),
     'similarity': fields.Float(description='Similarity score (0-1)'),
-    'language': fields.String(description='Language of the result (vietnamese, english, chinese, korean, japanese)')
+    'language': fields.String(description='Language of the result (vietnamese, english, chinese, korean, japanese)'),
+    'distance_km': fields.Float(description='Distance from the user position in km (only when a position is given)')
+})
+
+sync_summary_model = travel_chatbot_ns.model('SyncSummary', {
+    'added': fields.Integer(description='Number of new locations'),
+    'updated': fields.Integer(description='Number of changed locations (re-embedded, or metadata-only changes reusing the stored vector)'),
+    'deleted': fields.Integer(description='Number of locations removed from the collection'),
+    'unchanged': fields.Integer(description='Number of locations skipped because their content hash matched'),
+    'total': fields.Integer(description='Number of locations in diadiem.csv'),
+    'index_version': fields.Integer(description='Index version serving searches after the sync'),
+    'collection': fields.String(description='Name of the active ChromaDB collection')
+})
+
+# Model cho job sync chạy nền
+reindex_job_model = travel_chatbot_ns.model('ReindexJob', {
+    'job_id': fields.String(description='Job ID'),
+    'status': fields.String(description='queued, running, succeeded, failed or cancelled'),
+    'created_at': fields.String(description='Creation time (ISO format)'),
+    'started_at': fields.String(description='Start time (ISO format)'),
+    'finished_at': fields.String(description='Finish time (ISO format)'),
+    'processed': fields.Integer(description='Number of changed locations embedded so far'),
+    'total': fields.Integer(description='Number of changed locations to embed (null until the first batch)'),
+    'docs_per_second': fields.Float(description='Embedding throughput'),
+    'elapsed_seconds': fields.Float(description='Time spent running the job'),
+    'eta_seconds': fields.Float(description='Estimated time until all changed locations are embedded'),
+    'error': fields.String(description='Error message if the job failed'),
+    'cancel_requested': fields.Boolean(description='Whether cancellation was requested'),
+    'summary': fields.Nested(sync_summary_model, allow_null=True, description='Sync result once the job succeeded')
 })
 
-sync_response_model = travel_chatbot_ns.model('SyncResponse', {
-    'status': fields.String(description='Status of the sync operation'),
-    'message': fields.String(description='Detailed message about the sync operation'),
-    'processed_count': fields.Integer(description='Number of locations processed')
+reindex_jobs_response_model = travel_chatbot_ns.model('ReindexJobsResponse', {
+    'jobs': fields.List(fields.Nested(reindex_job_model), description='Recent jobs, newest first')
 })
 
 # Model cho response của embeddings
@@ -65,6 +125,8 @@ embeddings_response_model = travel_chatbot_ns.model('EmbeddingsResponse', {
     'total_pages': fields.Integer(description='Total number of pages'),
     'current_page': fields.Integer(description='Current page number'),
     'items_per_page': fields.Integer(description='Number of items per page'),
+    'next_cursor': fields.String(description='Cursor for the next page, null on the last page'),
+    'index_version': fields.Integer(description='Index version the page was read from'),
     'embeddings': fields.List(fields.Nested(embedding_model), description='List of embeddings')
 })
 
@@ -83,9 +145,20 @@ metadata_response_model = travel_chatbot_ns.model('MetadataResponse', {
     'total_pages': fields.Integer(description='Total number of pages'),
     'current_page': fields.Integer(description='Current page number'),
     'items_per_page': fields.Integer(description='Number of items per page'),
+    'next_cursor': fields.String(description='Cursor for the next page, null on the last page'),
+    'index_version': fields.Integer(description='Index version the page was read from'),
     'metadata': fields.List(fields.Nested(metadata_model), description='List of metadata entries')
 })
 
+# Model cho thống kê cache embedding câu hỏi
+query_cache_stats_model = travel_chatbot_ns.model('QueryCacheStats', {
+    'size': fields.Integer(description='Number of cached query embeddings'),
+    'max_size': fields.Integer(description='Maximum number of cached query embeddings'),
+    'hits': fields.Integer(description='Number of cache hits'),
+    'misses': fields.Integer(description='Number of cache misses'),
+    'hit_rate': fields.Float(description='Cache hit rate (0-1)')
+})
+
 # Cập nhật model response để hỗ trợ chatbot
 chatbot_response_model = travel_chatbot_ns.model('ChatbotResponse', {
     'status': fields.String(description='Status of the operation'),
@@ -99,34 +172,6 @@ chatbot_response_model = travel_chatbot_ns.model('ChatbotResponse', {
     'extracted_features': fields.Raw(description='Extracted entities and features')
 })
 
-# Khởi tạo ChromaDB client
-workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-chroma_client = chromadb.PersistentClient(path=os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'chroma_db'))
-
-# Sử dụng sentence-transformers làm embedding function
-sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="paraphrase-multilingual-MiniLM-L12-v2"
-)
-
-def get_or_create_collection():
-    """Get existing collection or create new one if not exists"""
-    try:
-        collection = chroma_client.get_collection(
-            name="diadiem_collection",
-            embedding_function=sentence_transformer_ef
-        )
-        return collection
-    except Exception as e:
-        print(f"Collection not found, creating new one: {str(e)}")
-        collection = chroma_client.create_collection(
-            name="diadiem_collection",
-            embedding_function=sentence_transformer_ef
-        )
-        return collection
-
-# Lấy collection
-collection = get_or_create_collection()
-
 # Ngưỡng tối thiểu cho độ tương đồng
 MIN_SIMILARITY_THRESHOLD = 0.1
 
@@ -168,30 +213,98 @@ def calculate_semantic_score(distance, question_words, metadata):
     
     return min(semantic_score, 1.0)
 
-def paginate_results(results, page, limit, sort_by='id', sort_order='asc'):
+def encode_cursor(version, offset, sort_by, sort_order):
+    """
+    Tạo cursor phân trang: gắn với phiên bản index để các trang tiếp theo vẫn đọc
+    cùng một collection kể cả khi index được build lại giữa hai lần gọi
+    """
+    payload = json.dumps({'v': version, 'o': offset, 'sb': sort_by, 'so': sort_order}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    """Giải mã cursor phân trang, raise ValueError nếu cursor không hợp lệ"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        return {
+            'version': int(payload['v']),
+            'offset': int(payload['o']),
+            'sort_by': str(payload['sb']),
+            'sort_order': str(payload['so'])
+        }
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+# Thứ tự lưu trong index: limit/offset được đẩy xuống ChromaDB nhưng thứ tự thay đổi giữa các phiên bản index
+STORAGE_SORT_KEY = 'storage'
+
+def fetch_page(collection, include, offset, limit, sort_by, sort_order, total):
     """
-    Phân trang và sắp xếp kết quả
+    Lấy một trang dữ liệu từ collection, chỉ đọc các trường trong include.
+    sort_by='storage' dùng thứ tự lưu trong index và đẩy limit/offset xuống ChromaDB;
+    sort_by='id' chỉ đọc danh sách id để xếp thứ tự, các trường metadata khác chỉ đọc metadata,
+    rồi lấy trang theo id.
+    
+    Returns:
+        Dict: Kết quả dạng collection.get (ids và các trường trong include) theo đúng thứ tự trang
     """
-    if not results:
-        return [], 0, 0
+    descending = sort_order.lower() == 'desc'
+    if sort_by == STORAGE_SORT_KEY:
+        if descending:
+            start = max(total - offset - limit, 0)
+            count = max(total - offset - start, 0)
+        else:
+            start, count = offset, limit
+        if count == 0:
+            return {'ids': []}
+        results = collection.get(limit=count, offset=start, include=include)
+        if descending:
+            results = {key: list(reversed(value)) if isinstance(value, list) else value
+                       for key, value in results.items()}
+        return results
     
-    # Sắp xếp kết quả
-    if sort_order.lower() == 'desc':
-        results = sorted(results, key=lambda x: x.get(sort_by, ''), reverse=True)
+    if sort_by == 'id':
+        # Chỉ đọc id, không đọc metadata/embedding/document
+        ordered_ids = sorted(collection.get(include=[])['ids'])
     else:
-        results = sorted(results, key=lambda x: x.get(sort_by, ''))
-    
-    # Tính toán phân trang
-    total = len(results)
-    total_pages = math.ceil(total / limit)
-    page = min(max(1, page), total_pages)  # Đảm bảo page nằm trong khoảng hợp lệ
+        # Sắp xếp theo trường metadata: chỉ đọc metadata, không đọc embedding/document
+        all_metadata = collection.get(include=['metadatas'])
+        ordered_ids = [
+            doc_id for _, doc_id in sorted(
+                (str((metadata or {}).get(sort_by, '')), doc_id)
+                for doc_id, metadata in zip(all_metadata['ids'], all_metadata['metadatas'])
+            )
+        ]
+    if descending:
+        ordered_ids.reverse()
+    page_ids = ordered_ids[offset:offset + limit]
+    if not page_ids:
+        return {'ids': []}
+    results = collection.get(ids=page_ids, include=include)
+    position = {doc_id: i for i, doc_id in enumerate(results['ids'])}
+    order = [position[doc_id] for doc_id in page_ids if doc_id in position]
+    return {key: [value[i] for i in order] if isinstance(value, list) else value
+            for key, value in results.items()}
+
+def resolve_page_request(args):
+    """
+    Xác định collection, phiên bản, offset và thứ tự sắp xếp từ tham số phân trang (page hoặc cursor)
     
-    # Lấy kết quả cho trang hiện tại
-    start_idx = (page - 1) * limit
-    end_idx = start_idx + limit
-    paginated_results = results[start_idx:end_idx]
+    Returns:
+        Tuple: (collection, version, offset, sort_by, sort_order); raise ValueError / LookupError khi lỗi
+    """
+    limit = args['limit']
+    if args.get('cursor'):
+        cursor = decode_cursor(args['cursor'])
+        try:
+            collection = get_collection_for_version(cursor['version'])
+        except Exception:
+            raise LookupError('Cursor refers to an index version that no longer exists, restart from page 1')
+        return collection, cursor['version'], cursor['offset'], cursor['sort_by'], cursor['sort_order']
     
-    return paginated_results, total, total_pages
+    version = get_active_index_version()
+    collection = get_collection_for_version(version)
+    offset = (max(1, args['page']) - 1) * limit
+    return collection, version, offset, args['sort_by'], args['sort_order']
 
 @travel_chatbot_ns.route('/search')
 class SearchLocation(Resource):
@@ -217,6 +330,22 @@ class SearchLocation(Resource):
                     'extracted_features': {}
                 }, 400
             
+            # Vị trí người dùng (tùy chọn) để xếp hạng địa điểm theo khoảng cách
+            try:
+                user_location = parse_location(data.get('latitude'), data.get('longitude'))
+            except ValueError as e:
+                return {
+                    'status': 'error',
+                    'message': str(e),
+                    'response': '',
+                    'language': 'unknown',
+                    'language_name': 'Unknown',
+                    'search_results': [],
+                    'suggested_activities': [],
+                    'follow_up_questions': [],
+                    'extracted_features': {}
+                }, 400
+            
             # Bước 1: Nhận biết ngôn ngữ
             print("=== NHẬN BIẾT NGÔN NGỮ ===")
             language_result = detect_language(question)
@@ -266,7 +395,9 @@ class SearchLocation(Resource):
             search_result = combined_search_with_filters(
                 question=question,
                 extracted_features=extraction_result.get('extracted_features', {}),
-                n_results=8
+                n_results=8,
+                language=detected_language,
+                user_location=user_location
             )
             
             # Debug: Kiểm tra kết quả tìm kiếm ngay sau khi nhận
@@ -297,64 +428,10 @@ class SearchLocation(Resource):
             print("==========================")
             
             # Format kết quả tìm kiếm để phù hợp với response model
-            formatted_results = []
-            for result in search_result['results']:
-                metadata = result.get('metadata', {})
-                distance = result.get('distance', 0)
-                
-                # Tính similarity score từ distance
-                similarity = 1 / (1 + distance) if distance > 0 else 0
-                
-                # Xác định ngôn ngữ của kết quả dựa trên metadata
-                result_language = 'unknown'
-                if metadata.get('mo_ta'):
-                    mo_ta = metadata.get('mo_ta', '')
-                    # Kiểm tra ngôn ngữ dựa trên ký tự
-                    if any(char in mo_ta for char in ['は', 'が', 'を', 'に', 'へ', 'で', 'から', 'まで', 'の', 'と', 'や', 'も']):
-                        result_language = 'japanese'
-                    elif any(char in mo_ta for char in ['은', '는', '이', '가', '을', '를', '의', '에', '에서', '로', '으로', '와', '과']):
-                        result_language = 'korean'
-                    elif any(char in mo_ta for char in ['的', '是', '在', '有', '和', '与', '或', '但', '因为', '所以', '如果', '虽然']):
-                        result_language = 'chinese'
-                    elif any(char in mo_ta for char in ['à', 'á', 'ạ', 'ả', 'ã', 'â', 'ầ', 'ấ', 'ậ', 'ẩ', 'ẫ', 'ă', 'ằ', 'ắ', 'ặ', 'ẳ', 'ẵ', 'è', 'é', 'ẹ', 'ẻ', 'ẽ', 'ê', 'ề', 'ế', 'ệ', 'ể', 'ễ', 'ì', 'í', 'ị', 'ỉ', 'ĩ', 'ò', 'ó', 'ọ', 'ỏ', 'õ', 'ô', 'ồ', 'ố', 'ộ', 'ổ', 'ỗ', 'ơ', 'ờ', 'ớ', 'ợ', 'ở', 'ỡ', 'ù', 'ú', 'ụ', 'ủ', 'ũ', 'ư', 'ừ', 'ứ', 'ự', 'ử', 'ữ', 'ỳ', 'ý', 'ỵ', 'ỷ', 'ỹ', 'đ']):
-                        result_language = 'vietnamese'
-                    else:
-                        result_language = 'english'
-                
-                # Ưu tiên kết quả cùng ngôn ngữ với câu hỏi
-                language_boost = 0.3 if result_language == detected_language else 0.0
-                adjusted_similarity = min(similarity + language_boost, 1.0)
-                
-                formatted_result = {
-                    'id': result.get('id', ''),
-                    'ten_dia_diem': metadata.get('ten_dia_diem', ''),
-                    'mo_ta': metadata.get('mo_ta', ''),
-                    'loai_dia_diem': metadata.get('loai_dia_diem', ''),
-                    'khu_vuc': metadata.get('khu_vuc', ''),
-                    'dia_chi': metadata.get('dia_chi', ''),
-                    'similarity': round(adjusted_similarity, 3),
-                    'language': result_language
-                }
-                formatted_results.append(formatted_result)
-            
-            # Sắp xếp kết quả theo similarity (cao nhất trước) và ưu tiên ngôn ngữ
-            formatted_results.sort(key=lambda x: (x['similarity'], x['language'] == detected_language), reverse=True)
-            
-            # Chỉ giữ lại kết quả có similarity > 0.1 để tránh kết quả không liên quan
-            formatted_results = [r for r in formatted_results if r['similarity'] > 0.1]
-            
-            # Ưu tiên kết quả cùng ngôn ngữ với câu hỏi
-            same_language_results = [r for r in formatted_results if r['language'] == detected_language]
-            other_language_results = [r for r in formatted_results if r['language'] != detected_language]
-            
-            # Nếu có đủ kết quả cùng ngôn ngữ, chỉ trả về những kết quả đó
-            if len(same_language_results) >= 3:
-                formatted_results = same_language_results[:8]
-                print(f"Using {len(formatted_results)} results in {detected_language}")
-            else:
-                # Nếu không đủ, bổ sung thêm kết quả từ ngôn ngữ khác
-                formatted_results = same_language_results + other_language_results[:8-len(same_language_results)]
-                print(f"Using {len(same_language_results)} same language + {len(other_language_results[:8-len(same_language_results)])} other language results")
+            # (ngôn ngữ của địa điểm lấy từ metadata language đã chuẩn hóa khi ingest)
+            formatted_results = format_search_results(search_result['results'], detected_language, limit=8)
+            same_language_count = sum(1 for r in formatted_results if r['language'] == detected_language)
+            print(f"Using {same_language_count} same language + {len(formatted_results) - same_language_count} other language results")
             
             # Debug: Kiểm tra cấu trúc search_result
             print("=== DEBUG: search_result structure ===")
@@ -423,19 +500,97 @@ class SearchLocation(Resource):
                 'extracted_features': {}
             }, 500
 
+@travel_chatbot_ns.route('/search/batch')
+class SearchLocationBatch(Resource):
+    @travel_chatbot_ns.expect(batch_question_model)
+    @travel_chatbot_ns.marshal_with(batch_search_response_model)
+    def post(self):
+        """Search for many questions at once with a single batched encoding pass"""
+        try:
+            data = request.get_json() or {}
+            questions = data.get('questions')
+            extracted_features = data.get('extracted_features')
+            n_results = data.get('n_results', 10)
+            language = data.get('language')
+            
+            if not questions or not isinstance(questions, list):
+                return {
+                    'status': 'error',
+                    'message': 'Questions must be a non-empty list',
+                    'results': []
+                }, 400
+            
+            if len(questions) > MAX_BATCH_QUESTIONS:
+                return {
+                    'status': 'error',
+                    'message': f'At most {MAX_BATCH_QUESTIONS} questions are allowed per batch',
+                    'results': []
+                }, 400
+            
+            if any(not isinstance(question, str) or not question.strip() for question in questions):
+                return {
+                    'status': 'error',
+                    'message': 'Every question must be a non-empty string',
+                    'results': []
+                }, 400
+            
+            if extracted_features is not None and len(extracted_features) != len(questions):
+                return {
+                    'status': 'error',
+                    'message': 'extracted_features must have the same length as questions',
+                    'results': []
+                }, 400
+            
+            if not isinstance(n_results, int) or n_results < 1 or n_results > 100:
+                return {
+                    'status': 'error',
+                    'message': 'n_results must be between 1 and 100',
+                    'results': []
+                }, 400
+            
+            if language is not None and language not in SUPPORTED_LANGUAGES:
+                return {
+                    'status': 'error',
+                    'message': f"language must be one of: {', '.join(SUPPORTED_LANGUAGES)}",
+                    'results': []
+                }, 400
+            
+            batch_results = combined_search_batch(
+                questions=questions,
+                extracted_features_list=extracted_features,
+                n_results=n_results,
+                language=language
+            )
+            
+            return {
+                'status': 'success',
+                'message': f'Searched {len(questions)} questions',
+                'results': [
+                    dict(result, question=question)
+                    for question, result in zip(questions, batch_results)
+                ]
+            }
+            
+        except Exception as e:
+            return {
+                'status': 'error',
+                'message': f'Error during batch search: {str(e)}',
+                'results': []
+            }, 500
+
 @travel_chatbot_ns.route('/embeddings')
 class GetEmbeddings(Resource):
     @travel_chatbot_ns.expect(pagination_parser)
     @travel_chatbot_ns.marshal_with(embeddings_response_model)
     def get(self):
-        """Get embeddings from the database with pagination"""
+        """Get embeddings from the database with pagination (page or cursor)"""
+        page = 1
+        limit = 10
         try:
             # Parse parameters
             args = pagination_parser.parse_args()
             page = args['page']
             limit = args['limit']
-            sort_by = args['sort_by']
-            sort_order = args['sort_order']
             
             # Validate parameters
             if limit < 1 or limit > 100:
@@ -449,12 +604,43 @@ class GetEmbeddings(Resource):
                     'embeddings': []
                 }, 400
             
-            # Lấy tất cả dữ liệu
-            results = collection.get(
-                include=['embeddings', 'documents', 'metadatas']
-            )
+            # Xác định collection (theo phiên bản trong cursor nếu có) và vị trí trang
+            try:
+                collection, version, offset, sort_by, sort_order = resolve_page_request(args)
+            except ValueError as e:
+                return {
+                    'status': 'error',
+                    'message': str(e),
+                    'total': 0,
+                    'total_pages': 0,
+                    'current_page': page,
+                    'items_per_page': limit,
+                    'embeddings': []
+                }, 400
+            except LookupError as e:
+                return {
+                    'status': 'error',
+                    'message': str(e),
+                    'total': 0,
+                    'total_pages': 0,
+                    'current_page': page,
+                    'items_per_page': limit,
+                    'embeddings': []
+                }, 410
+            except Exception as e:
+                return {
+                    'status': 'error',
+                    'message': f'Collection not found. Please run sync first: {str(e)}',
+                    'total': 0,
+                    'total_pages': 0,
+                    'current_page': page,
+                    'items_per_page': limit,
+                    'embeddings': []
+                }, 404
             
-            if not results or not results['ids']:
+            # Tổng số lấy từ count(), không đọc toàn bộ dữ liệu
+            total = collection.count()
+            if total == 0:
                 return {
                     'status': 'error',
                     'message': 'No data found in the collection',
@@ -465,9 +651,15 @@ class GetEmbeddings(Resource):
                     'embeddings': []
                 }, 404
             
+            total_pages = math.ceil(total / limit)
+            offset = min(offset, (total_pages - 1) * limit)  # Đảm bảo trang nằm trong khoảng hợp lệ
+            
+            # Chỉ đọc embedding và document của trang hiện tại
+            results = fetch_page(collection, ['embeddings', 'documents'], offset, limit, sort_by, sort_order, total)
+            
             # Format kết quả
             formatted_embeddings = []
-            for i, (id, embedding, document) in enumerate(zip(results['ids'], results['embeddings'], results['documents'])):
+            for id, embedding, document in zip(results['ids'], results.get('embeddings') or [], results.get('documents') or []):
                 if embedding is not None:
                     formatted_embeddings.append({
                         'id': id,
@@ -475,30 +667,17 @@ class GetEmbeddings(Resource):
                         'document': document
                     })
             
-            if not formatted_embeddings:
-                return {
-                    'status': 'error',
-                    'message': 'No embeddings found in the collection',
-                    'total': 0,
-                    'total_pages': 0,
-                    'current_page': page,
-                    'items_per_page': limit,
-                    'embeddings': []
-                }, 404
-            
-            # Phân trang kết quả
-            paginated_results, total, total_pages = paginate_results(
-                formatted_embeddings, page, limit, sort_by, sort_order
-            )
-            
+            next_offset = offset + limit
             return {
                 'status': 'success',
-                'message': f'Retrieved {len(paginated_results)} embeddings',
+                'message': f'Retrieved {len(formatted_embeddings)} embeddings',
                 'total': total,
                 'total_pages': total_pages,
-                'current_page': page,
+                'current_page': offset // limit + 1,
                 'items_per_page': limit,
-                'embeddings': paginated_results
+                'next_cursor': encode_cursor(version, next_offset, sort_by, sort_order) if next_offset < total else None,
+                'index_version': version,
+                'embeddings': formatted_embeddings
             }
             
         except Exception as e:
@@ -512,19 +691,59 @@ class GetEmbeddings(Resource):
                 'embeddings': []
             }, 500
 
+@travel_chatbot_ns.route('/embeddings/export')
+class ExportEmbeddings(Resource):
+    @travel_chatbot_ns.expect(export_parser)
+    @travel_chatbot_ns.produces(['application/octet-stream'])
+    def get(self):
+        """Stream all ids and embeddings as a .npy structured array (fields: id, embedding)"""
+        args = export_parser.parse_args()
+        dtype = args['dtype']
+        chunk_size = args['chunk_size']
+        
+        if dtype not in EXPORT_DTYPES:
+            return {'status': 'error', 'message': f"dtype must be one of: {', '.join(EXPORT_DTYPES)}"}, 400
+        if chunk_size < 1 or chunk_size > 10000:
+            return {'status': 'error', 'message': 'chunk_size must be between 1 and 10000'}, 400
+        
+        try:
+            # Cố định phiên bản index để dữ liệu không thay đổi trong lúc stream
+            version = get_active_index_version()
+            collection = get_collection_for_version(version)
+            ids = collection.get(include=[])['ids']
+        except Exception as e:
+            return {'status': 'error', 'message': f'Collection not found. Please run sync first: {str(e)}'}, 404
+        
+        if not ids:
+            return {'status': 'error', 'message': 'No data found in the collection'}, 404
+        
+        first = collection.get(ids=ids[:1], include=['embeddings'])['embeddings'][0]
+        record_dtype = build_export_dtype(ids, len(first), dtype)
+        
+        return Response(
+            stream_with_context(iter_npy_export(collection, ids, record_dtype, chunk_size)),
+            mimetype='application/octet-stream',
+            headers={
+                'Content-Disposition': f'attachment; filename=embeddings_v{version}_{dtype}.npy',
+                'X-Index-Version': str(version),
+                'X-Total-Count': str(len(ids)),
+                'X-Embedding-Dimension': str(len(first))
+            }
+        )
+
 @travel_chatbot_ns.route('/metadata')
 class GetMetadata(Resource):
     @travel_chatbot_ns.expect(pagination_parser)
     @travel_chatbot_ns.marshal_with(metadata_response_model)
     def get(self):
-        """Get metadata from the database with pagination"""
+        """Get metadata from the database with pagination (page or cursor)"""
+        page = 1
+        limit = 10
         try:
             # Parse parameters
             args = pagination_parser.parse_args()
             page = args['page']
             limit = args['limit']
-            sort_by = args['sort_by']
-            sort_order = args['sort_order']
             
             # Validate parameters
             if limit < 1 or limit > 100:
@@ -538,12 +757,29 @@ class GetMetadata(Resource):
                     'metadata': []
                 }, 400
             
-            # Kiểm tra collection tồn tại
+            # Kiểm tra collection tồn tại (theo phiên bản trong cursor nếu có)
             try:
-                collection = chroma_client.get_collection(
-                    name="diadiem_collection",
-                    embedding_function=sentence_transformer_ef
-                )
+                collection, version, offset, sort_by, sort_order = resolve_page_request(args)
+            except ValueError as e:
+                return {
+                    'status': 'error',
+                    'message': str(e),
+                    'total': 0,
+                    'total_pages': 0,
+                    'current_page': page,
+                    'items_per_page': limit,
+                    'metadata': []
+                }, 400
+            except LookupError as e:
+                return {
+                    'status': 'error',
+                    'message': str(e),
+                    'total': 0,
+                    'total_pages': 0,
+                    'current_page': page,
+                    'items_per_page': limit,
+                    'metadata': []
+                }, 410
             except Exception as e:
                 return {
                     'status': 'error',
@@ -555,11 +791,12 @@ class GetMetadata(Resource):
                     'metadata': []
                 }, 404
             
-            # Lấy tất cả dữ liệu
+            # Chỉ đọc metadata của trang hiện tại
             try:
-                results = collection.get(
-                    include=['metadatas']
-                )
+                total = collection.count()
+                total_pages = math.ceil(total / limit)
+                offset = min(offset, max(total_pages - 1, 0) * limit)  # Đảm bảo trang nằm trong khoảng hợp lệ
+                results = fetch_page(collection, ['metadatas'], offset, limit, sort_by, sort_order, total)
             except Exception as e:
                 return {
                     'status': 'error',
@@ -571,7 +808,7 @@ class GetMetadata(Resource):
                     'metadata': []
                 }, 500
             
-            if not results or not results['ids']:
+            if total == 0 or not results['ids']:
                 return {
                     'status': 'error',
                     'message': 'No data found in the collection. Please run sync first.',
@@ -584,7 +821,7 @@ class GetMetadata(Resource):
             
             # Format kết quả
             formatted_metadata = []
-            for i, (id, metadata) in enumerate(zip(results['ids'], results['metadatas'])):
+            for id, metadata in zip(results['ids'], results['metadatas']):
                 if metadata is not None:
                     formatted_metadata.append({
                         'id': id,
@@ -593,30 +830,17 @@ class GetMetadata(Resource):
                         'additional_info': {k: v for k, v in metadata.items() if k not in ['ten_dia_diem', 'mo_ta']}
                     })
             
-            if not formatted_metadata:
-                return {
-                    'status': 'error',
-                    'message': 'No metadata found in the collection. Please check your data.',
-                    'total': 0,
-                    'total_pages': 0,
-                    'current_page': page,
-                    'items_per_page': limit,
-                    'metadata': []
-                }, 404
-            
-            # Phân trang kết quả
-            paginated_results, total, total_pages = paginate_results(
-                formatted_metadata, page, limit, sort_by, sort_order
-            )
-            
+            next_offset = offset + limit
             return {
                 'status': 'success',
-                'message': f'Retrieved {len(paginated_results)} metadata entries',
+                'message': f'Retrieved {len(formatted_metadata)} metadata entries',
                 'total': total,
                 'total_pages': total_pages,
-                'current_page': page,
+                'current_page': offset // limit + 1,
                 'items_per_page': limit,
-                'metadata': paginated_results
+                'next_cursor': encode_cursor(version, next_offset, sort_by, sort_order) if next_offset < total else None,
+                'index_version': version,
+                'metadata': formatted_metadata
             }
             
         except Exception as e:
@@ -632,24 +856,71 @@ class GetMetadata(Resource):
 
 @travel_chatbot_ns.route('/sync-diadiem')
 class SyncDiadiem(Resource):
-    @travel_chatbot_ns.marshal_with(sync_response_model)
+    @travel_chatbot_ns.response(202, 'Sync job started', reindex_job_model)
+    @travel_chatbot_ns.response(409, 'A sync job is already running, or this worker is read-only')
     def post(self):
-        """Sync and process diadiem.csv data"""
-        try:
-            # Xử lý file diadiem.csv
-            process_diadiem()
-            
+        """Start syncing diadiem.csv in the background, returns the job to poll"""
+        if Config.INDEX_ROLE == 'reader':
+            # Worker chỉ đọc không sync; process writer sở hữu việc ingest và publish snapshot
             return {
-                'status': 'success',
-                'message': 'Successfully processed diadiem.csv and generated vectors',
-                'processed_count': 1  # Số lượng file đã xử lý
-            }
-            
-        except Exception as e:
+                'status': 'error',
+                'message': 'Sync is disabled on read-only workers (INDEX_ROLE=reader), run it on the writer process'
+            }, 409
+        try:
+            # Đồng bộ tăng dần file diadiem.csv trong thread nền (chỉ embed lại các dòng thay đổi)
+            job = reindex_job_manager.start_job()
+            return travel_chatbot_ns.marshal(job, reindex_job_model), 202
+        except ReindexJobBusy as e:
             return {
                 'status': 'error',
                 'message': str(e),
-                'processed_count': 0
-            }, 500
+                'job': travel_chatbot_ns.marshal(e.job, reindex_job_model)
+            }, 409
+
+@travel_chatbot_ns.route('/sync-diadiem/jobs')
+class SyncDiadiemJobs(Resource):
+    @travel_chatbot_ns.marshal_with(reindex_jobs_response_model)
+    def get(self):
+        """List recent sync jobs"""
+        return {'jobs': reindex_job_manager.list_jobs()}
+
+@travel_chatbot_ns.route('/sync-diadiem/jobs/<string:job_id>')
+class SyncDiadiemJob(Resource):
+    @travel_chatbot_ns.response(404, 'Job not found')
+    def get(self, job_id):
+        """Get progress, throughput, ETA and errors of a sync job"""
+        job = reindex_job_manager.get_job(job_id)
+        if job is None:
+            return {'status': 'error', 'message': f'Job {job_id} not found'}, 404
+        return travel_chatbot_ns.marshal(job, reindex_job_model)
 
+@travel_chatbot_ns.route('/sync-diadiem/jobs/<string:job_id>/cancel')
+class CancelSyncDiadiemJob(Resource):
+    @travel_chatbot_ns.response(404, 'Job not found')
+    def post(self, job_id):
+        """Cancel a sync job; the active index keeps serving and the partial build is dropped"""
+        job = reindex_job_manager.cancel_job(job_id)
+        if job is None:
+            return {'status': 'error', 'message': f'Job {job_id} not found'}, 404
+        return travel_chatbot_ns.marshal(job, reindex_job_model)
 
+@travel_chatbot_ns.route('/query-cache/stats')
+class QueryCacheStats(Resource):
+    @travel_chatbot_ns.marshal_with(query_cache_stats_model)
+    def get(self):
+        """Get hit/miss counters of the query embedding cache"""
+        return query_embedding_cache.stats()
+
+@travel_chatbot_ns.route('/answer-cache/stats')
+class AnswerCacheStats(Resource):
+    @travel_chatbot_ns.marshal_with(query_cache_stats_model)
+    def get(self):
+        """Get hit/miss counters of the semantic answer cache"""
+        return semantic_answer_cache.stats()
+
+@travel_chatbot_ns.route('/llm-cache/stats')
+class LLMCacheStats(Resource):
+    @travel_chatbot_ns.marshal_with(query_cache_stats_model)
+    def get(self):
+        """Get hit/miss counters (this worker) and size of the persistent OpenAI response cache"""
+        return llm_response_cache.stats()
@@ -0,0 +1,122 @@
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+from src.config.config import Config
+from src.nlp_model.query_cache import query_embedding_cache, normalize_query
+from src.nlp_model.vector_store import get_active_index_version
+
+
+class SemanticAnswerCache:
+    """
+    Cache câu trả lời theo ngữ nghĩa: câu hỏi mới có embedding gần (cosine >= ngưỡng) với một câu hỏi
+    đã trả lời cùng ngôn ngữ thì dùng lại kết quả cũ, bỏ qua các lần gọi OpenAI và tìm kiếm.
+    Có TTL, giới hạn kích thước theo LRU và tự xóa khi phiên bản index thay đổi.
+    """
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600, similarity_threshold: float = 0.92):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        # khóa (ngôn ngữ, câu hỏi đã chuẩn hóa) -> {'embedding', 'result', 'created_at'}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _unit_vector(question: str) -> np.ndarray:
+        embedding = np.asarray(query_embedding_cache.get_embedding(question), dtype=np.float32)
+        return embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+
+    def _check_index_version(self):
+        """Xóa cache khi index đã được sync sang phiên bản mới (gọi khi đang giữ khóa)"""
+        version = get_active_index_version()
+        if version != self._index_version:
+            if self._entries:
+                print(f"Index chuyển sang phiên bản {version}, xóa {len(self._entries)} câu trả lời đã cache")
+            self._entries.clear()
+            self._index_version = version
+
+    def _remove_expired(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry['created_at'] > self.ttl_seconds]
+        for key in expired:
+            del self._entries[key]
+
+    def lookup(self, question: str, language: str) -> Optional[Dict[str, Any]]:
+        """
+        Tìm câu trả lời đã cache cho câu hỏi tương tự cùng ngôn ngữ
+
+        Args:
+            question (str): Câu hỏi của người dùng
+            language (str): Ngôn ngữ đã nhận diện của câu hỏi
+
+        Returns:
+            Optional[Dict[str, Any]]: Bản sao kết quả process_travel_question đã lưu, None nếu không có
+        """
+        embedding = self._unit_vector(question)
+        with self._lock:
+            self._check_index_version()
+            self._remove_expired(time.monotonic())
+
+            keys = [key for key in self._entries if key[0] == language]
+            if not keys:
+                self.misses += 1
+                return None
+
+            matrix = np.vstack([self._entries[key]['embedding'] for key in keys])
+            similarities = matrix @ embedding
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(keys[best])
+            self.hits += 1
+            print(f"Answer cache hit ({similarities[best]:.3f}): '{question}' ~ '{keys[best][1]}'")
+            return copy.deepcopy(self._entries[keys[best]]['result'])
+
+    def store(self, question: str, language: str, result: Dict[str, Any]):
+        """Lưu kết quả đã xử lý thành công của một câu hỏi"""
+        embedding = self._unit_vector(question)
+        with self._lock:
+            self._check_index_version()
+            key = (language, normalize_query(question))
+            self._entries[key] = {
+                'embedding': embedding,
+                'result': copy.deepcopy(result),
+                'created_at': time.monotonic()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Thống kê hit/miss của cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+    def clear(self):
+        """Xóa toàn bộ cache và reset bộ đếm"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Instance dùng chung cho toàn process
+semantic_answer_cache = SemanticAnswerCache(
+    max_size=Config.ANSWER_CACHE_SIZE,
+    ttl_seconds=Config.ANSWER_CACHE_TTL_SECONDS,
+    similarity_threshold=Config.ANSWER_CACHE_SIMILARITY
+)
@@ -0,0 +1,69 @@
+import io
+from typing import Iterator, List
+import numpy as np
+
+# Xuất ma trận embedding dạng nhị phân .npy (mảng có cấu trúc gồm id và embedding),
+# ghi header trước rồi sinh dữ liệu theo từng khối để có thể stream mà không giữ toàn bộ trong bộ nhớ.
+# Đọc lại bằng: np.load(path) -> mảng với hai trường 'id' và 'embedding'.
+
+EXPORT_DTYPES = {
+    'float32': np.float32,
+    'float16': np.float16,
+}
+
+
+def build_export_dtype(ids: List[str], dimension: int, dtype: str = 'float32') -> np.dtype:
+    """
+    Kiểu dữ liệu của một bản ghi xuất: id (chuỗi Unicode độ dài cố định) và vector embedding
+
+    Args:
+        ids (List[str]): Toàn bộ id sẽ xuất (để tính độ dài chuỗi tối đa)
+        dimension (int): Số chiều embedding
+        dtype (str): float32 hoặc float16
+
+    Returns:
+        np.dtype: Kiểu bản ghi có cấu trúc
+    """
+    id_length = max((len(doc_id) for doc_id in ids), default=1)
+    return np.dtype([('id', f'<U{id_length}'), ('embedding', EXPORT_DTYPES[dtype], (dimension,))])
+
+
+def npy_header(record_dtype: np.dtype, count: int) -> bytes:
+    """Header .npy (phiên bản 1.0) cho mảng một chiều gồm count bản ghi"""
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, {
+        'descr': np.lib.format.dtype_to_descr(record_dtype),
+        'fortran_order': False,
+        'shape': (count,)
+    })
+    return buffer.getvalue()
+
+
+def iter_npy_export(collection, ids: List[str], record_dtype: np.dtype, chunk_size: int = 1000) -> Iterator[bytes]:
+    """
+    Sinh file .npy theo từng khối: header rồi các bản ghi, đọc embedding từ collection theo lô id
+
+    Args:
+        collection: Collection ChromaDB (nên cố định theo phiên bản để dữ liệu không đổi khi đang xuất)
+        ids (List[str]): Id cần xuất, theo thứ tự trong file
+        record_dtype (np.dtype): Kiểu bản ghi từ build_export_dtype
+        chunk_size (int): Số bản ghi đọc và ghi mỗi khối
+
+    Yields:
+        bytes: Header và dữ liệu nhị phân của từng khối
+    """
+    yield npy_header(record_dtype, len(ids))
+
+    for start in range(0, len(ids), chunk_size):
+        chunk_ids = ids[start:start + chunk_size]
+        data = collection.get(ids=chunk_ids, include=['embeddings'])
+        embeddings = dict(zip(data['ids'], data['embeddings']))
+        missing = [doc_id for doc_id in chunk_ids if doc_id not in embeddings]
+        if missing:
+            # Header đã khai báo số bản ghi nên không thể bỏ qua bản ghi bị thiếu
+            raise RuntimeError(f"Embeddings disappeared during export: {missing[:5]}")
+
+        records = np.empty(len(chunk_ids), dtype=record_dtype)
+        records['id'] = chunk_ids
+        records['embedding'] = np.asarray([embeddings[doc_id] for doc_id in chunk_ids], dtype=np.float32)
+        yield records.tobytes()
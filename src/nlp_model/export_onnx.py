@@ -0,0 +1,74 @@
+import os
+import sys
+import argparse
+
+workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(workspace_root)
+
+from src.config.config import Config
+from src.nlp_model.vector_store import get_onnx_model_dir
+from src.nlp_model.onnx_encoder import ONNX_MODEL_FILE, QUANTIZED_MODEL_FILE
+
+
+def export_onnx_encoder(model_name: str, output_dir: str, opset: int = 14, quantize: bool = True) -> str:
+    """
+    Xuất phần transformer của model SentenceTransformer sang ONNX và lượng tử hóa int8 động
+
+    Args:
+        model_name (str): Tên model SentenceTransformer (vd. paraphrase-multilingual-MiniLM-L12-v2)
+        output_dir (str): Thư mục ghi model.onnx, model_quantized.onnx và tokenizer
+        opset (int): Phiên bản ONNX opset
+        quantize (bool): Có tạo thêm bản lượng tử hóa int8 hay không
+
+    Returns:
+        str: Đường dẫn model được dùng để encode (bản int8 nếu có)
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device='cpu')
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(['Quán cà phê yên tĩnh ở quận 1'], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    onnx_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    print(f"Xuất {model_name} sang {onnx_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+
+    if not quantize:
+        return onnx_path
+
+    quantized_path = os.path.join(output_dir, QUANTIZED_MODEL_FILE)
+    print(f"Lượng tử hóa int8 động: {quantized_path}")
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    for path in (onnx_path, quantized_path):
+        print(f"  {os.path.basename(path)}: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+    return quantized_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the sentence encoder to ONNX (int8 dynamic quantisation)')
+    parser.add_argument('--model', default=Config.EMBEDDING_MODEL_NAME)
+    parser.add_argument('--output', default=get_onnx_model_dir())
+    parser.add_argument('--opset', type=int, default=14)
+    parser.add_argument('--no-quantize', action='store_true', help='Only export the float32 model')
+    args = parser.parse_args()
+
+    export_onnx_encoder(args.model, args.output, opset=args.opset, quantize=not args.no_quantize)
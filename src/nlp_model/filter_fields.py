@@ -0,0 +1,288 @@
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+# Chuẩn hóa các trường dùng để lọc (loại địa điểm, khu vực, giá) về giá trị chuẩn,
+# dùng chung cho bước ingest (lưu vào metadata) và bước tìm kiếm (tạo mệnh đề where)
+
+# Loại địa điểm: khóa chuẩn -> các từ khóa trong 5 ngôn ngữ
+CATEGORY_KEYWORDS = {
+    'cafe': ['cafe', 'café', 'cà phê', 'coffee', '咖啡', 'カフェ', 'コーヒー', '카페', '커피'],
+    'food': ['ẩm thực', 'quán ăn', 'nhà hàng', 'ăn vặt', 'food', 'cuisine', 'eatery', 'restaurant', 'snack',
+             '美食', '餐饮', '餐厅', '小吃', 'グルメ', '飲食', 'レストラン', 'スナック', '음식', '식당', '레스토랑', '간식'],
+    'shopping': ['trung tâm thương mại', 'mua sắm', 'thương mại', 'shopping', 'mall', 'commercial',
+                 '购物', '商业', 'ショッピング', '商業', '쇼핑', '상업'],
+    'market': ['chợ', 'market', '市场', '市場', '시장'],
+    'park': ['công viên', 'park', '公园', '公園', '공원'],
+    'museum': ['bảo tàng', 'museum', '博物馆', '博物館', '박물관'],
+    'historical': ['di tích', 'lịch sử', 'historical', 'heritage', 'history', '历史', '遗迹', '歴史', '遺跡', '역사', '유적'],
+    'pagoda': ['chùa', 'tâm linh', 'pagoda', 'temple', 'spiritual', '寺', '宗教', '사찰', '영성'],
+    'church': ['nhà thờ', 'church', 'cathedral', '教堂', '教会', '성당', '교회'],
+    'entertainment': ['giải trí', 'vui chơi', 'entertainment', 'amusement', '娱乐', '游乐', 'エンターテイメント', '遊園', '놀이', '오락'],
+    'kids': ['trẻ em', 'children', 'child', 'kid', '儿童', '子供', '어린이'],
+    'nature': ['thiên nhiên', 'sinh thái', 'dã ngoại', 'nature', 'ecological', 'picnic', '自然', '生态', '生態', '자연', '생태'],
+    'beach': ['bãi biển', 'beach', '海滩', 'ビーチ', '해변'],
+    'nightlife': ['bar', 'phố đêm', 'nightlife', '酒吧', 'バー', '나이트'],
+    'hotel': ['khách sạn', 'resort', 'nghỉ dưỡng', 'hotel', '酒店', '度假', 'ホテル', 'リゾート', '호텔', '리조트'],
+}
+
+# Khu vực có tên riêng: khóa chuẩn -> các cách viết trong 5 ngôn ngữ
+AREA_ALIASES = {
+    'tan_binh': ['tân bình', 'tan binh', '新宾', 'タンビン', '떤빈'],
+    'tan_phu': ['tân phú', 'tan phu', '新平', 'タンフー', '떤푸'],
+    'binh_tan': ['bình tân', 'binh tan', '平坦', '平新', '빙떤'],
+    'binh_thanh': ['bình thạnh', 'binh thanh', '平盛', 'ビンタン', '빈탄'],
+    'binh_chanh': ['bình chánh', 'binh chanh', '平昌', '平政', 'ビンチャン', '빙창'],
+    'go_vap': ['gò vấp', 'go vap', '戈瓦', '鹅邑', 'ゴーヴァップ', '고밥'],
+    'phu_nhuan': ['phú nhuận', 'phu nhuan', '富润', 'フーニュアン', '푸늬안', '푸누언'],
+    'hoc_mon': ['hóc môn', 'hoc mon', '霍蒙', 'ホックモン', '혹몬'],
+    'nha_be': ['nhà bè', 'nha be', '芽贝', 'ニャーベー', '냐베'],
+    'cu_chi': ['củ chi', 'cu chi', '古芝', 'クチ', '꾸찌'],
+    'can_gio': ['cần giờ', 'can gio', '芹苴', 'カンジオ', '껀저어', '깐저'],
+    'thu_duc': ['thủ đức', 'thu duc', '首德', 'トゥドゥック', '투득'],
+}
+
+# Quận số: Quận 1, District 1, Q1, 1区, 1구, 第一郡
+DISTRICT_NUMBER_PATTERNS = [
+    re.compile(r'qu[aậ]n\s*(\d{1,2})(?!\d)'),
+    re.compile(r'district\s*(\d{1,2})(?!\d)'),
+    re.compile(r'(?<![\w.])q\.?\s*(\d{1,2})(?!\d)'),
+    re.compile(r'(?<!\d)(\d{1,2})\s*[区구]'),
+]
+CHINESE_DISTRICT_PATTERN = re.compile(r'第([一二三四五六七八九十]+)郡')
+CHINESE_DIGITS = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
+# Giá: từ khóa miễn phí và mức giá trong câu hỏi
+FREE_KEYWORDS = ['miễn phí', 'free', '免费', '無料', '무료']
+PRICE_LEVEL_KEYWORDS = {
+    'free': FREE_KEYWORDS,
+    'low': ['rẻ', 'bình dân', 'cheap', 'budget', 'affordable', '便宜', '实惠', '安い', '格安', '저렴', '싼'],
+    'medium': ['trung bình', 'vừa phải', 'moderate', 'medium', 'mid-range', '中等', '手頃', '적당'],
+    'high': ['đắt', 'cao cấp', 'sang trọng', 'expensive', 'luxury', 'high-end', '贵', '高档', '高級', '高い', '비싼', '고급'],
+}
+PRICE_LEVEL_BUCKETS = {
+    'free': ['free'],
+    'low': ['free', 'low'],
+    'medium': ['medium'],
+    'high': ['high'],
+}
+# Ngôn ngữ của địa điểm (cột ngon_ngu): khóa chuẩn -> các cách viết
+SUPPORTED_LANGUAGES = ['vietnamese', 'english', 'chinese', 'japanese', 'korean']
+LANGUAGE_ALIASES = {
+    'vietnamese': ['vietnamese', 'vi', 'vn', 'tiếng việt', 'tieng viet'],
+    'english': ['english', 'en', 'tiếng anh'],
+    'chinese': ['chinese', 'zh', 'cn', 'zh-cn', 'tiếng trung', '中文'],
+    'japanese': ['japanese', 'ja', 'jp', 'tiếng nhật', '日本語'],
+    'korean': ['korean', 'ko', 'kr', 'tiếng hàn', '한국어'],
+}
+
+LOW_PRICE_MAX = 50000
+MEDIUM_PRICE_MAX = 200000
+# Số tiền kèm đơn vị ngay sau nó: "50.000 VNĐ", "100k", "2 triệu", "1.5 million", "5万越南盾", "3만"
+PRICE_AMOUNT_PATTERN = re.compile(r'(\d+(?:[.,]\d+)*)\s*([^\W\d_]*)')
+THOUSANDS_PATTERN = re.compile(r'\d{1,3}(?:[.,]\d{3})+')
+# Đơn vị nhân: chữ Latin phải đứng riêng ("k", "tr"), chữ CJK có thể dính với chữ sau ("万越南盾", "만원")
+PRICE_UNITS_LATIN = {'k': 1000, 'nghìn': 1000, 'ngàn': 1000, 'ng': 1000, 'tr': 1000000, 'triệu': 1000000,
+                     'million': 1000000, 'millions': 1000000}
+PRICE_UNITS_CJK = [('百万', 1000000), ('백만', 1000000), ('千', 1000), ('천', 1000), ('万', 10000), ('만', 10000)]
+PRICE_UNIT_WORD_PATTERN = re.compile(r'(?<!\w)(?:nghìn|ngàn|triệu|million)(?!\w)|[千万천만]')
+
+
+def _normalize_text(value: Any) -> str:
+    """Chuẩn hóa văn bản: NFC, chữ thường, gộp khoảng trắng (bỏ qua giá trị không phải chuỗi)"""
+    if not isinstance(value, str):
+        return ''
+    return ' '.join(unicodedata.normalize('NFC', value).lower().split())
+
+
+def _is_latin(keyword: str) -> bool:
+    return all(not char.isalpha() or 'LATIN' in unicodedata.name(char, '') for char in keyword)
+
+
+def _keyword_pattern(keyword: str) -> re.Pattern:
+    """
+    Từ khóa chữ Latin (Việt, Anh) khớp theo ranh giới từ, cho phép số nhiều -s/-es
+    ('bar' không khớp "barbecue", 'park' không khớp "parking"); từ khóa CJK không có
+    khoảng trắng giữa các từ nên khớp theo chuỗi con
+    """
+    if _is_latin(keyword):
+        return re.compile(rf'(?<!\w){re.escape(keyword)}(?:s|es)?(?!\w)')
+    return re.compile(re.escape(keyword))
+
+
+def _compile_keywords(keywords_by_key: Dict[str, List[str]]) -> Dict[str, List[re.Pattern]]:
+    return {key: [_keyword_pattern(keyword) for keyword in keywords] for key, keywords in keywords_by_key.items()}
+
+
+def _contains_any(text: str, patterns: List[re.Pattern]) -> bool:
+    return any(pattern.search(text) for pattern in patterns)
+
+
+CATEGORY_PATTERNS = _compile_keywords(CATEGORY_KEYWORDS)
+PRICE_LEVEL_PATTERNS = _compile_keywords(PRICE_LEVEL_KEYWORDS)
+FREE_PATTERNS = PRICE_LEVEL_PATTERNS['free']
+
+
+def normalize_categories(value: Any) -> List[str]:
+    """Chuyển loại địa điểm (5 ngôn ngữ) thành danh sách khóa chuẩn"""
+    text = _normalize_text(value)
+    if not text:
+        return []
+    return [key for key, patterns in CATEGORY_PATTERNS.items() if _contains_any(text, patterns)]
+
+
+def normalize_area(value: Any) -> Optional[str]:
+    """Chuyển khu vực (5 ngôn ngữ) thành khóa chuẩn, lấy khu vực xuất hiện đầu tiên"""
+    text = _normalize_text(value)
+    if not text:
+        return None
+
+    candidates = []
+    for key, aliases in AREA_ALIASES.items():
+        for alias in aliases:
+            position = text.find(alias)
+            if position >= 0:
+                candidates.append((position, key))
+    for pattern in DISTRICT_NUMBER_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            candidates.append((match.start(), f"quan_{int(match.group(1))}"))
+    match = CHINESE_DISTRICT_PATTERN.search(text)
+    if match:
+        digits = match.group(1)
+        if digits.startswith('十'):
+            number = 10 + CHINESE_DIGITS.get(digits[1:], 0)
+        else:
+            number = CHINESE_DIGITS.get(digits, 0)
+        if number:
+            candidates.append((match.start(), f"quan_{number}"))
+
+    if not candidates:
+        return None
+    return min(candidates)[1]
+
+
+def _parse_price_number(text: str) -> float:
+    """ "50.000" / "50,000" là phân tách hàng nghìn, "1,5" / "1.5" là số thập phân"""
+    if THOUSANDS_PATTERN.fullmatch(text):
+        return float(re.sub(r'[.,]', '', text))
+    parts = re.split(r'[.,]', text)
+    if len(parts) == 2:
+        return float(f"{parts[0]}.{parts[1]}")
+    return float(''.join(parts))
+
+
+def _price_multiplier(word: str) -> Optional[float]:
+    """Hệ số của đơn vị đứng ngay sau số tiền (None nếu không có đơn vị nhân)"""
+    if word in PRICE_UNITS_LATIN:
+        return PRICE_UNITS_LATIN[word]
+    for unit, multiplier in PRICE_UNITS_CJK:
+        if word.startswith(unit):
+            return multiplier
+    return None
+
+
+def normalize_price_bucket(value: Any) -> str:
+    """Chuyển giá vé thành mức giá chuẩn: free, low, medium, high hoặc unknown"""
+    text = _normalize_text(value)
+    if not text:
+        return 'unknown'
+    if _contains_any(text, FREE_PATTERNS):
+        return 'free'
+    amounts = [(_parse_price_number(match.group(1)), _price_multiplier(match.group(2)))
+               for match in PRICE_AMOUNT_PATTERN.finditer(text)]
+    if not amounts:
+        return 'unknown'
+    number, multiplier = amounts[0]
+    if multiplier is None:
+        # Khoảng giá "100 - 200 nghìn": đơn vị chỉ viết sau số cuối
+        multiplier = next((unit for _, unit in amounts[1:] if unit is not None), None)
+    if multiplier is None:
+        if PRICE_UNIT_WORD_PATTERN.search(text):
+            # Có đơn vị nhưng không gắn được vào số nào: không đoán mức giá
+            return 'unknown'
+        multiplier = 1
+    price = number * multiplier
+    if price <= LOW_PRICE_MAX:
+        return 'low'
+    if price <= MEDIUM_PRICE_MAX:
+        return 'medium'
+    return 'high'
+
+
+def normalize_language(value: Any) -> Optional[str]:
+    """Chuyển giá trị cột ngon_ngu thành tên ngôn ngữ chuẩn (vietnamese, english, chinese, japanese, korean)"""
+    text = _normalize_text(value)
+    if not text:
+        return None
+    for key, aliases in LANGUAGE_ALIASES.items():
+        if text in aliases:
+            return key
+    return None
+
+
+def build_filter_metadata(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tạo các trường lọc đã chuẩn hóa để lưu vào metadata khi ingest
+
+    Args:
+        row (Dict[str, Any]): Một dòng dữ liệu địa điểm
+
+    Returns:
+        Dict[str, Any]: Các trường khu_vuc_norm, gia_bucket, language và cờ loai_<khóa>
+    """
+    metadata = {
+        'khu_vuc_norm': normalize_area(row.get('khu_vuc')) or 'unknown',
+        'gia_bucket': normalize_price_bucket(row.get('gia_ve')),
+        'language': normalize_language(row.get('ngon_ngu')) or 'unknown',
+    }
+    for key in normalize_categories(row.get('loai_dia_diem')):
+        metadata[f"loai_{key}"] = 1
+    return metadata
+
+
+def build_where_clause(extracted_features: Dict[str, Any], language: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Chuyển các thực thể loai_dia_diem / khu_vuc / gia (và ngôn ngữ nếu có) thành mệnh đề where
+    của ChromaDB. Những giá trị không ánh xạ được về khóa chuẩn thì không được dùng để lọc.
+
+    Args:
+        extracted_features (Dict[str, Any]): Thực thể trích xuất từ câu hỏi
+        language (Optional[str]): Chỉ lấy địa điểm của ngôn ngữ này
+
+    Returns:
+        Optional[Dict[str, Any]]: Mệnh đề where hoặc None nếu không có bộ lọc
+    """
+    extracted_features = extracted_features or {}
+    conditions = []
+
+    language = normalize_language(language)
+    if language:
+        conditions.append({'language': language})
+
+    categories = normalize_categories(extracted_features.get('loai_dia_diem'))
+    if len(categories) == 1:
+        conditions.append({f"loai_{categories[0]}": 1})
+    elif categories:
+        conditions.append({'$or': [{f"loai_{key}": 1} for key in categories]})
+
+    area = normalize_area(extracted_features.get('khu_vuc'))
+    if area:
+        conditions.append({'khu_vuc_norm': area})
+
+    price_text = _normalize_text(extracted_features.get('gia'))
+    if price_text:
+        buckets = []
+        for level, patterns in PRICE_LEVEL_PATTERNS.items():
+            if _contains_any(price_text, patterns):
+                buckets.extend(bucket for bucket in PRICE_LEVEL_BUCKETS[level] if bucket not in buckets)
+        if len(buckets) == 1:
+            conditions.append({'gia_bucket': buckets[0]})
+        elif buckets:
+            conditions.append({'gia_bucket': {'$in': buckets}})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {'$and': conditions}
@@ -0,0 +1,106 @@
+import math
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+# Xếp hạng theo vị trí: tọa độ địa điểm được lưu trong metadata (latitude / longitude) khi ingest,
+# khoảng cách haversine tới vị trí người dùng được tính một lần cho cả tập ứng viên bằng NumPy.
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def parse_coordinate(value: Any, limit: float) -> Optional[float]:
+    """Chuyển giá trị sang float trong khoảng [-limit, limit], None nếu rỗng / NaN / ngoài khoảng"""
+    try:
+        coordinate = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(coordinate) or abs(coordinate) > limit:
+        return None
+    return coordinate
+
+
+def parse_location(latitude: Any, longitude: Any) -> Optional[Tuple[float, float]]:
+    """
+    Kiểm tra và chuẩn hóa vị trí người dùng
+
+    Args:
+        latitude (Any): Vĩ độ
+        longitude (Any): Kinh độ
+
+    Returns:
+        Optional[Tuple[float, float]]: (vĩ độ, kinh độ) hoặc None nếu không có vị trí
+
+    Raises:
+        ValueError: Khi chỉ có một trong hai giá trị hoặc giá trị không hợp lệ
+    """
+    if latitude is None and longitude is None:
+        return None
+    lat = parse_coordinate(latitude, 90)
+    lon = parse_coordinate(longitude, 180)
+    if lat is None or lon is None:
+        raise ValueError('latitude and longitude must both be provided as valid coordinates')
+    return lat, lon
+
+
+def build_geo_metadata(row: Dict[str, Any]) -> Dict[str, float]:
+    """Trường latitude / longitude cho metadata (bỏ qua nếu thiếu hoặc không hợp lệ)"""
+    lat = parse_coordinate(row.get('latitude'), 90)
+    lon = parse_coordinate(row.get('longitude'), 180)
+    if lat is None or lon is None:
+        return {}
+    return {'latitude': lat, 'longitude': lon}
+
+
+def haversine_km(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Khoảng cách (km) từ một điểm tới mảng các điểm"""
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - np.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def blend_geo_score(similarity: float, proximity: Optional[float], weight: float) -> float:
+    """Điểm kết hợp độ liên quan và độ gần; địa điểm không có tọa độ giữ nguyên điểm liên quan"""
+    if proximity is None:
+        return similarity
+    return (1 - weight) * similarity + weight * proximity
+
+
+def apply_geo_ranking(results: List[Dict[str, Any]], location: Tuple[float, float], weight: float,
+                      scale_km: float) -> List[Dict[str, Any]]:
+    """
+    Gắn distance_km / geo_proximity cho từng kết quả và sắp xếp lại theo điểm kết hợp
+
+    Args:
+        results (List[Dict[str, Any]]): Kết quả tìm kiếm (id, metadata, distance, ...)
+        location (Tuple[float, float]): (vĩ độ, kinh độ) của người dùng
+        weight (float): Trọng số của độ gần trong điểm kết hợp (0-1)
+        scale_km (float): Khoảng cách mà độ gần giảm còn 1/e
+
+    Returns:
+        List[Dict[str, Any]]: Kết quả đã sắp xếp lại (kết quả khớp bộ lọc vẫn đứng trước)
+    """
+    located = []
+    for index, result in enumerate(results):
+        geo = build_geo_metadata(result.get('metadata') or {})
+        if geo:
+            located.append((index, geo['latitude'], geo['longitude']))
+
+    if located:
+        rows = np.asarray(located, dtype=np.float64)
+        distances = haversine_km(location[0], location[1], rows[:, 1], rows[:, 2])
+        proximities = np.exp(-distances / max(scale_km, 1e-6))
+        for (index, _, _), distance, proximity in zip(located, distances, proximities):
+            results[index]['distance_km'] = round(float(distance), 3)
+            results[index]['geo_proximity'] = float(proximity)
+
+    def score(result):
+        # Khoảng cách 0 (hoặc hơi âm do sai số làm tròn của 2 - 2*cos) là khớp nhất;
+        # chỉ kết quả không có khoảng cách mới có độ liên quan 0
+        distance = result.get('distance')
+        similarity = 1 / (1 + max(float(distance), 0.0)) if distance is not None else 0.0
+        return blend_geo_score(similarity, result.get('geo_proximity'), weight)
+
+    return sorted(results, key=lambda result: (result.get('matched_filters', True), score(result)), reverse=True)
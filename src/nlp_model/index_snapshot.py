@@ -0,0 +1,123 @@
+import os
+import re
+import json
+import shutil
+from datetime import datetime
+from typing import List, Optional
+from src.config.config import Config
+from src.nlp_model.vector_store import (
+    get_collection, get_active_index_version, get_snapshot_root, get_current_snapshot_dir,
+    CURRENT_SNAPSHOT_LINK, SNAPSHOT_MANIFEST_FILE
+)
+from src.nlp_model.search_backends import NumpySearchBackend, METADATA_FILE
+from src.nlp_model.keyword_index import KeywordIndex, SNAPSHOT_KEYWORD_INDEX_FILE
+
+# Snapshot index chỉ đọc cho triển khai nhiều worker (gunicorn): một process writer sở hữu việc
+# sync ChromaDB và publish snapshot (ma trận vector .npy + metadata + index từ khóa) vào một thư mục
+# bất biến, rồi đổi symlink 'current' một cách nguyên tử. Các worker reader memory-map file .npy
+# nên dùng chung trang bộ nhớ qua page cache của hệ điều hành và không mở SQLite của ChromaDB.
+#
+# Publish snapshot của collection đang hoạt động: python -m src.nlp_model.index_snapshot
+
+SNAPSHOT_PATTERN = re.compile(r'^v(\d+)_(\d+)$')
+
+
+def _make_read_only(snapshot_dir: str):
+    """Bỏ quyền ghi trên các file của snapshot để không bị sửa sau khi publish"""
+    for name in os.listdir(snapshot_dir):
+        os.chmod(os.path.join(snapshot_dir, name), 0o444)
+
+
+def _swap_current_link(root: str, snapshot_name: str):
+    """Trỏ symlink 'current' sang snapshot mới: tạo symlink tạm rồi os.replace (nguyên tử trên POSIX)"""
+    link_path = os.path.join(root, CURRENT_SNAPSHOT_LINK)
+    tmp_link = f"{link_path}.{os.getpid()}.tmp"
+    if os.path.lexists(tmp_link):
+        os.remove(tmp_link)
+    os.symlink(snapshot_name, tmp_link)
+    os.replace(tmp_link, link_path)
+
+
+def list_snapshots() -> List[str]:
+    """Tên các thư mục snapshot đã publish, cũ nhất trước"""
+    root = get_snapshot_root()
+    if not os.path.isdir(root):
+        return []
+    names = [name for name in os.listdir(root) if SNAPSHOT_PATTERN.match(name)]
+    return sorted(names, key=lambda name: tuple(int(part) for part in SNAPSHOT_PATTERN.match(name).groups()))
+
+
+def garbage_collect_snapshots(keep: int) -> List[str]:
+    """
+    Xóa các snapshot cũ, giữ lại keep snapshot mới nhất và luôn giữ snapshot đang được trỏ tới.
+    Worker còn memory-map file của snapshot đã xóa vẫn đọc được cho tới khi chuyển sang snapshot mới.
+
+    Args:
+        keep (int): Số snapshot được giữ lại
+
+    Returns:
+        List[str]: Tên các snapshot đã xóa
+    """
+    current = os.path.basename(get_current_snapshot_dir() or '')
+    snapshots = list_snapshots()
+    removed = []
+    for name in snapshots[:max(len(snapshots) - max(keep, 1), 0)]:
+        if name == current:
+            continue
+        shutil.rmtree(os.path.join(get_snapshot_root(), name), ignore_errors=True)
+        removed.append(name)
+    if removed:
+        print(f"Đã xóa snapshot cũ: {', '.join(removed)}")
+    return removed
+
+
+def publish_snapshot(collection=None, version: Optional[int] = None) -> str:
+    """
+    Tạo snapshot chỉ đọc từ một collection rồi chuyển symlink 'current' sang snapshot đó
+
+    Args:
+        collection: Collection ChromaDB nguồn (mặc định là collection đang hoạt động)
+        version (Optional[int]): Phiên bản index của collection (mặc định là phiên bản đang hoạt động)
+
+    Returns:
+        str: Đường dẫn thư mục snapshot đã publish
+    """
+    if collection is None:
+        collection = get_collection(create_if_missing=False)
+    if version is None:
+        version = get_active_index_version()
+
+    root = get_snapshot_root()
+    os.makedirs(root, exist_ok=True)
+    name = f"v{version}_{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
+    tmp_dir = os.path.join(root, f".{name}.tmp")
+    snapshot_dir = os.path.join(root, name)
+
+    try:
+        count = NumpySearchBackend.build(collection, tmp_dir)
+        with open(os.path.join(tmp_dir, METADATA_FILE), 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+        keyword_index = KeywordIndex.build(sidecar['ids'], sidecar['metadatas'], version)
+        keyword_index.save(os.path.join(tmp_dir, SNAPSHOT_KEYWORD_INDEX_FILE))
+        with open(os.path.join(tmp_dir, SNAPSHOT_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': version,
+                'collection': collection.name,
+                'count': count,
+                'dtype': sidecar.get('dtype', 'float32'),
+                'published_at': datetime.utcnow().isoformat()
+            }, f)
+        _make_read_only(tmp_dir)
+        os.rename(tmp_dir, snapshot_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _swap_current_link(root, name)
+    print(f"Đã publish snapshot {name} ({count} vector), symlink '{CURRENT_SNAPSHOT_LINK}' đã được chuyển")
+    garbage_collect_snapshots(Config.INDEX_VERSIONS_TO_KEEP)
+    return snapshot_dir
+
+
+if __name__ == '__main__':
+    publish_snapshot()
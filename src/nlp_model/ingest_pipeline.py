@@ -0,0 +1,130 @@
+import os
+import time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from src.config.config import Config
+from src.nlp_model.vector_store import get_embedding_function
+
+# Pipeline ingest hàng loạt: đọc các dòng (id, document, metadata) theo từng lô, encode bằng
+# pool nhiều process của SentenceTransformer rồi ghi vào ChromaDB theo từng đoạn có giới hạn.
+
+IngestRow = Tuple[str, str, Dict[str, Any]]
+
+
+def iter_batches(rows: Iterable[IngestRow], batch_size: int) -> Iterator[List[IngestRow]]:
+    """Chia luồng dòng dữ liệu thành các lô có kích thước batch_size mà không đọc hết vào bộ nhớ"""
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class EmbeddingIngestPipeline:
+    """
+    Encode và ghi document vào collection theo lô.
+    Khi workers > 1 và số document đủ lớn, việc encode được chia cho nhiều process
+    (SentenceTransformer multi-process pool) để tốc độ tăng theo số core CPU.
+    """
+
+    # Dưới ngưỡng này chi phí khởi động pool (load model trong từng process) lớn hơn lợi ích
+    MIN_DOCUMENTS_FOR_POOL = 1000
+
+    def __init__(self, batch_size: Optional[int] = None, write_batch_size: Optional[int] = None,
+                 workers: Optional[int] = None,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None):
+        self.batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        self.write_batch_size = write_batch_size or Config.INGEST_WRITE_BATCH_SIZE
+        workers = Config.INGEST_WORKERS if workers is None else workers
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.progress_callback = progress_callback
+
+    def _start_pool(self):
+        """Khởi động pool encode trên CPU, trả về (model, pool)"""
+        model = get_embedding_function()._model
+        print(f"Khởi động pool encode với {self.workers} process")
+        pool = model.start_multi_process_pool(target_devices=['cpu'] * self.workers)
+        return model, pool
+
+    def _encode(self, documents: List[str], model=None, pool=None) -> List[List[float]]:
+        """Encode một lô document, dùng pool nếu có, ngược lại dùng embedding function dùng chung"""
+        embedding_function = get_embedding_function()
+        if pool is None:
+            return embedding_function(documents)
+
+        chunk_size = max(1, -(-len(documents) // self.workers))
+        embeddings = model.encode_multi_process(documents, pool, chunk_size=chunk_size)
+        # Giữ cùng cách chuẩn hóa với embedding function dùng cho câu hỏi
+        if getattr(embedding_function, '_normalize_embeddings', False):
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.tolist()
+
+    def _write(self, collection, ids: List[str], embeddings: List[List[float]],
+               documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Ghi một lô vào collection theo từng đoạn write_batch_size"""
+        for start in range(0, len(ids), self.write_batch_size):
+            end = start + self.write_batch_size
+            collection.add(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end]
+            )
+
+    def run(self, collection, rows: Iterable[IngestRow], total: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Encode và ghi toàn bộ các dòng vào collection
+
+        Args:
+            collection: Collection ChromaDB đích
+            rows (Iterable[IngestRow]): Các dòng (id, document, metadata)
+            total (Optional[int]): Tổng số dòng (để tính phần trăm tiến độ và quyết định dùng pool)
+
+        Returns:
+            Dict[str, Any]: Số document, thời gian, tốc độ (docs/s) và số process đã dùng
+        """
+        # Pool nhiều process chỉ có với SentenceTransformer; encoder ONNX đã tự chạy đa luồng
+        use_pool = (
+            self.workers > 1
+            and (total or 0) >= self.MIN_DOCUMENTS_FOR_POOL
+            and hasattr(get_embedding_function(), '_model')
+        )
+        model, pool = self._start_pool() if use_pool else (None, None)
+
+        started_at = time.perf_counter()
+        processed = 0
+        try:
+            for batch in iter_batches(rows, self.batch_size):
+                ids = [row[0] for row in batch]
+                documents = [row[1] for row in batch]
+                metadatas = [row[2] for row in batch]
+
+                embeddings = self._encode(documents, model, pool)
+                self._write(collection, ids, embeddings, documents, metadatas)
+
+                processed += len(batch)
+                elapsed = time.perf_counter() - started_at
+                progress = {
+                    'processed': processed,
+                    'total': total,
+                    'elapsed_seconds': elapsed,
+                    'docs_per_second': processed / elapsed if elapsed > 0 else 0.0
+                }
+                percent = f" ({processed * 100 / total:.1f}%)" if total else ''
+                print(f"Ingest: {processed}/{total if total else '?'}{percent} - "
+                      f"{progress['docs_per_second']:.1f} docs/s")
+                if self.progress_callback:
+                    self.progress_callback(progress)
+        finally:
+            if pool is not None:
+                model.stop_multi_process_pool(pool)
+
+        elapsed = time.perf_counter() - started_at
+        return {
+            'documents': processed,
+            'seconds': elapsed,
+            'docs_per_second': processed / elapsed if elapsed > 0 else 0.0,
+            'workers': self.workers if use_pool else 1
+        }
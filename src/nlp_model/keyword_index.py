@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import math
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from src.config.config import Config
+from src.nlp_model.vector_store import workspace_root, get_collection, get_active_index_version, get_current_snapshot_dir
+from src.nlp_model.search_backends import matches_where
+
+# Chỉ mục từ khóa (inverted index) chấm điểm BM25 trên tên địa điểm, từ khóa, khu vực và loại
+# địa điểm. Dùng song song với tìm kiếm vector để tên riêng ("Bến Thành", "Landmark 81") được
+# xếp hạng đúng. Chữ Hán / kana / Hangul không có khoảng trắng nên được tách thành bigram ký tự.
+
+# Trường được đánh chỉ mục và trọng số (số lần lặp token của trường trong document)
+INDEXED_FIELDS = {
+    'ten_dia_diem': 3,
+    'tu_khoa': 2,
+    'khu_vuc': 1,
+    'loai_dia_diem': 1,
+}
+
+# Chỉ giữ các trường dùng để lọc trong file index, không lưu lại toàn bộ metadata
+FILTER_FIELDS = ('khu_vuc_norm', 'gia_bucket', 'language')
+FILTER_FIELD_PREFIX = 'loai_'
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Kana, chữ Hán (CJK Extension A và Unified Ideographs), Hangul
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af'
+TOKEN_PATTERN = re.compile(rf'[{CJK_CHARS}]+|[^\W{CJK_CHARS}]+')
+CJK_PATTERN = re.compile(rf'[{CJK_CHARS}]')
+
+
+def _fold_latin(token: str) -> str:
+    """Bỏ dấu tiếng Việt / Latin để 'Ben Thanh' khớp với 'Bến Thành'"""
+    token = token.replace('đ', 'd')
+    decomposed = unicodedata.normalize('NFD', token)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: Any) -> List[str]:
+    """
+    Tách văn bản thành token: từ Latin (bỏ dấu, chữ thường) và bigram ký tự cho chữ Hán / kana / Hangul
+
+    Args:
+        text (Any): Văn bản cần tách (giá trị không phải chuỗi trả về danh sách rỗng)
+
+    Returns:
+        List[str]: Danh sách token
+    """
+    if not isinstance(text, str):
+        return []
+    text = unicodedata.normalize('NFC', text).lower()
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text):
+        if CJK_PATTERN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(_fold_latin(run))
+    return tokens
+
+
+def document_tokens(metadata: Dict[str, Any]) -> List[str]:
+    """Token của một địa điểm, mỗi trường lặp lại theo trọng số trong INDEXED_FIELDS"""
+    tokens = []
+    for field, weight in INDEXED_FIELDS.items():
+        tokens.extend(tokenize(metadata.get(field)) * weight)
+    return tokens
+
+
+def filter_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Lấy các trường lọc đã chuẩn hóa từ metadata"""
+    return {
+        key: value for key, value in (metadata or {}).items()
+        if key in FILTER_FIELDS or key.startswith(FILTER_FIELD_PREFIX)
+    }
+
+
+class KeywordIndex:
+    """Inverted index BM25 trong bộ nhớ: token -> (mảng vị trí document, mảng tần suất)"""
+
+    def __init__(self, ids: List[str], doc_lengths: List[int], postings: Dict[str, Tuple[List[int], List[int]]],
+                 filters: List[Dict[str, Any]], version: int = 0):
+        self.ids = ids
+        self.version = version
+        self.filters = filters
+        self.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if len(ids) else 0.0
+        self.postings = {
+            token: (np.asarray(rows, dtype=np.int64), np.asarray(freqs, dtype=np.float32))
+            for token, (rows, freqs) in postings.items()
+        }
+        self._where_cache = {}
+
+    @classmethod
+    def build(cls, ids: List[str], metadatas: List[Dict[str, Any]], version: int = 0) -> 'KeywordIndex':
+        """
+        Tạo index từ metadata của các địa điểm
+
+        Args:
+            ids (List[str]): ID document
+            metadatas (List[Dict[str, Any]]): Metadata tương ứng
+            version (int): Phiên bản index vector đi kèm
+
+        Returns:
+            KeywordIndex: Index đã tạo
+        """
+        postings = {}
+        doc_lengths = []
+        for row, metadata in enumerate(metadatas):
+            tokens = document_tokens(metadata or {})
+            doc_lengths.append(len(tokens))
+            for token, freq in Counter(tokens).items():
+                rows, freqs = postings.setdefault(token, ([], []))
+                rows.append(row)
+                freqs.append(freq)
+        return cls(list(ids), doc_lengths, postings, [filter_metadata(m) for m in metadatas], version)
+
+    def save(self, path: str):
+        """Ghi index ra file JSON (ghi file tạm rồi đổi tên)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': self.version,
+                'ids': self.ids,
+                'doc_lengths': self.doc_lengths.astype(int).tolist(),
+                'filters': self.filters,
+                'postings': {
+                    token: [rows.tolist(), freqs.astype(int).tolist()]
+                    for token, (rows, freqs) in self.postings.items()
+                }
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'KeywordIndex':
+        """Đọc index từ file JSON"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['ids'], data['doc_lengths'], data['postings'], data['filters'], data.get('version', 0))
+
+    def _allowed_mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False)
+        mask = self._where_cache.get(key)
+        if mask is None:
+            mask = np.array([matches_where(metadata, where) for metadata in self.filters], dtype=bool)
+            if len(self._where_cache) >= 256:
+                self._where_cache.clear()
+            self._where_cache[key] = mask
+        return mask
+
+    def search(self, query: str, top_k: int = 10, where: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """
+        Tìm các địa điểm có điểm BM25 cao nhất cho câu hỏi
+
+        Args:
+            query (str): Câu hỏi
+            top_k (int): Số kết quả tối đa
+            where (Optional[Dict[str, Any]]): Mệnh đề where trên các trường lọc
+
+        Returns:
+            List[Tuple[str, float]]: (id, điểm BM25) theo thứ tự giảm dần, chỉ gồm document có điểm > 0
+        """
+        if not self.ids or top_k <= 0:
+            return []
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        total = len(self.ids)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            rows, freqs = posting
+            idf = math.log(1 + (total - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[rows] / max(self.avg_doc_length, 1e-6))
+            scores[rows] += idf * freqs * (BM25_K1 + 1) / (freqs + norm)
+
+        mask = self._allowed_mask(where)
+        if mask is not None:
+            scores[~mask] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        return [(self.ids[row], float(scores[row])) for row in candidates]
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """
+    Gộp nhiều bảng xếp hạng bằng Reciprocal Rank Fusion: score = tổng 1 / (k + hạng)
+
+    Args:
+        rankings (List[List[str]]): Các danh sách id theo thứ tự hạng (hạng bắt đầu từ 1)
+        k (int): Hằng số làm mượt của RRF
+
+    Returns:
+        Dict[str, float]: id -> điểm RRF
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+_index_lock = threading.Lock()
+_keyword_index = None
+# Thư mục snapshot của index đang load (chỉ dùng với INDEX_ROLE=reader)
+_keyword_index_snapshot = None
+# Tên file index từ khóa trong thư mục snapshot
+SNAPSHOT_KEYWORD_INDEX_FILE = 'keyword_index.json'
+
+
+def get_keyword_index_dir() -> str:
+    """Thư mục lưu index từ khóa (có thể ghi đè bằng biến môi trường KEYWORD_INDEX_DIR)"""
+    return Config.KEYWORD_INDEX_DIR or os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'keyword_index')
+
+
+def get_keyword_index_path(version: int) -> str:
+    """File index từ khóa của một phiên bản index vector"""
+    return os.path.join(get_keyword_index_dir(), f"keyword_index_v{version}.json")
+
+
+def build_keyword_index(ids: List[str], metadatas: List[Dict[str, Any]], version: int) -> KeywordIndex:
+    """Tạo và lưu index từ khóa cho một phiên bản index"""
+    index = KeywordIndex.build(ids, metadatas, version)
+    index.save(get_keyword_index_path(version))
+    print(f"Đã tạo index từ khóa với {len(ids)} địa điểm, {len(index.postings)} token (phiên bản {version})")
+    return index
+
+
+def remove_keyword_indexes(keep_versions: List[int]):
+    """Xóa file index từ khóa của các phiên bản không còn giữ lại"""
+    index_dir = get_keyword_index_dir()
+    if not os.path.isdir(index_dir):
+        return
+    pattern = re.compile(r'^keyword_index_v(\d+)\.json$')
+    for name in os.listdir(index_dir):
+        match = pattern.match(name)
+        if match and int(match.group(1)) not in keep_versions:
+            os.remove(os.path.join(index_dir, name))
+
+
+def get_keyword_index() -> KeywordIndex:
+    """
+    Lấy index từ khóa của phiên bản index đang hoạt động. Được load lại khi con trỏ
+    chuyển sang phiên bản mới; nếu chưa có file thì tạo từ metadata trong ChromaDB.
+    Worker INDEX_ROLE=reader đọc index từ khóa trong snapshot hiện tại.
+    """
+    global _keyword_index, _keyword_index_snapshot
+    if Config.INDEX_ROLE == 'reader':
+        # Worker chỉ đọc: index từ khóa nằm trong snapshot, load lại khi symlink chuyển snapshot
+        snapshot_dir = get_current_snapshot_dir()
+        if snapshot_dir is None:
+            raise RuntimeError("No index snapshot has been published yet (INDEX_ROLE=reader)")
+        with _index_lock:
+            if _keyword_index is None or _keyword_index_snapshot != snapshot_dir:
+                _keyword_index = KeywordIndex.load(os.path.join(snapshot_dir, SNAPSHOT_KEYWORD_INDEX_FILE))
+                _keyword_index_snapshot = snapshot_dir
+            return _keyword_index
+
+    version = get_active_index_version()
+    with _index_lock:
+        if _keyword_index is None or _keyword_index.version != version:
+            path = get_keyword_index_path(version)
+            if os.path.exists(path):
+                _keyword_index = KeywordIndex.load(path)
+            else:
+                print("Chưa có index từ khóa, tạo từ collection ChromaDB")
+                data = get_collection(create_if_missing=False).get(include=['metadatas'])
+                _keyword_index = build_keyword_index(data['ids'], data['metadatas'], version)
+        return _keyword_index
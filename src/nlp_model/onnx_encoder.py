@@ -0,0 +1,83 @@
+import os
+from typing import List, Optional
+import numpy as np
+
+# Encoder chạy bản ONNX (lượng tử hóa int8 động) của model SentenceTransformer bằng onnxruntime
+# trên CPU. Dùng thay cho SentenceTransformerEmbeddingFunction khi EMBEDDING_BACKEND=onnx:
+# cùng tokenizer, cùng mean pooling nên vector gần như trùng với model gốc nhưng không cần torch.
+# onnxruntime và tokenizers đã có sẵn theo chromadb, chỉ được import khi dùng tới.
+#
+# Tạo model bằng: python -m src.nlp_model.export_onnx
+
+ONNX_MODEL_FILE = 'model.onnx'
+QUANTIZED_MODEL_FILE = 'model_quantized.onnx'
+TOKENIZER_FILE = 'tokenizer.json'
+
+
+class OnnxEmbeddingFunction:
+    """
+    Embedding function tương thích ChromaDB (__call__(input) -> danh sách vector)
+    chạy model ONNX: tokenize, chạy session, mean pooling theo attention mask.
+    Session được gọi song song từ nhiều thread request (InferenceSession.run thread-safe);
+    mỗi lần chạy dùng threads luồng, mặc định chia đều core CPU cho concurrency lần chạy song song.
+    """
+
+    def __init__(self, model_dir: str, model_file: str = QUANTIZED_MODEL_FILE, max_length: int = 128,
+                 batch_size: int = 32, normalize_embeddings: bool = False, threads: Optional[int] = None,
+                 concurrency: int = 1):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, model_file)
+        tokenizer_path = os.path.join(model_dir, TOKENIZER_FILE)
+        for path in (model_path, tokenizer_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"ONNX encoder file not found: {path} (run python -m src.nlp_model.export_onnx)")
+
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self._normalize_embeddings = normalize_embeddings
+
+        self._tokenizer = Tokenizer.from_file(tokenizer_path)
+        self._tokenizer.enable_truncation(max_length=max_length)
+        pad_id = self._tokenizer.token_to_id('<pad>')
+        self._tokenizer.enable_padding(pad_id=pad_id if pad_id is not None else 0, pad_token='<pad>')
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Nhiều lần chạy song song, mỗi lần dùng một phần core: tổng số luồng không vượt quá số core
+        self.threads = threads or max(1, (os.cpu_count() or 1) // max(concurrency, 1))
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        self._session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self._input_names = {item.name for item in self._session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.asarray([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.asarray([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+
+        feed = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self._input_names:
+            feed['token_type_ids'] = np.asarray([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+        token_embeddings = self._session.run(None, feed)[0]
+
+        # Mean pooling giống module Pooling của SentenceTransformer
+        mask = attention_mask[..., np.newaxis].astype(np.float32)
+        embeddings = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self._normalize_embeddings:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode danh sách câu thành ma trận float32 (số câu x số chiều)"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack([
+            self._encode_batch(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ])
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        return self.encode(list(input)).tolist()
@@ -1,13 +1,185 @@
 import pandas as pd
-import chromadb
-from chromadb.utils import embedding_functions
 import os
 import json
+import fcntl
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from src.config.config import Config
+from src.nlp_model.vector_store import (
+    get_chroma_client, get_embedding_function, get_collection, get_active_index_version,
+    get_versioned_collection_name, list_collection_versions, set_active_collection,
+    garbage_collect_collections, get_partition_collection_name, delete_collection_with_partitions,
+    get_current_snapshot_dir, get_chroma_db_path
+)
+from src.nlp_model.filter_fields import build_filter_metadata
+from src.nlp_model.geo import build_geo_metadata
+from src.nlp_model.search_backends import build_numpy_index, remove_numpy_indexes, reset_search_backend
+from src.nlp_model.ingest_pipeline import EmbeddingIngestPipeline
+from src.nlp_model.keyword_index import build_keyword_index, remove_keyword_indexes
+from src.nlp_model.index_snapshot import publish_snapshot
 
-def process_diadiem():
+# Chỉ build một phiên bản index tại một thời điểm: lock giữa các thread trong process
+# và file lock (flock) giữa các process dùng chung thư mục dữ liệu (nhiều worker gunicorn)
+_sync_lock = threading.Lock()
+SYNC_LOCK_FILE = 'sync.lock'
+
+
+@contextmanager
+def _sync_file_lock():
+    """Giữ file lock sync.lock (cạnh thư mục ChromaDB) trong suốt quá trình sync"""
+    path = os.path.join(os.path.dirname(get_chroma_db_path()), SYNC_LOCK_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _sha256_json(payload: Dict[str, Any]) -> str:
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def compute_content_hash(document: str) -> str:
+    """
+    Tạo hash của dữ liệu đầu vào embedding (document, tên model và encoder backend).
+    Hash khác nghĩa là phải encode lại document.
+
+    Args:
+        document (str): Nội dung document được embed
+
+    Returns:
+        str: Chuỗi hex sha256
+    """
+    payload = {'document': document, 'model': Config.EMBEDDING_MODEL_NAME}
+    if Config.EMBEDDING_BACKEND == 'onnx':
+        # Vector của bản ONNX int8 lệch nhẹ so với model gốc: đổi backend thì encode lại để
+        # document và câu hỏi luôn dùng cùng một encoder (giữ nguyên hash cũ cho backend mặc định)
+        payload['backend'] = f"onnx:{Config.ONNX_MODEL_FILE}"
+    return _sha256_json(payload)
+
+
+def compute_metadata_hash(metadata: Dict[str, Any]) -> str:
+    """
+    Tạo hash của metadata (không gồm các trường hash). Hash khác nhưng content_hash giống
+    nghĩa là chỉ cần ghi metadata mới, embedding cũ được giữ nguyên.
+
+    Args:
+        metadata (Dict[str, Any]): Metadata của document
+
+    Returns:
+        str: Chuỗi hex sha256
+    """
+    return _sha256_json(metadata)
+
+
+def build_language_partitions(collection, ids, metadatas) -> Dict[str, int]:
+    """
+    Tạo các collection phân vùng theo ngôn ngữ (trường language chuẩn hóa từ cột ngon_ngu)
+    bằng cách chép embedding đã có trong collection chính, không encode lại
+
+    Args:
+        collection: Collection chính của phiên bản đang build
+        ids (List[str]): ID các địa điểm
+        metadatas (List[Dict[str, Any]]): Metadata tương ứng
+
+    Returns:
+        Dict[str, int]: Ngôn ngữ -> số địa điểm trong phân vùng
+    """
+    ids_by_language = {}
+    for doc_id, metadata in zip(ids, metadatas):
+        ids_by_language.setdefault(metadata.get('language', 'unknown'), []).append(doc_id)
+    
+    chroma_client = get_chroma_client()
+    write_batch_size = Config.INGEST_WRITE_BATCH_SIZE
+    for language, language_ids in ids_by_language.items():
+        partition = chroma_client.create_collection(
+            name=get_partition_collection_name(collection.name, language),
+            embedding_function=get_embedding_function()
+        )
+        for start in range(0, len(language_ids), write_batch_size):
+            batch = collection.get(
+                ids=language_ids[start:start + write_batch_size],
+                include=['embeddings', 'documents', 'metadatas']
+            )
+            partition.add(
+                ids=batch['ids'],
+                embeddings=batch['embeddings'],
+                documents=batch['documents'],
+                metadatas=batch['metadatas']
+            )
+    
+    sizes = {language: len(language_ids) for language, language_ids in ids_by_language.items()}
+    print(f"Đã tạo phân vùng theo ngôn ngữ: {sizes}")
+    return sizes
+
+
+def attach_coordinates(df: pd.DataFrame, scape_csv_path: str) -> pd.DataFrame:
+    """
+    Thêm cột latitude / longitude cho các địa điểm: dùng cột Latitude / Longitude của file
+    nếu có, nếu không thì ghép theo id từ diadiem_scape.csv (dữ liệu gốc có tọa độ)
+
+    Args:
+        df (pd.DataFrame): Dữ liệu địa điểm
+        scape_csv_path (str): Đường dẫn diadiem_scape.csv
+
+    Returns:
+        pd.DataFrame: Dữ liệu có thêm cột latitude / longitude (NaN nếu không có tọa độ)
+    """
+    columns = {str(column).lower(): column for column in df.columns}
+    if 'latitude' in columns and 'longitude' in columns:
+        return df.rename(columns={columns['latitude']: 'latitude', columns['longitude']: 'longitude'})
+
+    df = df.copy()
+    if not os.path.exists(scape_csv_path):
+        print(f"Không tìm thấy {scape_csv_path}, địa điểm sẽ không có tọa độ")
+        df['latitude'] = float('nan')
+        df['longitude'] = float('nan')
+        return df
+
+    scape = pd.read_csv(scape_csv_path, encoding='utf-8',
+                        usecols=lambda column: str(column).lower() in ('id', 'latitude', 'longitude'))
+    scape.columns = [str(column).lower() for column in scape.columns]
+    coordinates = scape.assign(id=scape['id'].astype(str)).drop_duplicates('id').set_index('id')
+    keys = df['id'].astype(str)
+    df['latitude'] = pd.to_numeric(keys.map(coordinates['latitude']), errors='coerce')
+    df['longitude'] = pd.to_numeric(keys.map(coordinates['longitude']), errors='coerce')
+    return df
+
+
+def process_diadiem(progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    csv_path: Optional[str] = None, cancel_check: Optional[Callable[[], None]] = None):
+    """
+    Đồng bộ diadiem.csv vào ChromaDB theo kiểu blue/green: index mới được build vào
+    collection diadiem_collection_v{n}, chỉ embed lại các dòng mới hoặc đã thay đổi
+    (so sánh content_hash), các dòng không đổi được chép nguyên embedding từ phiên bản
+    đang hoạt động. Sau khi build xong mới chuyển con trỏ sang phiên bản mới, nên tìm kiếm
+    vẫn dùng phiên bản cũ trong suốt quá trình sync.
+
+    Args:
+        progress_callback (Optional[Callable]): Hàm nhận tiến độ encode sau mỗi lô
+        csv_path (Optional[str]): File CSV cùng định dạng diadiem.csv (mặc định src/scape/diadiem.csv)
+        cancel_check (Optional[Callable]): Hàm được gọi giữa các bước build, raise để hủy sync:
+            phiên bản đang build bị bỏ và con trỏ collection không đổi
+
+    Returns:
+        Dict[str, Any]: Số dòng added, updated, deleted, unchanged, total
+            và phiên bản index / tên collection đang hoạt động sau khi sync
+    """
+    if Config.INDEX_ROLE == 'reader':
+        raise RuntimeError("Sync is disabled on read-only workers (INDEX_ROLE=reader), run it on the writer process")
+    with _sync_lock, _sync_file_lock():
+        return _process_diadiem(progress_callback, csv_path, cancel_check or (lambda: None))
+
+
+def _process_diadiem(progress_callback, csv_path, cancel_check):
     # Đường dẫn đến file diadiem.csv
     workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    csv_path = os.path.join(workspace_root, 'src', 'scape', 'diadiem.csv')
+    csv_path = csv_path or os.path.join(workspace_root, 'src', 'scape', 'diadiem.csv')
     
     # Kiểm tra file tồn tại
     if not os.path.exists(csv_path):
@@ -16,6 +188,9 @@ def process_diadiem():
     # Đọc file CSV
     df = pd.read_csv(csv_path, encoding='utf-8')
     
+    # Tọa độ dùng cho xếp hạng theo vị trí người dùng
+    df = attach_coordinates(df, os.path.join(workspace_root, 'src', 'scape', 'diadiem_scape.csv'))
+    
     # Chuẩn hóa dữ liệu
     df['ten_dia_diem'] = df['ten_dia_diem'].str.strip()
     df['mo_ta'] = df['mo_ta'].str.strip()
@@ -33,33 +208,154 @@ def process_diadiem():
         Đánh giá: {row.get('danh_gia', '')}
     """.strip(), axis=1)
     
-    # Khởi tạo ChromaDB client
-    chroma_client = chromadb.PersistentClient(path=os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'chroma_db'))
+    # Dùng client và embedding model chung của process
+    chroma_client = get_chroma_client()
+    sentence_transformer_ef = get_embedding_function()
     
-    # Sử dụng sentence-transformers làm embedding function
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="paraphrase-multilingual-MiniLM-L12-v2"
-    )
-    
-    # Xóa collection cũ nếu tồn tại
+    # Phiên bản đang phục vụ tìm kiếm (None nếu chưa từng sync)
     try:
-        chroma_client.delete_collection("diadiem_collection")
-        print("Đã xóa collection cũ")
-    except:
-        print("Collection chưa tồn tại, tạo mới")
+        source = get_collection(create_if_missing=False)
+    except Exception:
+        source = None
+    
+    # Hash đã lưu của các document trong phiên bản đang hoạt động
+    existing = source.get(include=['metadatas']) if source is not None else {'ids': [], 'metadatas': []}
+    existing_hashes = {
+        doc_id: ((metadata or {}).get('content_hash'), (metadata or {}).get('metadata_hash'))
+        for doc_id, metadata in zip(existing['ids'], existing['metadatas'])
+    }
     
-    # Tạo collection mới
+    ids = df['id'].astype(str).tolist()
+    documents = df['document'].tolist()
+    records = []
+    for record in df.to_dict('records'):
+        # Tọa độ chỉ được lưu khi hợp lệ (metadata ChromaDB không nhận NaN)
+        geo = build_geo_metadata(record)
+        record = {key: value for key, value in record.items() if key not in ('document', 'latitude', 'longitude')}
+        records.append(dict(record, **geo))
+    
+    # Thêm các trường lọc đã chuẩn hóa vào metadata để lọc trực tiếp trong ChromaDB
+    all_metadatas = []
+    changed_ids, changed_documents, changed_metadatas = [], [], []
+    # Dòng giữ nguyên embedding: id -> metadata mới (None nếu metadata cũng không đổi)
+    reused = {}
+    added = updated = 0
+    for doc_id, document, record in zip(ids, documents, records):
+        metadata = dict(record, **build_filter_metadata(record))
+        metadata['metadata_hash'] = compute_metadata_hash(metadata)
+        metadata['content_hash'] = compute_content_hash(document)
+        all_metadatas.append(metadata)
+        
+        if doc_id not in existing_hashes:
+            added += 1
+        elif existing_hashes[doc_id][0] != metadata['content_hash']:
+            updated += 1
+        elif existing_hashes[doc_id][1] != metadata['metadata_hash']:
+            # Chỉ metadata thay đổi: dùng lại embedding cũ
+            updated += 1
+            reused[doc_id] = metadata
+            continue
+        else:
+            reused[doc_id] = None
+            continue
+        changed_ids.append(doc_id)
+        changed_documents.append(document)
+        changed_metadatas.append(metadata)
+    
+    unchanged = sum(1 for metadata in reused.values() if metadata is None)
+    current_ids = set(ids)
+    removed_ids = [doc_id for doc_id in existing_hashes if doc_id not in current_ids]
+    
+    summary = {
+        'added': added,
+        'updated': updated,
+        'deleted': len(removed_ids),
+        'unchanged': unchanged,
+        'total': len(ids)
+    }
+    
+    cancel_check()
+    
+    # Không có thay đổi: giữ nguyên phiên bản đang hoạt động
+    if source is not None and added + updated == 0 and not removed_ids:
+        print(f"Không có thay đổi trong {len(ids)} địa điểm, giữ nguyên index hiện tại")
+        summary['index_version'] = get_active_index_version()
+        summary['collection'] = source.name
+        if Config.INDEX_ROLE == 'writer' and get_current_snapshot_dir() is None:
+            # Writer mới khởi động lần đầu: publish snapshot cho các worker reader
+            publish_snapshot(source, summary['index_version'])
+        return summary
+    
+    # Build phiên bản mới vào một collection riêng
+    new_version = max(list(list_collection_versions()) + [get_active_index_version()]) + 1
+    new_name = get_versioned_collection_name(new_version)
     collection = chroma_client.create_collection(
-        name="diadiem_collection",
+        name=new_name,
         embedding_function=sentence_transformer_ef
     )
+    print(f"Đang build index phiên bản {new_version} vào collection {new_name}")
     
-    # Thêm dữ liệu mới
-    collection.add(
-        ids=df['id'].astype(str).tolist(),
-        documents=df['document'].tolist(),
-        metadatas=df.to_dict('records')
-    )
+    try:
+        # Chép nguyên embedding của các dòng không phải encode lại
+        reused_ids = list(reused)
+        write_batch_size = Config.INGEST_WRITE_BATCH_SIZE
+        for start in range(0, len(reused_ids), write_batch_size):
+            cancel_check()
+            batch = source.get(
+                ids=reused_ids[start:start + write_batch_size],
+                include=['embeddings', 'documents', 'metadatas']
+            )
+            collection.add(
+                ids=batch['ids'],
+                embeddings=batch['embeddings'],
+                documents=batch['documents'],
+                metadatas=[
+                    reused[doc_id] or metadata
+                    for doc_id, metadata in zip(batch['ids'], batch['metadatas'])
+                ]
+            )
+        
+        # Chỉ embed các dòng mới hoặc đã thay đổi, theo lô và song song trên nhiều core
+        pipeline = EmbeddingIngestPipeline(progress_callback=progress_callback)
+        pipeline.run(
+            collection,
+            zip(changed_ids, changed_documents, changed_metadatas),
+            total=len(changed_ids)
+        )
+        cancel_check()
+        
+        # Tạo phân vùng theo ngôn ngữ, index từ khóa (BM25) và index NumPy
+        # cho phiên bản mới trước khi chuyển con trỏ
+        if Config.LANGUAGE_PARTITIONS_ENABLED:
+            build_language_partitions(collection, ids, all_metadatas)
+            cancel_check()
+        build_keyword_index(ids, all_metadatas, new_version)
+        cancel_check()
+        if Config.SEARCH_BACKEND == 'numpy':
+            build_numpy_index(collection, new_version)
+        # Kiểm tra hủy lần cuối: từ đây phiên bản mới được publish và con trỏ được chuyển
+        cancel_check()
+        # Writer: publish snapshot chỉ đọc cho các worker reader (đổi symlink 'current')
+        if Config.INDEX_ROLE == 'writer':
+            publish_snapshot(collection, new_version)
+    except Exception:
+        # Build lỗi hoặc bị hủy: bỏ collection và các index dở dang, phiên bản cũ vẫn tiếp tục phục vụ
+        delete_collection_with_partitions(new_name)
+        remove_keyword_indexes(list(list_collection_versions()))
+        remove_numpy_indexes(list(list_collection_versions()))
+        raise
     
-    print(f"Đã xử lý và lưu {len(df)} địa điểm vào ChromaDB")
-
+    # Chuyển con trỏ sang phiên bản mới rồi dọn các phiên bản cũ
+    set_active_collection(new_name, new_version)
+    reset_search_backend()
+    garbage_collect_collections(Config.INDEX_VERSIONS_TO_KEEP)
+    remove_keyword_indexes(list(list_collection_versions()))
+    remove_numpy_indexes(list(list_collection_versions()))
+    
+    print(f"Đã đồng bộ {len(ids)} địa điểm vào ChromaDB (phiên bản {new_version}): "
+          f"thêm {added}, cập nhật {updated} (encode lại {len(changed_ids) - added}), "
+          f"xóa {len(removed_ids)}, không đổi {unchanged}")
+    
+    summary['index_version'] = new_version
+    summary['collection'] = new_name
+    return summary
@@ -0,0 +1,94 @@
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List
+from src.config.config import Config
+from src.nlp_model.vector_store import get_embedding_function
+
+
+def normalize_query(text: str) -> str:
+    """Chuẩn hóa câu hỏi làm khóa cache: Unicode NFC, chữ thường, gộp khoảng trắng"""
+    text = unicodedata.normalize('NFC', text or '')
+    return ' '.join(text.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU có giới hạn cho embedding của câu hỏi, đặt trước ChromaDB
+    để không phải encode lại những câu hỏi lặp lại
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_embeddings(self, questions: List[str]) -> List[List[float]]:
+        """
+        Lấy embedding cho danh sách câu hỏi, các câu chưa có trong cache
+        được encode chung trong một lần gọi model
+
+        Args:
+            questions (List[str]): Danh sách câu hỏi
+
+        Returns:
+            List[List[float]]: Embedding theo đúng thứ tự câu hỏi
+        """
+        keys = [normalize_query(question) for question in questions]
+        found = {}
+        missing = []
+
+        with self._lock:
+            for key in keys:
+                if key in found or key in missing:
+                    # Câu hỏi lặp lại trong cùng một lô cũng không phải encode lại
+                    self.hits += 1
+                elif key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                    self.hits += 1
+                else:
+                    missing.append(key)
+                    self.misses += 1
+
+        if missing:
+            embeddings = get_embedding_function()(missing)
+            with self._lock:
+                for key, embedding in zip(missing, embeddings):
+                    embedding = [float(x) for x in embedding]
+                    found[key] = embedding
+                    self._entries[key] = embedding
+                    self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        return [found[key] for key in keys]
+
+    def get_embedding(self, question: str) -> List[float]:
+        """Lấy embedding cho một câu hỏi"""
+        return self.get_embeddings([question])[0]
+
+    def stats(self) -> Dict[str, float]:
+        """Thống kê hit/miss của cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+    def clear(self):
+        """Xóa toàn bộ cache và reset bộ đếm"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# Instance dùng chung cho toàn process
+query_embedding_cache = QueryEmbeddingCache(max_size=Config.QUERY_EMBEDDING_CACHE_SIZE)
@@ -1,23 +1,12 @@
-import chromadb
-from chromadb.utils import embedding_functions
 import os
 import json
+from src.nlp_model.vector_store import get_collection
 
 def read_chroma_data():
-    # Khởi tạo ChromaDB client
     workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-    chroma_client = chromadb.PersistentClient(path=os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'chroma_db'))
-
-    # Sử dụng sentence-transformers làm embedding function
-    sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="paraphrase-multilingual-MiniLM-L12-v2"
-    )
-
-    # Lấy collection
-    collection = chroma_client.get_collection(
-        name="diadiem_collection",
-        embedding_function=sentence_transformer_ef
-    )
+
+    # Lấy collection từ client dùng chung
+    collection = get_collection(create_if_missing=False)
 
     # Lấy tất cả dữ liệu
     results = collection.get()
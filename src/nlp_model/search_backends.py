@@ -0,0 +1,521 @@
+import os
+import re
+import json
+import shutil
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+from src.config.config import Config
+from src.nlp_model.vector_store import (
+    workspace_root, get_collection, get_active_index_version, get_chroma_client, get_embedding_function,
+    get_partition_collection_name, get_current_snapshot_dir, get_collection_for_version
+)
+
+# Các backend tìm kiếm cho combined_search_with_filters. Mỗi backend cung cấp cùng
+# một tập con API của collection ChromaDB (count / get / query) nên có thể thay thế nhau.
+
+EMBEDDINGS_FILE = 'embeddings.npy'
+METADATA_FILE = 'metadata.json'
+SCALES_FILE = 'scales.npy'
+# Mỗi phiên bản index có thư mục NumPy riêng v{phiên bản}_{dtype}, bất biến sau khi tạo
+NUMPY_VERSION_DIR_PATTERN = re.compile(r'^v(\d+)_(float32|float16|int8)$')
+
+# Kiểu lưu vector dùng để chấm điểm: float32 (gốc), float16 hoặc int8 có hệ số theo từng chiều
+INDEX_DTYPES = ('float32', 'float16', 'int8')
+# Số dòng được chuyển sang float32 và nhân ma trận mỗi lần khi chấm điểm trên vector lượng tử hóa
+SCORE_BLOCK_ROWS = 4096
+
+
+def quantized_file(dtype: str) -> str:
+    """Tên file ma trận lượng tử hóa của một kiểu dữ liệu"""
+    return f"embeddings_{dtype}.npy"
+
+
+def quantize_matrix(matrix: np.ndarray, dtype: str):
+    """
+    Lượng tử hóa ma trận float32 đã chuẩn hóa
+
+    Args:
+        matrix (np.ndarray): Ma trận float32 (số dòng x dim)
+        dtype (str): float16 hoặc int8
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: Ma trận lượng tử hóa và hệ số theo chiều (chỉ với int8)
+    """
+    if dtype == 'float16':
+        return matrix.astype(np.float16), None
+    # int8: mỗi chiều có hệ số riêng = max |giá trị| / 127 để tận dụng hết dải [-127, 127]
+    scales = np.maximum(np.abs(matrix).max(axis=0) if matrix.size else np.zeros(matrix.shape[1]), 1e-12) / 127.0
+    quantized = np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Kiểm tra metadata có khớp mệnh đề where (cú pháp ChromaDB: $and, $or, $eq, $ne, $in, $nin)
+
+    Args:
+        metadata (Dict[str, Any]): Metadata của document
+        where (Optional[Dict[str, Any]]): Mệnh đề where
+
+    Returns:
+        bool: True nếu khớp
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_where(metadata, sub) for sub in condition):
+                return False
+        else:
+            value = metadata.get(key) if metadata else None
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            for operator, operand in condition.items():
+                if operator == '$eq' and value != operand:
+                    return False
+                if operator == '$ne' and value == operand:
+                    return False
+                if operator == '$in' and value not in operand:
+                    return False
+                if operator == '$nin' and value in operand:
+                    return False
+    return True
+
+
+def split_language_condition(where: Optional[Dict[str, Any]]):
+    """
+    Tách điều kiện ngôn ngữ ({'language': ...}) khỏi mệnh đề where để định tuyến
+    truy vấn tới phân vùng của ngôn ngữ đó
+
+    Args:
+        where (Optional[Dict[str, Any]]): Mệnh đề where
+
+    Returns:
+        Tuple[Optional[str], Optional[Dict[str, Any]]]: Ngôn ngữ (nếu có) và phần where còn lại
+    """
+    if not where:
+        return None, where
+    if isinstance(where.get('language'), str) and len(where) == 1:
+        return where['language'], None
+    conditions = where.get('$and')
+    if conditions and len(where) == 1:
+        languages = [c['language'] for c in conditions
+                     if len(c) == 1 and isinstance(c.get('language'), str)]
+        if len(languages) == 1:
+            rest = [c for c in conditions if not (len(c) == 1 and c.get('language') == languages[0])]
+            if not rest:
+                return languages[0], None
+            return languages[0], rest[0] if len(rest) == 1 else {'$and': rest}
+    return None, where
+
+
+class ChromaSearchBackend:
+    """Backend mặc định: truy vấn trực tiếp collection ChromaDB"""
+
+    name = 'chroma'
+
+    def __init__(self, collection=None):
+        self.version = get_active_index_version()
+        self.collection = collection or get_collection(create_if_missing=True)
+        self._partitions = {}
+
+    def _partition(self, language: str):
+        """Collection phân vùng của một ngôn ngữ (None nếu index không có phân vùng này)"""
+        if language not in self._partitions:
+            try:
+                self._partitions[language] = get_chroma_client().get_collection(
+                    name=get_partition_collection_name(self.collection.name, language),
+                    embedding_function=get_embedding_function()
+                )
+            except Exception:
+                self._partitions[language] = None
+        return self._partitions[language]
+
+    def _route(self, kwargs: Dict[str, Any]):
+        """Chuyển truy vấn có điều kiện ngôn ngữ sang collection phân vùng của ngôn ngữ đó"""
+        if not Config.LANGUAGE_PARTITIONS_ENABLED or kwargs.get('ids') is not None:
+            return self.collection, kwargs
+        language, rest = split_language_condition(kwargs.get('where'))
+        partition = self._partition(language) if language else None
+        if partition is None:
+            return self.collection, kwargs
+        return partition, dict(kwargs, where=rest)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def get(self, **kwargs) -> Dict[str, Any]:
+        collection, kwargs = self._route(kwargs)
+        return collection.get(**kwargs)
+
+    def query(self, **kwargs) -> Dict[str, Any]:
+        collection, kwargs = self._route(kwargs)
+        return collection.query(**kwargs)
+
+    def distances(self, query_embedding: List[float], embeddings: List[List[float]]) -> List[float]:
+        """Khoảng cách từ câu hỏi tới các embedding, theo cùng không gian khoảng cách của collection"""
+        if not len(embeddings):
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        space = (getattr(self.collection, 'metadata', None) or {}).get('hnsw:space', 'l2')
+        if space == 'cosine':
+            norms = np.maximum(np.linalg.norm(matrix, axis=1) * np.linalg.norm(query), 1e-12)
+            return (1.0 - matrix @ query / norms).tolist()
+        if space == 'ip':
+            return (1.0 - matrix @ query).tolist()
+        return ((matrix - query) ** 2).sum(axis=1).tolist()
+
+
+class NumpySearchBackend:
+    """
+    Backend brute-force bằng NumPy: ma trận float32 đã chuẩn hóa (memory-mapped từ file .npy)
+    và một tích vô hướng cho mỗi câu hỏi. Khoảng cách trả về là bình phương L2 giữa hai vector
+    đơn vị (2 - 2 * cosine), sắp xếp giống như cosine similarity.
+    """
+
+    name = 'numpy'
+
+    def __init__(self, index_dir: str, rescore: Optional[bool] = None, rescore_factor: Optional[int] = None):
+        self.index_dir = index_dir
+        embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+        metadata_path = os.path.join(index_dir, METADATA_FILE)
+
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+
+        self.ids = sidecar['ids']
+        self.metadatas = sidecar['metadatas']
+        self.documents = sidecar['documents']
+        self.built_at = sidecar.get('built_at')
+        self.dtype = sidecar.get('dtype', 'float32')
+        self.partitions = {language: tuple(bounds) for language, bounds in sidecar.get('partitions', {}).items()}
+        # Ma trận float32 chỉ được đọc (memory-mapped) khi chấm lại điểm hoặc trả về embedding
+        self.matrix = np.load(embeddings_path, mmap_mode='r')
+        self.scales = None
+        if self.dtype == 'float32':
+            self.search_matrix = self.matrix
+        else:
+            self.search_matrix = np.load(os.path.join(index_dir, quantized_file(self.dtype)), mmap_mode='r')
+            if self.dtype == 'int8':
+                self.scales = np.load(os.path.join(index_dir, SCALES_FILE))
+        self.rescore = Config.NUMPY_RESCORE if rescore is None else rescore
+        self.rescore_factor = rescore_factor or Config.NUMPY_RESCORE_FACTOR
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._where_cache = {}
+
+    @staticmethod
+    def build(collection, index_dir: str, dtype: Optional[str] = None) -> int:
+        """
+        Tạo index NumPy từ embedding đã lưu trong collection ChromaDB (không encode lại)
+
+        Args:
+            collection: Collection ChromaDB nguồn
+            index_dir (str): Thư mục lưu file .npy và file metadata (nên là thư mục mới; xem
+                build_numpy_index để publish nguyên tử cho các worker đang đọc)
+            dtype (Optional[str]): Kiểu vector dùng để chấm điểm (mặc định NUMPY_INDEX_DTYPE)
+
+        Returns:
+            int: Số document đã ghi
+        """
+        dtype = dtype or Config.NUMPY_INDEX_DTYPE
+        if dtype not in INDEX_DTYPES:
+            raise ValueError(f"NUMPY_INDEX_DTYPE must be one of: {', '.join(INDEX_DTYPES)}")
+        os.makedirs(index_dir, exist_ok=True)
+        data = collection.get(include=['embeddings', 'metadatas', 'documents'])
+
+        # Xếp các dòng theo ngôn ngữ để mỗi ngôn ngữ là một đoạn liên tục (phân vùng)
+        languages = [(metadata or {}).get('language', 'unknown') for metadata in data['metadatas']]
+        order = sorted(range(len(data['ids'])), key=lambda row: languages[row])
+        data = {key: [data[key][row] for row in order] for key in ('ids', 'embeddings', 'metadatas', 'documents')}
+        partitions = {}
+        for row in range(len(order)):
+            language = languages[order[row]]
+            start, _ = partitions.get(language, (row, row))
+            partitions[language] = (start, row + 1)
+
+        matrix = np.ascontiguousarray(np.asarray(data['embeddings'], dtype=np.float32))
+        if matrix.size:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.maximum(norms, 1e-12)
+
+        # Ghi file tạm rồi đổi tên để worker khác không đọc phải file đang ghi dở
+        embeddings_tmp = os.path.join(index_dir, EMBEDDINGS_FILE + '.tmp')
+        metadata_tmp = os.path.join(index_dir, METADATA_FILE + '.tmp')
+        with open(embeddings_tmp, 'wb') as f:
+            np.save(f, matrix)
+        if dtype != 'float32':
+            quantized, scales = quantize_matrix(matrix, dtype)
+            quantized_tmp = os.path.join(index_dir, quantized_file(dtype) + '.tmp')
+            with open(quantized_tmp, 'wb') as f:
+                np.save(f, quantized)
+            os.replace(quantized_tmp, os.path.join(index_dir, quantized_file(dtype)))
+            if scales is not None:
+                scales_tmp = os.path.join(index_dir, SCALES_FILE + '.tmp')
+                with open(scales_tmp, 'wb') as f:
+                    np.save(f, scales)
+                os.replace(scales_tmp, os.path.join(index_dir, SCALES_FILE))
+        with open(metadata_tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'ids': data['ids'],
+                'metadatas': data['metadatas'],
+                'documents': data['documents'],
+                'dimension': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+                'dtype': dtype,
+                'partitions': partitions,
+                'built_at': datetime.utcnow().isoformat()
+            }, f, ensure_ascii=False)
+        os.replace(embeddings_tmp, os.path.join(index_dir, EMBEDDINGS_FILE))
+        os.replace(metadata_tmp, os.path.join(index_dir, METADATA_FILE))
+
+        print(f"Đã tạo index NumPy ({dtype}) với {len(data['ids'])} vector tại {index_dir}")
+        return len(data['ids'])
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def _rows_for_where(self, where: Optional[Dict[str, Any]]):
+        """
+        Các dòng khớp mệnh đề where: None nghĩa là tất cả, slice là một phân vùng ngôn ngữ
+        (đoạn liên tục, không phải sao chép khi chấm điểm), ngược lại là mảng chỉ số. Có cache theo mệnh đề.
+        """
+        if not where:
+            return None
+        language, rest = split_language_condition(where) if Config.LANGUAGE_PARTITIONS_ENABLED else (None, where)
+        if language is not None and language in self.partitions:
+            start, end = self.partitions[language]
+            if not rest:
+                return slice(start, end)
+            candidates, where = range(start, end), rest
+        else:
+            candidates = range(len(self.ids))
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False) + f"|{candidates.start}:{candidates.stop}"
+        rows = self._where_cache.get(key)
+        if rows is None:
+            rows = np.array([row for row in candidates if matches_where(self.metadatas[row], where)],
+                            dtype=np.int64)
+            if len(self._where_cache) >= 256:
+                self._where_cache.clear()
+            self._where_cache[key] = rows
+        return rows
+
+    @staticmethod
+    def _absolute_rows(rows, local: np.ndarray) -> np.ndarray:
+        """Chuyển vị trí trong tập ứng viên thành chỉ số dòng của index"""
+        if rows is None:
+            return local
+        if isinstance(rows, slice):
+            return local + rows.start
+        return rows[local]
+
+    @staticmethod
+    def _row_count(rows, total: int) -> int:
+        if rows is None:
+            return total
+        if isinstance(rows, slice):
+            return rows.stop - rows.start
+        return len(rows)
+
+    def _rows_to_result(self, rows, include: List[str]) -> Dict[str, Any]:
+        result = {'ids': [self.ids[row] for row in rows]}
+        if 'metadatas' in include:
+            result['metadatas'] = [self.metadatas[row] for row in rows]
+        if 'documents' in include:
+            result['documents'] = [self.documents[row] for row in rows]
+        if 'embeddings' in include:
+            result['embeddings'] = [np.asarray(self.matrix[row]) for row in rows]
+        return result
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            include: Optional[List[str]] = None) -> Dict[str, Any]:
+        if include is None:
+            include = ['metadatas', 'documents']
+        if ids is not None:
+            rows = [self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row]
+            rows = [row for row in rows if matches_where(self.metadatas[row], where)]
+        else:
+            filtered = self._rows_for_where(where)
+            if filtered is None:
+                rows = range(len(self.ids))
+            elif isinstance(filtered, slice):
+                rows = range(filtered.start, filtered.stop)
+            else:
+                rows = filtered.tolist()
+        return self._rows_to_result(rows, include)
+
+    def distances(self, query_embedding: List[float], embeddings: List[List[float]]) -> List[float]:
+        """Khoảng cách 2 - 2 * cosine từ câu hỏi tới các embedding (đã chuẩn hóa) của index"""
+        if not len(embeddings):
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        return (2.0 - 2.0 * (np.asarray(embeddings, dtype=np.float32) @ query)).tolist()
+
+    def _approximate_scores(self, rows: Optional[np.ndarray], queries: np.ndarray) -> np.ndarray:
+        """
+        Điểm cosine (xấp xỉ với vector lượng tử hóa) của các dòng với các câu hỏi.
+        Vector lượng tử hóa được chuyển sang float32 theo từng khối SCORE_BLOCK_ROWS dòng.
+        """
+        source = self.search_matrix if rows is None else self.search_matrix[rows]
+        if self.dtype == 'float32':
+            return source @ queries.T
+        # int8: nhân hệ số theo chiều vào câu hỏi thay vì giải lượng tử cả ma trận
+        weights = queries * self.scales if self.scales is not None else queries
+        scores = np.empty((source.shape[0], queries.shape[0]), dtype=np.float32)
+        for start in range(0, source.shape[0], SCORE_BLOCK_ROWS):
+            block = np.asarray(source[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + SCORE_BLOCK_ROWS] = block @ weights.T
+        return scores
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Optional[List[str]] = None) -> Dict[str, Any]:
+        if include is None:
+            include = ['metadatas', 'documents', 'distances']
+
+        queries = np.array(query_embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        rows = self._rows_for_where(where)
+        candidate_count = self._row_count(rows, len(self.ids))
+        output = {'ids': [], 'metadatas': [], 'documents': [], 'distances': [], 'embeddings': []}
+        if candidate_count == 0:
+            for _ in range(len(queries)):
+                for key in output:
+                    output[key].append([])
+            return output
+
+        # Một phép nhân ma trận cho tất cả câu hỏi: (số dòng x dim) @ (dim x số câu hỏi)
+        scores = self._approximate_scores(rows, queries)
+        k = min(n_results, scores.shape[0])
+        # Với vector lượng tử hóa: lấy nhiều ứng viên hơn rồi chấm lại bằng float32
+        rescore = self.rescore and self.dtype != 'float32'
+        pool = min(k * self.rescore_factor, scores.shape[0]) if rescore else k
+
+        for column in range(scores.shape[1]):
+            column_scores = scores[:, column]
+            if pool < len(column_scores):
+                top = np.argpartition(-column_scores, pool - 1)[:pool]
+            else:
+                top = np.arange(len(column_scores))
+            if rescore:
+                matrix_rows = self._absolute_rows(rows, top)
+                exact = np.asarray(self.matrix[matrix_rows], dtype=np.float32) @ queries[column]
+                best = np.argsort(-exact)[:k]
+                top, top_scores = top[best], exact[best]
+            else:
+                top = top[np.argsort(-column_scores[top])]
+                top_scores = column_scores[top]
+            result_rows = self._absolute_rows(rows, top)
+            result = self._rows_to_result(result_rows.tolist(), include)
+            output['ids'].append(result['ids'])
+            output['metadatas'].append(result.get('metadatas', []))
+            output['documents'].append(result.get('documents', []))
+            output['embeddings'].append(result.get('embeddings', []))
+            output['distances'].append([float(2.0 - 2.0 * score) for score in top_scores])
+        return output
+
+
+_backend_lock = threading.Lock()
+_search_backend = None
+
+
+def get_numpy_index_dir() -> str:
+    """Thư mục gốc chứa index NumPy (có thể ghi đè bằng biến môi trường NUMPY_INDEX_DIR)"""
+    return Config.NUMPY_INDEX_DIR or os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'numpy_index')
+
+
+def get_numpy_version_dir(version: int, dtype: Optional[str] = None) -> str:
+    """Thư mục index NumPy của một phiên bản index và kiểu vector, ví dụ numpy_index/v3_int8"""
+    return os.path.join(get_numpy_index_dir(), f"v{version}_{dtype or Config.NUMPY_INDEX_DTYPE}")
+
+
+def build_numpy_index(collection=None, version: Optional[int] = None) -> str:
+    """
+    Tạo index NumPy của một phiên bản index (mặc định là phiên bản đang hoạt động) vào thư mục
+    tạm rồi đổi tên thành thư mục của phiên bản. Thư mục đã đổi tên không bao giờ bị ghi lại,
+    nên worker không thể đọc vector mới cùng metadata cũ, và chỉ chuyển sang index mới khi
+    con trỏ collection đã chuyển sang phiên bản đó.
+
+    Args:
+        collection: Collection ChromaDB nguồn (mặc định là collection của phiên bản)
+        version (Optional[int]): Phiên bản index
+
+    Returns:
+        str: Thư mục index NumPy của phiên bản
+    """
+    if version is None:
+        version = get_active_index_version()
+    if collection is None:
+        collection = get_collection_for_version(version)
+    index_dir = get_numpy_version_dir(version)
+    tmp_dir = f"{index_dir}.{os.getpid()}.tmp"
+    try:
+        NumpySearchBackend.build(collection, tmp_dir)
+        try:
+            os.rename(tmp_dir, index_dir)
+        except OSError:
+            # Process khác đã tạo xong index của cùng phiên bản
+            if not os.path.exists(os.path.join(index_dir, METADATA_FILE)):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return index_dir
+
+
+def remove_numpy_indexes(keep_versions: List[int]):
+    """Xóa thư mục index NumPy của các phiên bản không còn giữ lại"""
+    root = get_numpy_index_dir()
+    if not os.path.isdir(root):
+        return
+    for name in os.listdir(root):
+        match = NUMPY_VERSION_DIR_PATTERN.match(name)
+        if match and int(match.group(1)) not in keep_versions:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def _load_numpy_backend(version: int) -> NumpySearchBackend:
+    index_dir = get_numpy_version_dir(version)
+    if not os.path.exists(os.path.join(index_dir, METADATA_FILE)):
+        print(f"Chưa có index NumPy cho phiên bản {version}, tạo từ collection ChromaDB")
+        build_numpy_index(version=version)
+    return NumpySearchBackend(index_dir)
+
+
+def get_search_backend():
+    """
+    Lấy backend tìm kiếm theo cấu hình SEARCH_BACKEND (chroma hoặc numpy).
+    Cả hai backend được tạo lại khi con trỏ collection chuyển sang phiên bản mới (kể cả từ
+    process khác); backend NumPy load thư mục index của đúng phiên bản đó.
+    Worker INDEX_ROLE=reader luôn dùng snapshot chỉ đọc mà symlink 'current' đang trỏ tới.
+    """
+    global _search_backend
+    with _backend_lock:
+        if Config.INDEX_ROLE == 'reader':
+            snapshot_dir = get_current_snapshot_dir()
+            if snapshot_dir is None:
+                raise RuntimeError("No index snapshot has been published yet (INDEX_ROLE=reader)")
+            if not isinstance(_search_backend, NumpySearchBackend) or _search_backend.index_dir != snapshot_dir:
+                _search_backend = NumpySearchBackend(snapshot_dir)
+                print(f"Đang phục vụ tìm kiếm từ snapshot {os.path.basename(snapshot_dir)}")
+        elif Config.SEARCH_BACKEND == 'numpy':
+            version = get_active_index_version()
+            if (not isinstance(_search_backend, NumpySearchBackend)
+                    or _search_backend.index_dir != get_numpy_version_dir(version)):
+                _search_backend = _load_numpy_backend(version)
+        elif (not isinstance(_search_backend, ChromaSearchBackend)
+              or _search_backend.version != get_active_index_version()):
+            _search_backend = ChromaSearchBackend()
+        return _search_backend
+
+
+def reset_search_backend():
+    """Bỏ backend đang dùng để lần gọi sau load lại (sau khi dữ liệu thay đổi)"""
+    global _search_backend
+    with _backend_lock:
+        _search_backend = None
@@ -0,0 +1,316 @@
+import os
+import re
+import json
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import chromadb
+from chromadb.utils import embedding_functions
+from src.config.config import Config
+
+# Registry dùng chung cho cả process: ChromaDB client và embedding model chỉ được
+# khởi tạo một lần, ở lần sử dụng đầu tiên, rồi trả về cùng một instance cho mọi nơi gọi.
+
+workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_lock = threading.Lock()
+_chroma_client = None
+_embedding_function = None
+
+# Con trỏ tới collection đang phục vụ tìm kiếm (blue/green): index mới được build vào
+# collection <tên>_v{n}, sau khi build xong mới ghi đè file con trỏ một cách nguyên tử
+ACTIVE_POINTER_FILE = 'active_collection.json'
+_pointer_cache = {'mtime': None, 'pointer': None}
+
+# Snapshot chỉ đọc cho triển khai nhiều worker (INDEX_ROLE=reader): mỗi snapshot là một thư mục
+# bất biến v{n}_{thời gian}, symlink 'current' được đổi nguyên tử sang snapshot mới nhất
+CURRENT_SNAPSHOT_LINK = 'current'
+SNAPSHOT_MANIFEST_FILE = 'snapshot.json'
+_snapshot_cache = {'dir': None, 'manifest': None}
+
+
+def get_chroma_db_path() -> str:
+    """Đường dẫn thư mục ChromaDB (có thể ghi đè bằng biến môi trường CHROMA_DB_PATH)"""
+    return Config.CHROMA_DB_PATH or os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'chroma_db')
+
+
+def get_onnx_model_dir() -> str:
+    """Thư mục model ONNX của encoder (có thể ghi đè bằng biến môi trường ONNX_MODEL_DIR)"""
+    return Config.ONNX_MODEL_DIR or os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'onnx_encoder')
+
+
+def get_snapshot_root() -> str:
+    """Thư mục chứa các snapshot index (có thể ghi đè bằng biến môi trường INDEX_SNAPSHOT_DIR)"""
+    return Config.INDEX_SNAPSHOT_DIR or os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'snapshots')
+
+
+def get_current_snapshot_dir() -> Optional[str]:
+    """Thư mục snapshot mà symlink 'current' đang trỏ tới (None nếu chưa publish snapshot nào)"""
+    root = get_snapshot_root()
+    try:
+        target = os.readlink(os.path.join(root, CURRENT_SNAPSHOT_LINK))
+    except OSError:
+        return None
+    return os.path.join(root, target)
+
+
+def read_current_snapshot() -> Optional[Dict[str, Any]]:
+    """
+    Đọc manifest của snapshot hiện tại, chỉ đọc lại khi symlink chuyển sang snapshot khác
+
+    Returns:
+        Optional[Dict[str, Any]]: {'version', 'collection', 'count', 'dtype', 'published_at', 'path'}
+            hoặc None nếu chưa có snapshot
+    """
+    snapshot_dir = get_current_snapshot_dir()
+    if snapshot_dir is None:
+        return None
+    if _snapshot_cache['dir'] != snapshot_dir:
+        try:
+            with open(os.path.join(snapshot_dir, SNAPSHOT_MANIFEST_FILE), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Không đọc được manifest snapshot {snapshot_dir}: {str(e)}")
+            return _snapshot_cache['manifest']
+        _snapshot_cache['manifest'] = dict(manifest, path=snapshot_dir)
+        _snapshot_cache['dir'] = snapshot_dir
+    return _snapshot_cache['manifest']
+
+
+def get_chroma_client():
+    """Lấy ChromaDB client dùng chung, khởi tạo ở lần gọi đầu tiên"""
+    global _chroma_client
+    if _chroma_client is None:
+        with _lock:
+            if _chroma_client is None:
+                _chroma_client = chromadb.PersistentClient(path=get_chroma_db_path())
+    return _chroma_client
+
+
+def get_embedding_function():
+    """
+    Lấy embedding function dùng chung, model chỉ được load một lần.
+    EMBEDDING_BACKEND=onnx dùng bản ONNX int8 chạy bằng onnxruntime thay cho SentenceTransformer.
+    """
+    global _embedding_function
+    if _embedding_function is None:
+        with _lock:
+            if _embedding_function is None:
+                if Config.EMBEDDING_BACKEND == 'onnx':
+                    from src.nlp_model.onnx_encoder import OnnxEmbeddingFunction
+                    model_dir = get_onnx_model_dir()
+                    print(f"Loading ONNX embedding model: {os.path.join(model_dir, Config.ONNX_MODEL_FILE)}")
+                    _embedding_function = OnnxEmbeddingFunction(
+                        model_dir,
+                        model_file=Config.ONNX_MODEL_FILE,
+                        threads=Config.ONNX_THREADS or None,
+                        concurrency=Config.ONNX_CONCURRENCY
+                    )
+                else:
+                    print(f"Loading embedding model: {Config.EMBEDDING_MODEL_NAME}")
+                    _embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                        model_name=Config.EMBEDDING_MODEL_NAME
+                    )
+    return _embedding_function
+
+
+def get_active_pointer_path() -> str:
+    """Đường dẫn file con trỏ collection đang hoạt động (nằm trong thư mục ChromaDB)"""
+    return os.path.join(get_chroma_db_path(), ACTIVE_POINTER_FILE)
+
+
+def read_active_pointer() -> Optional[Dict[str, Any]]:
+    """
+    Đọc file con trỏ collection đang hoạt động, chỉ đọc lại khi file thay đổi
+
+    Returns:
+        Optional[Dict[str, Any]]: {'collection', 'version', 'activated_at'} hoặc None nếu chưa có
+    """
+    path = get_active_pointer_path()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    if _pointer_cache['mtime'] != mtime:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                pointer = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Không đọc được file con trỏ collection: {str(e)}")
+            return _pointer_cache['pointer']
+        _pointer_cache['pointer'] = pointer
+        _pointer_cache['mtime'] = mtime
+    return _pointer_cache['pointer']
+
+
+def get_active_collection_name() -> str:
+    """Tên collection đang phục vụ tìm kiếm (mặc định là CHROMA_COLLECTION_NAME khi chưa có con trỏ)"""
+    pointer = read_active_pointer()
+    if pointer and pointer.get('collection'):
+        return pointer['collection']
+    return Config.CHROMA_COLLECTION_NAME
+
+
+def get_active_index_version() -> int:
+    """
+    Phiên bản index đang hoạt động (0 là collection cũ chưa đánh phiên bản).
+    Worker chỉ đọc (INDEX_ROLE=reader) lấy phiên bản từ snapshot hiện tại.
+    """
+    if Config.INDEX_ROLE == 'reader':
+        snapshot = read_current_snapshot()
+        return int(snapshot.get('version', 0)) if snapshot else 0
+    pointer = read_active_pointer()
+    return int(pointer.get('version', 0)) if pointer else 0
+
+
+def get_versioned_collection_name(version: int) -> str:
+    """Tên collection cho một phiên bản index, ví dụ diadiem_collection_v3"""
+    return f"{Config.CHROMA_COLLECTION_NAME}_v{version}"
+
+
+def list_collection_versions() -> Dict[int, str]:
+    """
+    Liệt kê các phiên bản collection của index địa điểm
+    (collection cũ chưa đánh phiên bản được xem là phiên bản 0)
+
+    Returns:
+        Dict[int, str]: Phiên bản -> tên collection
+    """
+    pattern = re.compile(rf"^{re.escape(Config.CHROMA_COLLECTION_NAME)}_v(\d+)$")
+    versions = {}
+    for collection in get_chroma_client().list_collections():
+        name = getattr(collection, 'name', collection)
+        if name == Config.CHROMA_COLLECTION_NAME:
+            versions[0] = name
+            continue
+        match = pattern.match(name)
+        if match:
+            versions[int(match.group(1))] = name
+    return versions
+
+
+def get_partition_collection_name(collection_name: str, language: str) -> str:
+    """Tên collection phân vùng theo ngôn ngữ của một phiên bản, ví dụ diadiem_collection_v3_lang_korean"""
+    return f"{collection_name}_lang_{language}"
+
+
+def list_partition_collections(collection_name: str) -> Dict[str, str]:
+    """
+    Liệt kê các collection phân vùng theo ngôn ngữ của một collection
+
+    Returns:
+        Dict[str, str]: Ngôn ngữ -> tên collection
+    """
+    prefix = get_partition_collection_name(collection_name, '')
+    partitions = {}
+    for collection in get_chroma_client().list_collections():
+        name = getattr(collection, 'name', collection)
+        if name.startswith(prefix):
+            partitions[name[len(prefix):]] = name
+    return partitions
+
+
+def delete_collection_with_partitions(collection_name: str):
+    """Xóa collection cùng các collection phân vùng theo ngôn ngữ của nó"""
+    client = get_chroma_client()
+    for name in list_partition_collections(collection_name).values():
+        client.delete_collection(name)
+    client.delete_collection(collection_name)
+
+
+def set_active_collection(name: str, version: int):
+    """
+    Chuyển con trỏ sang collection mới: ghi file tạm rồi os.replace để mọi process
+    đọc được hoặc con trỏ cũ hoặc con trỏ mới, không bao giờ đọc phải file ghi dở
+
+    Args:
+        name (str): Tên collection
+        version (int): Phiên bản index
+    """
+    path = get_active_pointer_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'collection': name,
+            'version': version,
+            'activated_at': datetime.utcnow().isoformat()
+        }, f)
+    os.replace(tmp_path, path)
+    print(f"Đã chuyển index sang collection {name} (phiên bản {version})")
+
+
+def garbage_collect_collections(keep: int) -> List[str]:
+    """
+    Xóa các phiên bản collection cũ, giữ lại collection đang hoạt động
+    và (keep - 1) phiên bản gần nhất trước nó để có thể quay lại.
+    Các phiên bản mới hơn phiên bản đang hoạt động (đang build) không bị xóa.
+
+    Args:
+        keep (int): Số phiên bản được giữ lại, tính cả phiên bản đang hoạt động
+
+    Returns:
+        List[str]: Tên các collection đã xóa
+    """
+    if read_active_pointer() is None:
+        return []
+    active_version = get_active_index_version()
+    versions = list_collection_versions()
+    older = sorted(version for version in versions if version < active_version)
+    expired = older[:max(len(older) - max(keep - 1, 0), 0)]
+
+    removed = []
+    for version in expired:
+        delete_collection_with_partitions(versions[version])
+        removed.append(versions[version])
+
+    if removed:
+        print(f"Đã xóa các phiên bản collection cũ: {', '.join(removed)}")
+    return removed
+
+
+def get_collection(create_if_missing: bool = True):
+    """
+    Lấy collection địa điểm đang hoạt động (theo file con trỏ) từ client dùng chung
+
+    Args:
+        create_if_missing (bool): Tạo collection rỗng nếu chưa từng có index nào.
+            Khi đã có con trỏ thì không bao giờ tạo collection rỗng thay cho index đang phục vụ.
+
+    Returns:
+        Collection: Collection ChromaDB
+    """
+    client = get_chroma_client()
+    embedding_function = get_embedding_function()
+    name = get_active_collection_name()
+    try:
+        return client.get_collection(
+            name=name,
+            embedding_function=embedding_function
+        )
+    except Exception as e:
+        if not create_if_missing or read_active_pointer() is not None:
+            raise
+        print(f"Collection not found, creating new one: {str(e)}")
+        return client.create_collection(
+            name=name,
+            embedding_function=embedding_function
+        )
+
+
+def get_collection_for_version(version: int):
+    """
+    Lấy collection của một phiên bản index cụ thể (phiên bản 0 là collection chưa đánh phiên bản),
+    dùng để giữ ổn định các truy vấn phân trang khi index được build lại
+
+    Args:
+        version (int): Phiên bản index
+
+    Returns:
+        Collection: Collection ChromaDB (raise nếu phiên bản đã bị xóa)
+    """
+    name = get_versioned_collection_name(version) if version else Config.CHROMA_COLLECTION_NAME
+    return get_chroma_client().get_collection(
+        name=name,
+        embedding_function=get_embedding_function()
+    )
@@ -1,9 +1,150 @@
-from langdetect import detect
+import re
+import unicodedata
+from typing import Any, Dict
+from langdetect import detect, detect_langs, DetectorFactory
 from langdetect.lang_detect_exception import LangDetectException
 
+# Deterministic langdetect results for the same input
+DetectorFactory.seed = 0
+
+# Letters used by Vietnamese but not by English or other common Latin-script languages
+# (ă đ ĩ ũ ơ ư and the Latin Extended Additional block: ạ ả ấ ầ ... ỹ)
+VIETNAMESE_ONLY_PATTERN = re.compile('[\u0102\u0103\u0110\u0111\u0128\u0129\u0168\u0169\u01A0\u01A1\u01AF\u01B0\u1EA0-\u1EF9]')
+# Accented vowels Vietnamese shares with French, Spanish, Portuguese...
+SHARED_ACCENT_PATTERN = re.compile(r'[àáâãèéêìíòóôõùúýÀÁÂÃÈÉÊÌÍÒÓÔÕÙÚÝ]')
+
+# Vietnamese typed without diacritics ("quan an ngon o quan 1"): common syllables with the tones
+# stripped, and the subset that is not also an English word or part of a place / dish name, of
+# which at least one must appear so English queries naming Vietnamese places or dishes stay English
+UNACCENTED_VIETNAMESE_SYLLABLES = frozenset('''
+    an ba bai ban banh bao ben bien bo bui bun ca cac canh cha che chi cho choi chua chuyen co com
+    cong cua da dac dau day de dem den dep di dia diem dinh do doc duc duoc duong em ga gan gi gia
+    gio ha hai hang heo hem ho hoi hue khach khong khu kien la lap lau long luc luu mau may mi minh
+    mo mon mot mua muon nam nang ngay nghi ngoai ngon nguoi nha nhat nhieu nhung niem nao noi nuoc
+    nuong o oc pho phong qua quan re sai sam san sang sao song sua tai tam tang tay thanh tham thi
+    thit tho tinh toi tom tot tra tre trong truc tu va ve vien voi vui xem yen
+'''.split())
+UNACCENTED_VIETNAMESE_MARKERS = frozenset('''
+    cac cho choi chua cua dau dep duoc gan gi khach khong mon muon nao ngon nguoi nha nhat nhieu
+    nhung o quan tho tinh vien voi vui
+'''.split())
+MIN_UNACCENTED_VIETNAMESE_SHARE = 0.6
+
+HANGUL_PATTERN = re.compile('[\u1100-\u11FF\u3130-\u318F\uAC00-\uD7AF]')
+KANA_PATTERN = re.compile('[\u3040-\u30FF\u31F0-\u31FF\uFF66-\uFF9F]')
+HAN_PATTERN = re.compile('[\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF]')
+
+LANGDETECT_LANGUAGES = {'vi': 'vietnamese', 'en': 'english'}
+MIN_WORDS_FOR_UNSUPPORTED = 3
+UNSUPPORTED_PROBABILITY = 0.9
+
+
 class LanguageDetector:
     def detect_language(self, text):
         try:
             return detect(text)
         except LangDetectException:
-            return 'en'  # Default to English if detection fails 
\ No newline at end of file
+            return 'en'  # Default to English if detection fails
+
+
+def _result(language: str, confidence: float, method: str, is_supported: bool = True) -> Dict[str, Any]:
+    return {
+        'language': language,
+        'confidence': round(confidence, 3),
+        'is_supported': is_supported,
+        'detection_method': method
+    }
+
+
+def _top_langdetect(text: str):
+    """Most probable langdetect language and its probability (None, 0.0 if it cannot decide)"""
+    try:
+        candidates = detect_langs(text)
+    except LangDetectException:
+        return None, 0.0
+    if not candidates:
+        return None, 0.0
+    return candidates[0].lang, candidates[0].prob
+
+
+def _is_unaccented_vietnamese(text: str) -> bool:
+    """ASCII text made mostly of Vietnamese syllables, with at least one unambiguous one"""
+    if not text.isascii():
+        return False
+    words = re.findall(r'[a-z]+', text.lower())
+    if len(words) < 2 or not UNACCENTED_VIETNAMESE_MARKERS.intersection(words):
+        return False
+    syllables = sum(1 for word in words if word in UNACCENTED_VIETNAMESE_SYLLABLES)
+    return syllables / len(words) >= MIN_UNACCENTED_VIETNAMESE_SHARE
+
+
+def detect_script_language(text: str) -> Dict[str, Any]:
+    """
+    Detect which of the five supported languages (Vietnamese, English, Chinese, Japanese, Korean)
+    a question is written in, without any network call.
+
+    Hangul, kana and Han characters decide Korean, Japanese and Chinese (Latin place names inside
+    CJK text are ignored). Latin text with Vietnamese-only letters, or unaccented text made of
+    common Vietnamese syllables, is Vietnamese; the rest is resolved with langdetect, defaulting
+    to English.
+
+    Args:
+        text (str): Text to detect
+
+    Returns:
+        dict: language, confidence, is_supported and detection_method, the same shape as the
+            previous OpenAI-based detection
+    """
+    text = unicodedata.normalize('NFC', text or '').strip()
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return _result('english', 0.5, 'default_fallback')
+
+    hangul = len(HANGUL_PATTERN.findall(text))
+    kana = len(KANA_PATTERN.findall(text))
+    han = len(HAN_PATTERN.findall(text))
+    latin = sum(1 for char in letters if 'LATIN' in unicodedata.name(char, ''))
+    other = len(letters) - hangul - kana - han - latin
+
+    # Korean, Japanese and Chinese are told apart by script; Japanese mixes kana with kanji
+    cjk = hangul + kana + han
+    if cjk and cjk >= other:
+        share = cjk / (cjk + latin + other)
+        confidence = 0.7 + 0.29 * share
+        if hangul >= kana + han:
+            return _result('korean', confidence, 'script')
+        if kana:
+            return _result('japanese', confidence, 'script')
+        return _result('chinese', confidence, 'script')
+
+    # Other scripts (Cyrillic, Thai, Arabic...) are not supported
+    if other > latin:
+        return _result('unknown', other / len(letters), 'script', is_supported=False)
+
+    if VIETNAMESE_ONLY_PATTERN.search(text):
+        return _result('vietnamese', 0.95, 'vietnamese_diacritics')
+    # langdetect rarely recognises Vietnamese without its diacritics
+    if _is_unaccented_vietnamese(text):
+        return _result('vietnamese', 0.8, 'vietnamese_unaccented')
+
+    language, probability = _top_langdetect(text)
+    if language in LANGDETECT_LANGUAGES:
+        return _result(LANGDETECT_LANGUAGES[language], probability, 'langdetect')
+
+    has_shared_accents = bool(SHARED_ACCENT_PATTERN.search(text))
+    has_foreign_letters = any(
+        not char.isascii() and 'LATIN' in unicodedata.name(char, '') and not SHARED_ACCENT_PATTERN.match(char)
+        for char in letters
+    )
+    # Only reject accented text langdetect is confident about; short unaccented English queries
+    # are often misclassified by langdetect, so they stay English
+    if (
+        language is not None
+        and (has_shared_accents or has_foreign_letters)
+        and probability >= UNSUPPORTED_PROBABILITY
+        and len(text.split()) >= MIN_WORDS_FOR_UNSUPPORTED
+    ):
+        return _result('unknown', probability, 'langdetect', is_supported=False)
+    if has_shared_accents:
+        return _result('vietnamese', 0.7, 'vietnamese_diacritics')
+    return _result('english', 0.6, 'latin_default')
@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import closing
+from typing import Any, Dict, Generator, Optional
+import openai
+from src.config.config import Config
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Call sites wired through cached_chat_completion (names usable in LLM_CACHE_DISABLED_SITES;
+# the generative natural_response and chat_response sites are disabled by default)
+INTENT_EXTRACTION_SITE = 'intent_extraction'
+NATURAL_RESPONSE_SITE = 'natural_response'
+CONVERSATION_TITLE_SITE = 'conversation_title'
+CHAT_RESPONSE_SITE = 'chat_response'
+
+
+def get_llm_cache_path() -> str:
+    """Path of the SQLite file backing the LLM response cache"""
+    workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    return Config.LLM_CACHE_PATH or os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'llm_cache.sqlite3')
+
+
+def make_request_key(request: Dict[str, Any]) -> str:
+    """
+    Hash a chat completion request (model, messages, tools, temperature and every other argument)
+
+    Args:
+        request (dict): Keyword arguments passed to openai.ChatCompletion.create
+
+    Returns:
+        str: Hex sha256 of the canonical JSON of the request
+    """
+    text = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of OpenAI chat completion responses stored in SQLite, shared by every
+    worker process on the host. Entries expire after ttl_seconds; when the table grows past
+    max_entries the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                'key TEXT PRIMARY KEY, site TEXT, response TEXT NOT NULL, '
+                'created_at REAL NOT NULL, last_used_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used_at)')
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a cached response
+
+        Args:
+            key (str): Request key from make_request_key
+
+        Returns:
+            dict: The stored response, or None if missing or expired
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT response, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl_seconds:
+                conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                conn.commit()
+                row = None
+            if row is not None:
+                conn.execute('UPDATE llm_cache SET last_used_at = ? WHERE key = ?', (now, key))
+                conn.commit()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, response: Dict[str, Any], site: Optional[str] = None):
+        """Store a response and evict expired / least recently used entries past max_entries"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, site, response, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)',
+                (key, site, json.dumps(response, ensure_ascii=False), now, now)
+            )
+            conn.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+            conn.execute(
+                'DELETE FROM llm_cache WHERE key IN ('
+                'SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process and the number of stored entries"""
+        with closing(self._connect()) as conn:
+            size = conn.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': size,
+                'max_size': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+    def clear(self):
+        """Delete every stored response and reset the counters"""
+        with closing(self._connect()) as conn:
+            conn.execute('DELETE FROM llm_cache')
+            conn.commit()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+def is_cache_enabled(site: str) -> bool:
+    """Whether responses of a call site go through the cache (LLM_CACHE_ENABLED and not opted out)"""
+    disabled_sites = {name.strip() for name in Config.LLM_CACHE_DISABLED_SITES.split(',') if name.strip()}
+    return Config.LLM_CACHE_ENABLED and site not in disabled_sites
+
+
+def cached_chat_completion(site: str, **request):
+    """
+    openai.ChatCompletion.create with the persistent response cache in front of it
+
+    Args:
+        site (str): Name of the call site, used for the per-site opt-out
+        **request: Arguments for openai.ChatCompletion.create
+
+    Returns:
+        OpenAIObject: The API response (rebuilt from the cache on a hit)
+    """
+    if not is_cache_enabled(site):
+        return openai.ChatCompletion.create(**request)
+
+    key = make_request_key(request)
+    try:
+        cached = llm_response_cache.get(key)
+        if cached is not None:
+            logger.info(f"LLM cache hit for {site}")
+            return openai.util.convert_to_openai_object(cached)
+    except sqlite3.Error as e:
+        logger.error(f"LLM cache lookup failed: {str(e)}")
+
+    response = openai.ChatCompletion.create(**request)
+    try:
+        llm_response_cache.set(key, response, site)
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logger.error(f"LLM cache store failed: {str(e)}")
+    return response
+
+
+def stream_chat_completion(site: str, **request) -> Generator[str, None, Optional[str]]:
+    """
+    openai.ChatCompletion.create(stream=True) yielding content deltas as they arrive.
+    A cached response is yielded as a single delta; a stream that runs to completion is stored
+    in the shape of a non-streaming response, so both variants share cache entries.
+
+    Args:
+        site (str): Name of the call site, used for the per-site opt-out
+        **request: Arguments for openai.ChatCompletion.create (without stream)
+
+    Yields:
+        str: Content deltas
+
+    Returns:
+        Optional[str]: finish_reason of the completion (None if the stream ended without one)
+    """
+    use_cache = is_cache_enabled(site)
+    key = make_request_key(request) if use_cache else None
+    if use_cache:
+        try:
+            cached = llm_response_cache.get(key)
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache lookup failed: {str(e)}")
+            cached = None
+        if cached is not None:
+            logger.info(f"LLM cache hit for {site} (stream)")
+            content = cached['choices'][0]['message'].get('content') or ''
+            if content:
+                yield content
+            return cached['choices'][0].get('finish_reason')
+
+    parts = []
+    finish_reason = None
+    for chunk in openai.ChatCompletion.create(stream=True, **request):
+        choice = chunk['choices'][0]
+        finish_reason = choice.get('finish_reason') or finish_reason
+        delta = (choice.get('delta') or {}).get('content')
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    # A client that disconnects closes the generator before this point, so partial replies are never stored
+    if use_cache and finish_reason is not None:
+        response = {
+            'object': 'chat.completion',
+            'model': request.get('model'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': ''.join(parts)},
+                'finish_reason': finish_reason
+            }]
+        }
+        try:
+            llm_response_cache.set(key, response, site)
+        except sqlite3.Error as e:
+            logger.error(f"LLM cache store failed: {str(e)}")
+    return finish_reason
+
+
+# Global cache instance
+llm_response_cache = LLMResponseCache(
+    get_llm_cache_path(),
+    ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+    max_entries=Config.LLM_CACHE_MAX_ENTRIES
+)
@@ -1,8 +1,11 @@
 import openai
 import os
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, Iterator
 from langdetect import detect, LangDetectException
+from src.services.ai.llm_cache import (
+    cached_chat_completion, stream_chat_completion, CONVERSATION_TITLE_SITE, CHAT_RESPONSE_SITE
+)
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -115,7 +118,8 @@ class OpenAIService:
                 - "Weekend exploration of Saigon"
                 Return only the title text, no additional explanation."""
             
-            response = openai.ChatCompletion.create(
+            response = cached_chat_completion(
+                CONVERSATION_TITLE_SITE,
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -133,19 +137,27 @@ class OpenAIService:
             logger.error(f"Error generating title: {str(e)}")
             return "Travel Consultation" if language == 'en' else "Tư vấn du lịch"
     
-    def generate_response(self, message):
-        try:
-            # Detect language
+    def generate_response(self, message: str, language: Optional[str] = None) -> Dict[str, str]:
+        """
+        Generate the reply to a message. The conversation title is not generated here; callers
+        that need one use generate_title (see chatting_service.schedule_title_generation).
+
+        Args:
+            message (str): The user's message
+            language (str, optional): Language code from detect_language (detected when omitted)
+
+        Returns:
+            dict: text of the reply and the language it was generated for
+        """
+        if language is None:
             language = self.detect_language(message)
             logger.info(f"Detected language: {language}")
-            
-            # Generate title for the conversation
-            title = self.generate_title(message, language)
-            
+        try:
             # Get appropriate system prompt
             system_prompt = self.get_system_prompt(language)
             
-            response = openai.ChatCompletion.create(
+            response = cached_chat_completion(
+                CHAT_RESPONSE_SITE,
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -160,12 +172,36 @@ class OpenAIService:
             
             return {
                 'text': response_text,
-                'title': title
+                'language': language
             }
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
             error_message = f"Sorry, I encountered an error: {str(e)}" if language == 'en' else f"Xin lỗi, tôi đã gặp lỗi: {str(e)}"
             return {
                 'text': error_message,
-                'title': "Travel Consultation" if language == 'en' else "Tư vấn du lịch"
-            } 
\ No newline at end of file
+                'language': language
+            }
+
+    def stream_response(self, message: str, language: str) -> Iterator[str]:
+        """
+        Stream the reply to a message as OpenAI generates it (same prompt and parameters as
+        generate_response)
+
+        Args:
+            message (str): The user's message
+            language (str): Language code from detect_language
+
+        Yields:
+            str: Content deltas of the reply
+        """
+        system_prompt = self.get_system_prompt(language)
+        yield from stream_chat_completion(
+            CHAT_RESPONSE_SITE,
+            model="gpt-3.5-turbo",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": message}
+            ],
+            temperature=0.7,
+            max_tokens=2000
+        )
@@ -8,14 +8,92 @@ from src.services.travel_chatbot_service import (
     get_language_info,
     extract_user_intent_and_features,
     combined_search_with_filters,
-    create_chatbot_response
+    format_search_results,
+    create_chatbot_response,
+    stream_natural_response,
+    get_suggested_activities,
+    generate_follow_up_questions
 )
+from src.nlp_model.answer_cache import semantic_answer_cache
+from src.nlp_model.query_cache import query_embedding_cache
+from src.config.config import Config
 from src import db
 from datetime import datetime, timezone
 import os
 import json
 import openai
-from typing import Dict, List, Optional, Any
+from flask import current_app
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+# Pool dùng chung cho các bước độc lập của pipeline câu hỏi du lịch (mỗi câu hỏi gửi 3 task):
+# nhận diện ngôn ngữ, trích xuất thực thể (OpenAI) và encode câu hỏi không phụ thuộc nhau
+_pipeline_executor = ThreadPoolExecutor(max_workers=Config.CHAT_PIPELINE_WORKERS,
+                                        thread_name_prefix='travel-pipeline')
+
+def _stage_result(future, timeout: float, stage: str, fallback: Any) -> Any:
+    """
+    Chờ kết quả một bước của pipeline, dùng giá trị dự phòng khi hết thời gian hoặc lỗi
+    
+    Args:
+        future (Future): Task đã gửi vào pool
+        timeout (float): Thời gian chờ tối đa (giây)
+        stage (str): Tên bước (để log)
+        fallback (Any): Giá trị dùng thay kết quả
+        
+    Returns:
+        Any: Kết quả của bước hoặc fallback
+    """
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        print(f"{stage} timed out after {timeout}s, using fallback")
+    except Exception as e:
+        print(f"{stage} failed: {str(e)}, using fallback")
+    return fallback
+
+# Pool riêng cho việc sinh tiêu đề cuộc trò chuyện: chạy song song với câu trả lời,
+# không chiếm thread của pipeline câu hỏi du lịch
+_title_executor = ThreadPoolExecutor(max_workers=Config.TITLE_GENERATION_WORKERS,
+                                     thread_name_prefix='conversation-title')
+
+def _needs_title(conversation: Conversation) -> bool:
+    """Cuộc trò chuyện chưa có tiêu đề"""
+    return conversation.title is None or conversation.title.strip() == ""
+
+def schedule_title_generation(conversation_id: int, message_text: str, language: str):
+    """
+    Sinh tiêu đề cho cuộc trò chuyện ở nền (OpenAI) và cập nhật vào Conversation,
+    không chặn việc trả lời tin nhắn
+    
+    Args:
+        conversation_id (int): ID của cuộc trò chuyện
+        message_text (str): Tin nhắn đầu tiên của người dùng
+        language (str): Mã ngôn ngữ từ OpenAIService.detect_language
+        
+    Returns:
+        Future: Task sinh tiêu đề (kết quả là tiêu đề đã lưu hoặc None)
+    """
+    app = current_app._get_current_object()
+    return _title_executor.submit(_generate_conversation_title, app, conversation_id, message_text, language)
+
+def _generate_conversation_title(app, conversation_id: int, message_text: str, language: str) -> Optional[str]:
+    """Task chạy trên _title_executor: sinh tiêu đề và chỉ lưu nếu cuộc trò chuyện vẫn chưa có tiêu đề"""
+    with app.app_context():
+        try:
+            title = OpenAIService().generate_title(message_text, language)[:100]
+            # Cập nhật có điều kiện: không ghi đè tiêu đề đã được đặt trong lúc đang sinh
+            updated = Conversation.query.filter(
+                Conversation.conversation_id == conversation_id,
+                db.or_(Conversation.title.is_(None), db.func.trim(Conversation.title) == '')
+            ).update({'title': title}, synchronize_session=False)
+            db.session.commit()
+            return title if updated else None
+        except Exception as e:
+            db.session.rollback()
+            print(f"Title generation failed for conversation {conversation_id}: {str(e)}")
+            return None
 
 def is_travel_related_question(question: str) -> bool:
     """
@@ -233,128 +311,222 @@ def is_travel_related_question(question: str) -> bool:
     
     return False
 
-def process_travel_question(question: str) -> dict:
+def _prepare_travel_answer(question: str, user_location: Optional[Tuple[float, float]] = None) -> dict:
     """
-    Xử lý câu hỏi du lịch sử dụng travel chatbot service
+    Các bước trước khi sinh câu trả lời du lịch: nhận biết ngôn ngữ, cache câu trả lời,
+    trích xuất thực thể và tìm kiếm địa điểm
+
+    Args:
+        question (str): Câu hỏi của người dùng
+        user_location (Tuple[float, float], optional): (vĩ độ, kinh độ) để xếp hạng địa điểm theo khoảng cách
+
+    Returns:
+        dict: {'result': ...} khi đã có kết quả cuối cùng (ngôn ngữ không hỗ trợ, cache, tìm kiếm lỗi),
+            ngược lại là context để sinh câu trả lời
+    """
+    # Câu hỏi gần giống một câu đã trả lời (cùng ngôn ngữ) dùng lại kết quả đã cache.
+    # Kết quả xếp hạng theo vị trí người dùng không được cache.
+    use_answer_cache = Config.ANSWER_CACHE_ENABLED and user_location is None
+    
+    # Bước 1: Nhận biết ngôn ngữ và encode câu hỏi chạy song song. Trích xuất thực thể (gọi OpenAI)
+    # chỉ chạy cùng lúc khi không dùng cache câu trả lời, ngược lại đợi tới khi cache không có kết quả
+    language_future = _pipeline_executor.submit(detect_language, question)
+    embedding_future = _pipeline_executor.submit(query_embedding_cache.get_embedding, question)
+    extraction_future = None
+    if not use_answer_cache:
+        extraction_future = _pipeline_executor.submit(extract_user_intent_and_features, question)
+    
+    language_result = _stage_result(
+        language_future, Config.LANGUAGE_DETECTION_TIMEOUT, 'Language detection',
+        {'language': 'vietnamese', 'confidence': 0.0, 'is_supported': True, 'detection_method': 'timeout_fallback'}
+    )
+    
+    # Kiểm tra ngôn ngữ có được hỗ trợ không
+    if not language_result.get('is_supported', False):
+        if extraction_future is not None:
+            extraction_future.cancel()
+        lang_info = get_language_info('unknown')
+        return {'result': {
+            'success': False,
+            'response': lang_info['unsupported_message'],
+            'error': 'Unsupported language'
+        }}
+    
+    detected_language = language_result.get('language', 'vietnamese')
+    lang_info = get_language_info(detected_language)
+    
+    # Embedding câu hỏi dùng cho cả cache câu trả lời và tìm kiếm; hết thời gian thì encode lại khi cần
+    query_embedding = _stage_result(embedding_future, Config.QUERY_EMBEDDING_TIMEOUT, 'Query embedding', None)
+    
+    if use_answer_cache:
+        try:
+            cached_result = semantic_answer_cache.lookup(question, detected_language)
+            if cached_result is not None:
+                return {'result': cached_result}
+        except Exception as e:
+            print(f"Answer cache lookup failed: {str(e)}")
+        extraction_future = _pipeline_executor.submit(extract_user_intent_and_features, question)
     
+    # Bước 2: Thực thể và ý định (hết thời gian thì tìm kiếm không có bộ lọc)
+    extraction_result = _stage_result(
+        extraction_future, Config.INTENT_EXTRACTION_TIMEOUT, 'Intent extraction',
+        {'original_question': question, 'intent': 'error', 'confidence': 0.0, 'extracted_features': {}}
+    )
+    
+    # Bước 3: Thực hiện tìm kiếm kết hợp với bộ lọc
+    search_result = combined_search_with_filters(
+        question=question,
+        extracted_features=extraction_result.get('extracted_features', {}),
+        n_results=8,
+        language=detected_language,
+        user_location=user_location,
+        query_embedding=query_embedding
+    )
+    
+    # Kiểm tra kết quả tìm kiếm
+    if search_result.get('status') == 'error' or search_result.get('success') == False:
+        return {'result': {
+            'success': False,
+            'response': f"Xin lỗi, {search_result.get('message', 'Không tìm thấy thông tin phù hợp')}",
+            'error': search_result.get('message', 'Search failed')
+        }}
+    
+    # Format kết quả tìm kiếm (ngôn ngữ của địa điểm lấy từ metadata đã chuẩn hóa khi ingest)
+    formatted_results = format_search_results(search_result['results'], detected_language, limit=8)
+
+    return {
+        'question': question,
+        'language': detected_language,
+        'language_name': lang_info['name'],
+        'search_results': formatted_results,
+        'extracted_features': extraction_result.get('extracted_features', {}),
+        'search_method': search_result.get('search_method', 'unknown'),
+        'use_answer_cache': use_answer_cache
+    }
+
+def _finish_travel_answer(context: dict, response: str, suggested_activities: List[str],
+                          follow_up_questions: List[str], cacheable: bool) -> dict:
+    """
+    Tạo kết quả cuối của câu hỏi du lịch và lưu vào cache câu trả lời
+
+    Args:
+        context (dict): Context từ _prepare_travel_answer
+        response (str): Câu trả lời đã sinh
+        suggested_activities (List[str]): Gợi ý hoạt động
+        follow_up_questions (List[str]): Gợi ý câu hỏi tiếp theo
+        cacheable (bool): Câu trả lời được sinh thành công (không phải thông báo lỗi hay stream dở dang)
+
+    Returns:
+        dict: Kết quả xử lý với response và metadata
+    """
+    result = {
+        'success': True,
+        'response': response,
+        'language': context['language'],
+        'language_name': context['language_name'],
+        'search_results': context['search_results'],
+        'suggested_activities': suggested_activities,
+        'follow_up_questions': follow_up_questions,
+        'extracted_features': context['extracted_features'],
+        'search_method': context['search_method']
+    }
+
+    if context['use_answer_cache'] and cacheable and response:
+        try:
+            semantic_answer_cache.store(context['question'], context['language'], result)
+        except Exception as e:
+            print(f"Answer cache store failed: {str(e)}")
+
+    return result
+
+def process_travel_question(question: str, user_location: Optional[Tuple[float, float]] = None) -> dict:
+    """
+    Xử lý câu hỏi du lịch sử dụng travel chatbot service
+
     Args:
         question (str): Câu hỏi của người dùng
-        
+        user_location (Tuple[float, float], optional): (vĩ độ, kinh độ) để xếp hạng địa điểm theo khoảng cách
+
     Returns:
         dict: Kết quả xử lý với response và metadata
     """
     try:
-        # Bước 1: Nhận biết ngôn ngữ
-        language_result = detect_language(question)
-        
-        # Kiểm tra ngôn ngữ có được hỗ trợ không
-        if not language_result.get('is_supported', False):
-            lang_info = get_language_info('unknown')
-            return {
-                'success': False,
-                'response': lang_info['unsupported_message'],
-                'error': 'Unsupported language'
-            }
-        
-        detected_language = language_result.get('language', 'vietnamese')
-        lang_info = get_language_info(detected_language)
-        
-        # Bước 2: Trích xuất thực thể và ý định
-        extraction_result = extract_user_intent_and_features(question)
-        
-        # Bước 3: Thực hiện tìm kiếm kết hợp với bộ lọc
-        search_result = combined_search_with_filters(
-            question=question,
-            extracted_features=extraction_result.get('extracted_features', {}),
-            n_results=8
-        )
-        
-        # Kiểm tra kết quả tìm kiếm
-        if search_result.get('status') == 'error' or search_result.get('success') == False:
-            return {
-                'success': False,
-                'response': f"Xin lỗi, {search_result.get('message', 'Không tìm thấy thông tin phù hợp')}",
-                'error': search_result.get('message', 'Search failed')
-            }
-        
-        # Format kết quả tìm kiếm
-        formatted_results = []
-        for result in search_result['results']:
-            metadata = result.get('metadata', {})
-            distance = result.get('distance', 0)
-            
-            # Tính similarity score từ distance
-            similarity = 1 / (1 + distance) if distance > 0 else 0
-            
-            # Xác định ngôn ngữ của kết quả
-            result_language = 'unknown'
-            if metadata.get('mo_ta'):
-                mo_ta = metadata.get('mo_ta', '')
-                # Kiểm tra ngôn ngữ dựa trên ký tự
-                if any(char in mo_ta for char in ['は', 'が', 'を', 'に', 'へ', 'で', 'から', 'まで', 'の', 'と', 'や', 'も']):
-                    result_language = 'japanese'
-                elif any(char in mo_ta for char in ['은', '는', '이', '가', '을', '를', '의', '에', '에서', '로', '으로', '와', '과']):
-                    result_language = 'korean'
-                elif any(char in mo_ta for char in ['的', '是', '在', '有', '和', '与', '或', '但', '因为', '所以', '如果', '虽然']):
-                    result_language = 'chinese'
-                elif any(char in mo_ta for char in ['à', 'á', 'ạ', 'ả', 'ã', 'â', 'ầ', 'ấ', 'ậ', 'ẩ', 'ẫ', 'ă', 'ằ', 'ắ', 'ặ', 'ẳ', 'ẵ', 'è', 'é', 'ẹ', 'ẻ', 'ẽ', 'ê', 'ề', 'ế', 'ệ', 'ể', 'ễ', 'ì', 'í', 'ị', 'ỉ', 'ĩ', 'ò', 'ó', 'ọ', 'ỏ', 'õ', 'ô', 'ồ', 'ố', 'ộ', 'ổ', 'ỗ', 'ơ', 'ờ', 'ớ', 'ợ', 'ở', 'ỡ', 'ù', 'ú', 'ụ', 'ủ', 'ũ', 'ư', 'ừ', 'ứ', 'ự', 'ử', 'ữ', 'ỳ', 'ý', 'ỵ', 'ỷ', 'ỹ', 'đ']):
-                    result_language = 'vietnamese'
-                else:
-                    result_language = 'english'
-            
-            # Ưu tiên kết quả cùng ngôn ngữ với câu hỏi
-            language_boost = 0.3 if result_language == detected_language else 0.0
-            adjusted_similarity = min(similarity + language_boost, 1.0)
-            
-            formatted_result = {
-                'id': result.get('id', ''),
-                'ten_dia_diem': metadata.get('ten_dia_diem', ''),
-                'mo_ta': metadata.get('mo_ta', ''),
-                'loai_dia_diem': metadata.get('loai_dia_diem', ''),
-                'khu_vuc': metadata.get('khu_vuc', ''),
-                'dia_chi': metadata.get('dia_chi', ''),
-                'similarity': round(adjusted_similarity, 3),
-                'language': result_language
-            }
-            formatted_results.append(formatted_result)
-        
-        # Sắp xếp kết quả theo similarity và ưu tiên ngôn ngữ
-        formatted_results.sort(key=lambda x: (x['similarity'], x['language'] == detected_language), reverse=True)
-        
-        # Chỉ giữ lại kết quả có similarity > 0.1
-        formatted_results = [r for r in formatted_results if r['similarity'] > 0.1]
-        
-        # Ưu tiên kết quả cùng ngôn ngữ với câu hỏi
-        same_language_results = [r for r in formatted_results if r['language'] == detected_language]
-        other_language_results = [r for r in formatted_results if r['language'] != detected_language]
-        
-        if len(same_language_results) >= 3:
-            formatted_results = same_language_results[:8]
-        else:
-            formatted_results = same_language_results + other_language_results[:8-len(same_language_results)]
-        
+        context = _prepare_travel_answer(question, user_location)
+        if 'result' in context:
+            return context['result']
+
         # Bước 4: Tạo câu trả lời tự nhiên cho chatbot
         chatbot_response = create_chatbot_response(
             question=question,
-            search_results=formatted_results,
-            extracted_features=extraction_result.get('extracted_features', {}),
-            language=detected_language
+            search_results=context['search_results'],
+            extracted_features=context['extracted_features'],
+            language=context['language']
         )
-        
+
+        return _finish_travel_answer(
+            context,
+            chatbot_response.get('response', ''),
+            chatbot_response.get('suggested_activities', []),
+            chatbot_response.get('follow_up_questions', []),
+            cacheable=chatbot_response.get('status') == 'success'
+        )
+
+    except Exception as e:
         return {
-            'success': True,
-            'response': chatbot_response.get('response', ''),
-            'language': detected_language,
-            'language_name': lang_info['name'],
-            'search_results': formatted_results,
-            'suggested_activities': chatbot_response.get('suggested_activities', []),
-            'follow_up_questions': chatbot_response.get('follow_up_questions', []),
-            'extracted_features': extraction_result.get('extracted_features', {}),
-            'search_method': search_result.get('search_method', 'unknown')
+            'success': False,
+            'response': f'Xin lỗi, có lỗi xảy ra khi xử lý câu hỏi du lịch: {str(e)}',
+            'error': str(e)
         }
-        
+
+def _relay_deltas(stream: Iterator[str], parts: List[str]):
+    """Chuyển từng đoạn text của stream thành sự kiện ('delta', text), trả về giá trị return của stream"""
+    while True:
+        try:
+            delta = next(stream)
+        except StopIteration as stop:
+            return stop.value
+        parts.append(delta)
+        yield 'delta', delta
+
+def stream_travel_question(question: str, user_location: Optional[Tuple[float, float]] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Xử lý câu hỏi du lịch và stream câu trả lời ngay khi OpenAI sinh ra
+
+    Args:
+        question (str): Câu hỏi của người dùng
+        user_location (Tuple[float, float], optional): (vĩ độ, kinh độ) để xếp hạng địa điểm theo khoảng cách
+
+    Yields:
+        Tuple[str, Any]: ('delta', đoạn text) trong lúc sinh câu trả lời, cuối cùng là ('result', kết quả)
+            cùng định dạng với process_travel_question
+    """
+    try:
+        context = _prepare_travel_answer(question, user_location)
+        if 'result' in context:
+            yield 'result', context['result']
+            return
+
+        # Bước 4: Stream câu trả lời tự nhiên
+        parts = []
+        finish_reason = yield from _relay_deltas(stream_natural_response(
+            question=question,
+            search_results=context['search_results'],
+            extracted_features=context['extracted_features'],
+            language=context['language']
+        ), parts)
+
+        suggested_activities = get_suggested_activities(context['search_results']) if context['search_results'] else []
+        yield 'result', _finish_travel_answer(
+            context,
+            ''.join(parts),
+            suggested_activities,
+            generate_follow_up_questions(context['language'], context['extracted_features']),
+            # Chỉ cache stream kết thúc bình thường (không bị cắt vì max_tokens hay bộ lọc nội dung)
+            cacheable=finish_reason == 'stop'
+        )
+
     except Exception as e:
-        return {
+        yield 'result', {
             'success': False,
             'response': f'Xin lỗi, có lỗi xảy ra khi xử lý câu hỏi du lịch: {str(e)}',
             'error': str(e)
@@ -504,20 +676,14 @@ def save_message(conversation_id: int, sender: str, message_text: str, translate
             try:
                 # Initialize OpenAI service
                 openai_service = OpenAIService()
+                language = openai_service.detect_language(message_text)
                 
-                # Get AI response
-                ai_response = openai_service.generate_response(message_text)
-                # print(f"AI generated title: {ai_response['title']}")
+                # Tiêu đề chỉ sinh khi chưa có, ở nền song song với câu trả lời
+                if _needs_title(conversation):
+                    schedule_title_generation(conversation_id, message_text, language)
                 
-                # Check if conversation needs a title
-                if conversation.title is None or conversation.title.strip() == "":
-                    conversation.title = ai_response['title']
-                    # print(f"Setting new conversation title: {conversation.title}")
-                    # Commit title update separately
-                    db.session.commit()
-                    db.session.refresh(conversation)
-                # else:
-                #     # print(f"Conversation already has title: {conversation.title}")
+                # Get AI response
+                ai_response = openai_service.generate_response(message_text, language)
                 
                 # Save AI response as a new message
                 bot_message = Message(
@@ -598,8 +764,20 @@ def save_message(conversation_id: int, sender: str, message_text: str, translate
         db.session.rollback()
         return False, str(e)
 
+def _generate_openai_reply(conversation: Conversation, message_text: str) -> str:
+    """
+    Câu trả lời từ OpenAI service cho câu hỏi không phải du lịch (hoặc khi xử lý du lịch thất bại);
+    tiêu đề được sinh ở nền nếu cuộc trò chuyện chưa có
+    """
+    openai_service = OpenAIService()
+    language = openai_service.detect_language(message_text)
+    if _needs_title(conversation):
+        schedule_title_generation(conversation.conversation_id, message_text, language)
+    return openai_service.generate_response(message_text, language)['text']
+
 def save_message_update(conversation_id: int, sender: str, message_text: str, translated_text: str = None, 
-                message_type: str = 'text', voice_url: str = None, places: list = None):
+                message_type: str = 'text', voice_url: str = None, places: list = None,
+                user_location: Optional[Tuple[float, float]] = None):
     """
     Save a new message update to the database and get AI response if message is from user
     
@@ -611,6 +789,7 @@ def save_message_update(conversation_id: int, sender: str, message_text: str, tr
         message_type (str, optional): Type of the message (default: text)
         voice_url (str, optional): URL of the voice message if any
         places (list, optional): List of place names mentioned in the message
+        user_location (tuple, optional): (latitude, longitude) of the user, used to rank places by distance
         
     Returns:
         tuple: (success: bool, result: dict or str)
@@ -643,7 +822,7 @@ def save_message_update(conversation_id: int, sender: str, message_text: str, tr
                 if is_travel_related_question(message_text):
                     print("✅ Câu hỏi liên quan đến du lịch")
                     # Thử xử lý câu hỏi du lịch
-                    travel_result = process_travel_question(message_text)
+                    travel_result = process_travel_question(message_text, user_location=user_location)
                     
                     if travel_result['success']:
                         # Nếu xử lý du lịch thành công, sử dụng kết quả đó
@@ -667,23 +846,19 @@ def save_message_update(conversation_id: int, sender: str, message_text: str, tr
                     else:
                         # Nếu xử lý du lịch thất bại, fallback về OpenAI
                         print("❌ xử lý du lịch thất bại")
-                        openai_service = OpenAIService()
-                        ai_response = openai_service.generate_response(message_text)
-                        ai_response_text = ai_response['text']
-                        ai_response_title = ai_response['title']
+                        ai_response_text = _generate_openai_reply(conversation, message_text)
+                        ai_response_title = None
                         travel_result = {'success': False}
                 else:
                     print("✅ Câu hỏi không liên quan đến du lịch")
                     # Nếu không phải câu hỏi du lịch, sử dụng OpenAI service
-                    openai_service = OpenAIService()
-                    ai_response = openai_service.generate_response(message_text)
-                    ai_response_text = ai_response['text']
-                    ai_response_title = ai_response['title']
+                    ai_response_text = _generate_openai_reply(conversation, message_text)
+                    ai_response_title = None
                     travel_result = {'success': False}
                 
-                # Check if conversation needs a title
-                if conversation.title is None or conversation.title.strip() == "":
-                    conversation.title = ai_response_title if 'ai_response_title' in locals() else "Cuộc trò chuyện mới"
+                # Câu trả lời du lịch có sẵn tiêu đề; câu trả lời OpenAI thì tiêu đề đang được sinh ở nền
+                if ai_response_title and _needs_title(conversation):
+                    conversation.title = ai_response_title
                     # Commit title update separately
                     db.session.commit()
                     db.session.refresh(conversation)
@@ -777,6 +952,154 @@ def save_message_update(conversation_id: int, sender: str, message_text: str, tr
         db.session.rollback()
         return False, str(e)
 
+def _message_payload(message: Message, places: list = None) -> dict:
+    """Serialize a message the way save_message_update returns it"""
+    return {
+        "message_id": message.message_id,
+        "conversation_id": message.conversation_id,
+        "sender": message.sender,
+        "message_text": message.message_text,
+        "translated_text": message.translated_text,
+        "message_type": message.message_type,
+        "voice_url": message.voice_url,
+        "sent_at": message.sent_at.isoformat() if message.sent_at else None,
+        "places": message.get_places() if places is None else places
+    }
+
+def stream_message_update(conversation_id: int, sender: str, message_text: str, translated_text: str = None,
+                          message_type: str = 'text', voice_url: str = None,
+                          user_location: Optional[Tuple[float, float]] = None):
+    """
+    Save a user message and stream the AI reply while it is generated. The bot message and its
+    places are saved once the reply is complete.
+    
+    Args:
+        conversation_id (int): ID of the conversation
+        sender (str): Sender of the message (must be user)
+        message_text (str): Content of the message
+        translated_text (str, optional): Translated text of the message
+        message_type (str, optional): Type of the message (default: text)
+        voice_url (str, optional): URL of the voice message if any
+        user_location (tuple, optional): (latitude, longitude) of the user, used to rank places by distance
+        
+    Returns:
+        tuple: (success: bool, result: generator of (event, data) or error str). Events are
+            user_message, delta ({'text'}), then done (same data as save_message_update) or error.
+    """
+    try:
+        conversation = Conversation.query.get(conversation_id)
+        if not conversation:
+            return False, "Conversation not found"
+        if sender != "user":
+            return False, "Only user messages can be streamed"
+    except Exception as e:
+        return False, str(e)
+    
+    return True, _stream_message_reply(conversation, message_text, translated_text, message_type,
+                                       voice_url, user_location)
+
+def _stream_message_reply(conversation: Conversation, message_text: str, translated_text: str,
+                          message_type: str, voice_url: str,
+                          user_location: Optional[Tuple[float, float]]) -> Iterator[Tuple[str, dict]]:
+    """Generator behind stream_message_update"""
+    new_message = Message(
+        conversation_id=conversation.conversation_id,
+        sender="user",
+        message_text=message_text,
+        translated_text=translated_text,
+        message_type=message_type,
+        voice_url=voice_url,
+        sent_at=datetime.now(timezone.utc)
+    )
+    db.session.add(new_message)
+    db.session.commit()
+    db.session.refresh(new_message)
+    user_payload = _message_payload(new_message, [])  # User message không có places
+    yield 'user_message', user_payload
+    
+    parts = []
+    travel_result = {'success': False}
+    ai_response_title = None
+    try:
+        if is_travel_related_question(message_text):
+            print("✅ Câu hỏi liên quan đến du lịch")
+            for event, data in stream_travel_question(message_text, user_location=user_location):
+                if event == 'delta':
+                    parts.append(data)
+                    yield 'delta', {'text': data}
+                else:
+                    travel_result = data
+            
+            if travel_result.get('success'):
+                print(f"✅ xử lý du lịch thành công")
+                if not parts:
+                    # Câu trả lời lấy từ cache: gửi cả câu trả lời trong một lần
+                    parts.append(travel_result.get('response', ''))
+                    yield 'delta', {'text': parts[0]}
+                if travel_result.get('search_results'):
+                    first_result = travel_result['search_results'][0]
+                    ai_response_title = f"Tư vấn du lịch: {first_result.get('ten_dia_diem', 'Địa điểm')}"
+                else:
+                    ai_response_title = "Tư vấn du lịch"
+            elif parts:
+                # Stream đã gửi một phần câu trả lời rồi mới lỗi: không thể chuyển sang câu trả lời khác
+                raise RuntimeError(travel_result.get('error', 'Travel answer failed'))
+            else:
+                print("❌ xử lý du lịch thất bại")
+        
+        if not travel_result.get('success'):
+            # Không phải câu hỏi du lịch hoặc xử lý du lịch thất bại: stream câu trả lời từ OpenAI service
+            openai_service = OpenAIService()
+            language = openai_service.detect_language(message_text)
+            if _needs_title(conversation):
+                # Tiêu đề sinh ở nền song song với stream câu trả lời
+                schedule_title_generation(conversation.conversation_id, message_text, language)
+            for delta in openai_service.stream_response(message_text, language):
+                parts.append(delta)
+                yield 'delta', {'text': delta}
+            travel_result = {'success': False}
+        
+        # Câu trả lời du lịch có sẵn tiêu đề; câu trả lời OpenAI thì tiêu đề đang được sinh ở nền
+        if ai_response_title and _needs_title(conversation):
+            conversation.title = ai_response_title
+        
+        # Save AI response as a new message once the stream is complete
+        bot_message = Message(
+            conversation_id=conversation.conversation_id,
+            sender="bot",
+            message_text=''.join(parts),
+            message_type='text',
+            sent_at=datetime.now(timezone.utc)
+        )
+        
+        # Chỉ lưu places cho bot message, không lưu cho user message
+        if travel_result.get('success') and travel_result.get('search_results'):
+            bot_message.translated_text = travel_result.get('language')
+            bot_places = []
+            for result in travel_result['search_results']:
+                place_name = result.get('ten_dia_diem', '')
+                if place_name and place_name not in bot_places:
+                    bot_places.append(place_name)
+            if bot_places:
+                bot_message.set_places(_clean_places_list(bot_places))
+        
+        db.session.add(bot_message)
+        db.session.commit()
+        db.session.refresh(bot_message)
+        
+        yield 'done', {
+            "user_message": user_payload,
+            "bot_message": _message_payload(bot_message),
+            "travel_data": travel_result if travel_result.get('success') else None
+        }
+    except Exception as e:
+        # If AI response fails, the user message is already saved
+        db.session.rollback()
+        yield 'error', {
+            "user_message": user_payload,
+            "error": f"Failed to get AI response: {str(e)}"
+        }
+
 def end_conversation(conversation_id: int):
     """
     End a conversation by setting its ended_at timestamp
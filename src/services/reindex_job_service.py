@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from src.nlp_model.vector_store import get_chroma_db_path
+from src.nlp_model.process_diadiem import process_diadiem
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+JOB_COLUMNS = (
+    'job_id', 'status', 'created_at', 'started_at', 'finished_at', 'processed', 'total',
+    'docs_per_second', 'elapsed_seconds', 'eta_seconds', 'error', 'summary', 'cancel_requested', 'owner'
+)
+
+
+def get_reindex_jobs_path() -> str:
+    """SQLite file of the re-index job registry, next to the ChromaDB directory"""
+    return os.path.join(os.path.dirname(get_chroma_db_path()), 'reindex_jobs.sqlite3')
+
+
+class ReindexCancelled(Exception):
+    """Raised from the progress / cancel callbacks to abort a running sync"""
+
+
+class ReindexJobBusy(Exception):
+    """Raised when a re-index job is already queued or running"""
+
+    def __init__(self, job: Dict[str, Any]):
+        super().__init__(f"Re-index job {job['job_id']} is already {job['status']}")
+        self.job = job
+
+
+class ReindexJobManager:
+    """
+    Runs diadiem.csv syncs in a dedicated worker thread, one job at a time across all
+    worker processes. Jobs are stored in SQLite, so any worker can report progress or
+    cancel a job started by another one.
+    Progress comes from the ingest pipeline callback; cancelling sets a flag that is
+    checked after every encoded batch and between the build phases of the sync (up to the
+    pointer switch), so the half-built collection is dropped and the active index version
+    keeps serving.
+    """
+
+    def __init__(self, path: str, history_size: int = 20):
+        self.path = path
+        self.history_size = history_size
+        self.thread = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Autocommit; start_job opens its own write transaction
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS reindex_jobs ('
+                'job_id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at TEXT NOT NULL, '
+                'started_at TEXT, finished_at TEXT, processed INTEGER NOT NULL DEFAULT 0, total INTEGER, '
+                'docs_per_second REAL NOT NULL DEFAULT 0, elapsed_seconds REAL NOT NULL DEFAULT 0, '
+                'eta_seconds REAL, error TEXT, summary TEXT, cancel_requested INTEGER NOT NULL DEFAULT 0, '
+                'owner TEXT)'
+            )
+            self._initialized = True
+        return conn
+
+    def _select(self, conn: sqlite3.Connection, where: str = '', params=(), limit: Optional[int] = None):
+        query = f"SELECT {', '.join(JOB_COLUMNS)} FROM reindex_jobs {where} ORDER BY created_at DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return [self._to_job(row) for row in conn.execute(query, params).fetchall()]
+
+    @staticmethod
+    def _to_job(row) -> Dict[str, Any]:
+        job = dict(zip(JOB_COLUMNS, row))
+        job['summary'] = json.loads(job['summary']) if job['summary'] else None
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        return job
+
+    def _fail_orphaned_jobs(self, conn: sqlite3.Connection):
+        """Mark unfinished jobs whose worker process on this host has exited as failed"""
+        host = socket.gethostname()
+        for job in self._select(conn, 'WHERE status IN (?, ?)', (JOB_QUEUED, JOB_RUNNING)):
+            owner_host, _, pid = (job['owner'] or '').rpartition(':')
+            if owner_host != host or not pid.isdigit():
+                continue
+            try:
+                os.kill(int(pid), 0)
+                continue
+            except PermissionError:
+                continue
+            except OSError:
+                pass
+            conn.execute(
+                'UPDATE reindex_jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ? AND status IN (?, ?)',
+                (JOB_FAILED, 'Worker process exited before the job finished', datetime.now().isoformat(),
+                 job['job_id'], JOB_QUEUED, JOB_RUNNING)
+            )
+
+    def start_job(self, csv_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Queue a sync and start it in a worker thread of this process
+
+        Args:
+            csv_path (str, optional): CSV file in diadiem.csv format (defaults to src/scape/diadiem.csv)
+
+        Returns:
+            dict: The new job
+
+        Raises:
+            ReindexJobBusy: If another job, in any worker process, has not finished yet
+        """
+        job_id = uuid.uuid4().hex
+        with closing(self._connect()) as conn:
+            # Write lock across processes: only one of two concurrent start_job calls sees no active job
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._fail_orphaned_jobs(conn)
+                active = self._select(conn, 'WHERE status IN (?, ?)', (JOB_QUEUED, JOB_RUNNING), limit=1)
+                if active:
+                    raise ReindexJobBusy(active[0])
+                conn.execute(
+                    'INSERT INTO reindex_jobs (job_id, status, created_at, owner) VALUES (?, ?, ?, ?)',
+                    (job_id, JOB_QUEUED, datetime.now().isoformat(), self.owner)
+                )
+                conn.execute(
+                    'DELETE FROM reindex_jobs WHERE job_id NOT IN ('
+                    'SELECT job_id FROM reindex_jobs ORDER BY created_at DESC LIMIT ?)',
+                    (self.history_size,)
+                )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            job = self._select(conn, 'WHERE job_id = ?', (job_id,))[0]
+
+        self.thread = threading.Thread(target=self._run_job, args=(job_id, csv_path), daemon=True)
+        self.thread.start()
+        print(f"🔄 Re-index job {job_id} started")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by id (None if unknown or dropped from the history)"""
+        with closing(self._connect()) as conn:
+            self._fail_orphaned_jobs(conn)
+            jobs = self._select(conn, 'WHERE job_id = ?', (job_id,))
+        return jobs[0] if jobs else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Get recent jobs, newest first"""
+        with closing(self._connect()) as conn:
+            self._fail_orphaned_jobs(conn)
+            return self._select(conn, limit=self.history_size)
+
+    def cancel_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Request cancellation of a queued or running job
+
+        Args:
+            job_id (str): Job id returned by start_job
+
+        Returns:
+            dict: The job (None if unknown). Finished jobs are returned unchanged.
+        """
+        with closing(self._connect()) as conn:
+            updated = conn.execute(
+                'UPDATE reindex_jobs SET cancel_requested = 1 WHERE job_id = ? AND status IN (?, ?)',
+                (job_id, JOB_QUEUED, JOB_RUNNING)
+            ).rowcount
+            jobs = self._select(conn, 'WHERE job_id = ?', (job_id,))
+        if updated:
+            print(f"🛑 Cancellation requested for re-index job {job_id}")
+        return jobs[0] if jobs else None
+
+    def _update(self, job_id: str, **fields):
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as conn:
+            conn.execute(f"UPDATE reindex_jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def _on_progress(self, job_id: str, progress: Dict[str, Any]):
+        """Progress callback of the ingest pipeline (runs in the worker thread)"""
+        remaining = (progress['total'] or 0) - progress['processed']
+        eta_seconds = None
+        if progress['docs_per_second'] > 0 and remaining >= 0:
+            eta_seconds = remaining / progress['docs_per_second']
+        self._update(
+            job_id,
+            processed=progress['processed'],
+            total=progress['total'],
+            docs_per_second=progress['docs_per_second'],
+            elapsed_seconds=progress['elapsed_seconds'],
+            eta_seconds=eta_seconds
+        )
+        self._check_cancelled(job_id)
+
+    def _check_cancelled(self, job_id: str):
+        """Cancel check passed to process_diadiem (runs in the worker thread)"""
+        with closing(self._connect()) as conn:
+            row = conn.execute('SELECT cancel_requested FROM reindex_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is not None and row[0]:
+            raise ReindexCancelled(f"Re-index job {job_id} was cancelled")
+
+    def _run_job(self, job_id: str, csv_path: Optional[str]):
+        """Worker thread body: run the sync and record its outcome"""
+        try:
+            self._check_cancelled(job_id)
+        except ReindexCancelled:
+            self._update(job_id, status=JOB_CANCELLED, finished_at=datetime.now().isoformat())
+            return
+        self._update(job_id, status=JOB_RUNNING, started_at=datetime.now().isoformat())
+
+        started_at = time.perf_counter()
+        status, summary, error = JOB_SUCCEEDED, None, None
+        try:
+            summary = process_diadiem(
+                progress_callback=lambda progress: self._on_progress(job_id, progress),
+                csv_path=csv_path,
+                cancel_check=lambda: self._check_cancelled(job_id)
+            )
+        except ReindexCancelled:
+            status = JOB_CANCELLED
+        except Exception as e:
+            status, error = JOB_FAILED, str(e)
+            print(f"❌ Re-index job {job_id} failed: {e}")
+
+        elapsed_seconds = time.perf_counter() - started_at
+        outcome = {
+            'status': status,
+            'summary': json.dumps(summary) if summary is not None else None,
+            'error': error,
+            'finished_at': datetime.now().isoformat(),
+            'elapsed_seconds': elapsed_seconds,
+            'eta_seconds': 0.0 if status == JOB_SUCCEEDED else None
+        }
+        if summary is not None and self.get_job(job_id)['total'] is None:
+            # Nothing had to be re-encoded, so the pipeline never reported progress
+            outcome['total'] = 0
+        self._update(job_id, **outcome)
+        print(f"🔄 Re-index job {job_id} {status} in {elapsed_seconds:.1f}s")
+
+
+# Global job manager instance (the registry is shared by every worker process)
+reindex_job_manager = ReindexJobManager(get_reindex_jobs_path())
@@ -1,40 +1,28 @@
 import os
 import json
 import openai
-from typing import Dict, List, Optional, Any
-import chromadb
-from chromadb.utils import embedding_functions
+from typing import Dict, Generator, List, Optional, Any, Tuple
 import numpy as np
 import re
 import traceback
+from src.nlp_model.vector_store import get_collection
+from src.nlp_model.query_cache import query_embedding_cache
+from src.nlp_model.filter_fields import build_where_clause, normalize_language
+from src.nlp_model.search_backends import get_search_backend
+from src.nlp_model.keyword_index import get_keyword_index, reciprocal_rank_fusion
+from src.nlp_model.geo import apply_geo_ranking, blend_geo_score
+from src.services.ai.language_detector import detect_script_language
+from src.services.ai.llm_cache import (
+    cached_chat_completion, stream_chat_completion, INTENT_EXTRACTION_SITE, NATURAL_RESPONSE_SITE
+)
+from src.config.config import Config
 
 # Khởi tạo OpenAI client
 openai.api_key = os.getenv('OPENAI_API_KEY')
 
-# Khởi tạo ChromaDB client
-workspace_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-chroma_client = chromadb.PersistentClient(path=os.path.join(workspace_root, 'src', 'nlp_model', 'data', 'chroma_db'))
-
-# Sử dụng sentence-transformers làm embedding function
-sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="paraphrase-multilingual-MiniLM-L12-v2"
-)
-
 def get_or_create_collection():
-    """Get existing collection or create new one if not exists"""
-    try:
-        collection = chroma_client.get_collection(
-            name="diadiem_collection",
-            embedding_function=sentence_transformer_ef
-        )
-        return collection
-    except Exception as e:
-        print(f"Collection not found, creating new one: {str(e)}")
-        collection = chroma_client.create_collection(
-            name="diadiem_collection",
-            embedding_function=sentence_transformer_ef
-        )
-        return collection
+    """Get the active collection, creating an empty one only before the first sync"""
+    return get_collection(create_if_missing=True)
 
 def normalize_similarity(distance):
     """
@@ -65,148 +53,205 @@ def calculate_semantic_score(distance, question_words, metadata):
     
     return min(semantic_score, 1.0)
 
-def apply_filters_to_results(results: List[Dict], filters: Dict[str, Any]) -> List[Dict]:
+def query_results_to_list(semantic_results: Dict[str, Any], query_index: int) -> List[Dict]:
     """
-    Áp dụng bộ lọc vào kết quả tìm kiếm
+    Chuyển kết quả collection.query của một câu hỏi sang danh sách dict
     
     Args:
-        results (List[Dict]): Danh sách kết quả từ tìm kiếm vector
-        filters (Dict[str, Any]): Các tiêu chí lọc từ thực thể trích xuất
+        semantic_results (Dict[str, Any]): Kết quả trả về từ collection.query
+        query_index (int): Vị trí của câu hỏi trong lô truy vấn
         
     Returns:
-        List[Dict]: Kết quả đã được lọc
+        List[Dict]: Danh sách kết quả gồm id, metadata, document, distance
     """
-    if not filters:
-        return results
+    results = []
+    for i in range(len(semantic_results['ids'][query_index])):
+        results.append({
+            'id': semantic_results['ids'][query_index][i],
+            'metadata': semantic_results['metadatas'][query_index][i],
+            'document': semantic_results['documents'][query_index][i],
+            'distance': semantic_results['distances'][query_index][i]
+        })
+    return results
+
+def search_by_embeddings(collection, query_embeddings: List[List[float]],
+                         where_clauses: List[Optional[Dict[str, Any]]], n_results: int,
+                         count: int) -> List[Dict[str, Any]]:
+    """
+    Tìm kiếm vector với bộ lọc được đẩy xuống ChromaDB (mệnh đề where).
+    Các câu hỏi có cùng mệnh đề where được gộp vào một lần query; nếu bộ lọc trả về
+    ít hơn n_results thì bổ sung bằng kết quả không lọc để luôn đủ n_results.
     
-    print("=== DEBUG: apply_filters_to_results ===")
-    print(f"Input filters: {filters}")
-    print(f"Input results count: {len(results)}")
+    Args:
+        collection: Collection ChromaDB hoặc backend tìm kiếm cùng API
+        query_embeddings (List[List[float]]): Embedding của các câu hỏi
+        where_clauses (List[Optional[Dict[str, Any]]]): Mệnh đề where cho từng câu hỏi
+        n_results (int): Số lượng kết quả cho mỗi câu hỏi
+        count (int): Tổng số document trong collection
+        
+    Returns:
+        List[Dict[str, Any]]: Kết quả cho từng câu hỏi gồm results, total_found (số kết quả khớp bộ lọc,
+            tối đa n_results), filters_applied
+    """
+    include = ["metadatas", "documents", "distances"]
+    outputs = [None] * len(query_embeddings)
     
-    filtered_results = []
+    # Nhóm câu hỏi theo mệnh đề where
+    groups = {}
+    for index, where in enumerate(where_clauses):
+        key = json.dumps(where, sort_keys=True, ensure_ascii=False) if where else ''
+        groups.setdefault(key, (where, []))[1].append(index)
     
-    for result in results:
-        metadata = result.get('metadata', {})
-        match_score = 0
-        total_criteria = 0
-        
-        # Lọc theo loại địa điểm (nếu có)
-        if filters.get('loai_dia_diem'):
-            total_criteria += 1
-            target_loai = filters['loai_dia_diem'].lower()
-            
-            # Kiểm tra trong các trường có thể chứa loại địa điểm
-            loai_fields = [
-                metadata.get('loai_dia_diem', '').lower(),
-                metadata.get('category', '').lower(),
-                metadata.get('type', '').lower()
-            ]
-            
-            # Tìm kiếm lỏng hơn - chỉ cần chứa từ khóa
-            if any(target_loai in field for field in loai_fields if field):
-                match_score += 1
-                print(f"✓ Loại địa điểm match: {target_loai} in {loai_fields}")
-            else:
-                print(f"✗ Loại địa điểm no match: {target_loai} vs {loai_fields}")
-        
-        # Lọc theo khu vực (nếu có)
-        if filters.get('khu_vuc'):
-            total_criteria += 1
-            target_khu_vuc = filters['khu_vuc'].lower()
-            
-            # Kiểm tra trong các trường có thể chứa khu vực
-            khu_vuc_fields = [
-                metadata.get('khu_vuc', '').lower(),
-                metadata.get('district', '').lower(),
-                metadata.get('area', '').lower(),
-                metadata.get('location', '').lower()
-            ]
-            
-            # Tìm kiếm lỏng hơn
-            if any(target_khu_vuc in field for field in khu_vuc_fields if field):
-                match_score += 1
-                print(f"✓ Khu vực match: {target_khu_vuc} in {khu_vuc_fields}")
-            else:
-                print(f"✗ Khu vực no match: {target_khu_vuc} vs {khu_vuc_fields}")
-        
-        # Lọc theo từ khóa (nếu có)
-        if filters.get('tu_khoa'):
-            total_criteria += 1
-            target_keywords = filters['tu_khoa'].lower().split()
-            
-            # Kiểm tra trong tất cả các trường text
-            text_fields = [
-                metadata.get('ten_dia_diem', ''),
-                metadata.get('mo_ta', ''),
-                metadata.get('name', ''),
-                metadata.get('description', ''),
-                metadata.get('title', ''),
-                metadata.get('content', '')
-            ]
-            
-            all_text = ' '.join(text_fields).lower()
-            keyword_matches = sum(1 for keyword in target_keywords if keyword in all_text)
-            
-            # Chỉ cần match ít nhất 1 từ khóa
-            if keyword_matches > 0:
-                match_score += 1
-                print(f"✓ Từ khóa match: {keyword_matches}/{len(target_keywords)} keywords")
-            else:
-                print(f"✗ Từ khóa no match: {target_keywords}")
-        
-        # Lọc theo giá (nếu có)
-        if filters.get('gia'):
-            total_criteria += 1
-            target_gia = filters['gia'].lower()
-            
-            gia_fields = [
-                metadata.get('gia', '').lower(),
-                metadata.get('price', '').lower(),
-                metadata.get('cost', '').lower()
+    needs_top_up = []
+    k = min(n_results, count)
+    for where, indexes in groups.values():
+        # Query có bộ lọc trả về tối đa số document khớp, nên không cần đếm trước
+        semantic_results = None
+        if k > 0:
+            semantic_results = collection.query(
+                query_embeddings=[query_embeddings[i] for i in indexes],
+                n_results=k,
+                where=where or None,
+                include=include
+            )
+        
+        for position, index in enumerate(indexes):
+            results = query_results_to_list(semantic_results, position) if semantic_results else []
+            if where:
+                for result in results:
+                    result['matched_filters'] = True
+            outputs[index] = {
+                'results': results,
+                'total_found': len(results),
+                'filters_applied': bool(where)
+            }
+            if len(results) < min(n_results, count):
+                needs_top_up.append(index)
+    
+    # Bổ sung kết quả không lọc cho các câu hỏi chưa đủ n_results
+    if needs_top_up:
+        top_up_results = collection.query(
+            query_embeddings=[query_embeddings[i] for i in needs_top_up],
+            n_results=min(n_results * 2, count),
+            include=include
+        )
+        for position, index in enumerate(needs_top_up):
+            output = outputs[index]
+            seen_ids = {result['id'] for result in output['results']}
+            extra_results = [
+                dict(result, matched_filters=False)
+                for result in query_results_to_list(top_up_results, position)
+                if result['id'] not in seen_ids
             ]
-            
-            if any(target_gia in field for field in gia_fields if field):
-                match_score += 1
-                print(f"✓ Giá match: {target_gia}")
-            else:
-                print(f"✗ Giá no match: {target_gia}")
-        
-        # Tính tỷ lệ match
-        if total_criteria > 0:
-            match_ratio = match_score / total_criteria
-            print(f"Match ratio: {match_score}/{total_criteria} = {match_ratio:.2f}")
-            
-            # Lỏng hơn: chỉ cần match ít nhất 50% tiêu chí
-            if match_ratio >= 0.5:
-                filtered_results.append(result)
-                print(f"✓ Accepted: {metadata.get('ten_dia_diem', 'Unknown')}")
-            else:
-                print(f"✗ Rejected: {metadata.get('ten_dia_diem', 'Unknown')}")
-        else:
-            # Nếu không có tiêu chí nào, chấp nhận tất cả
-            filtered_results.append(result)
+            output['results'] = output['results'] + extra_results[:n_results - len(output['results'])]
     
-    print(f"Filtered results count: {len(filtered_results)}")
-    print("=== END DEBUG ===")
+    return outputs
+
+def fuse_keyword_results(collection, questions: List[str], query_embeddings: List[List[float]],
+                         where_clauses: List[Optional[Dict[str, Any]]], outputs: List[Dict[str, Any]],
+                         n_results: int) -> List[Dict[str, Any]]:
+    """
+    Gộp xếp hạng BM25 (index từ khóa) với xếp hạng vector bằng Reciprocal Rank Fusion.
+    Địa điểm chỉ có trong kết quả BM25 được lấy từ backend (một lần get cho cả lô)
+    và tính khoảng cách vector để các bước sau vẫn dùng được distance.
     
-    return filtered_results
+    Args:
+        collection: Backend tìm kiếm
+        questions (List[str]): Các câu hỏi
+        query_embeddings (List[List[float]]): Embedding của các câu hỏi
+        where_clauses (List[Optional[Dict[str, Any]]]): Mệnh đề where cho từng câu hỏi
+        outputs (List[Dict[str, Any]]): Kết quả vector từ search_by_embeddings
+        n_results (int): Số lượng kết quả cho mỗi câu hỏi
+        
+    Returns:
+        List[Dict[str, Any]]: outputs với results đã được gộp và sắp xếp lại theo điểm RRF
+    """
+    keyword_index = get_keyword_index()
+    keyword_hits = [
+        keyword_index.search(question, top_k=n_results, where=where)
+        for question, where in zip(questions, where_clauses)
+    ]
+    
+    # Lấy một lần các địa điểm chỉ xuất hiện trong kết quả BM25
+    missing_ids = set()
+    for output, hits in zip(outputs, keyword_hits):
+        vector_ids = {result['id'] for result in output['results']}
+        missing_ids.update(doc_id for doc_id, _ in hits if doc_id not in vector_ids)
+    fetched = {}
+    if missing_ids:
+        data = collection.get(ids=list(missing_ids), include=['metadatas', 'documents', 'embeddings'])
+        for i, doc_id in enumerate(data['ids']):
+            fetched[doc_id] = (data['metadatas'][i], data['documents'][i], data['embeddings'][i])
+    
+    for output, hits, query_embedding, where in zip(outputs, keyword_hits, query_embeddings, where_clauses):
+        results_by_id = {result['id']: result for result in output['results']}
+        keyword_scores = dict(hits)
+        
+        extra_ids = [doc_id for doc_id, _ in hits if doc_id not in results_by_id and doc_id in fetched]
+        distances = collection.distances(query_embedding, [fetched[doc_id][2] for doc_id in extra_ids])
+        for doc_id, distance in zip(extra_ids, distances):
+            metadata, document, _ = fetched[doc_id]
+            result = {'id': doc_id, 'metadata': metadata, 'document': document, 'distance': distance}
+            if where:
+                result['matched_filters'] = True
+            results_by_id[doc_id] = result
+        
+        fused = reciprocal_rank_fusion(
+            [[result['id'] for result in output['results']], [doc_id for doc_id, _ in hits]],
+            k=Config.RRF_K
+        )
+        for doc_id, result in results_by_id.items():
+            result['rrf_score'] = fused.get(doc_id, 0.0)
+            result['keyword_score'] = keyword_scores.get(doc_id, 0.0)
+        
+        # Kết quả khớp bộ lọc luôn đứng trước kết quả bổ sung không lọc
+        ranked = sorted(
+            results_by_id.values(),
+            key=lambda result: (result.get('matched_filters', True), result['rrf_score']),
+            reverse=True
+        )
+        output['results'] = ranked[:n_results]
+    
+    return outputs
+
+def apply_hybrid_ranking(collection, questions: List[str], query_embeddings: List[List[float]],
+                         where_clauses: List[Optional[Dict[str, Any]]], outputs: List[Dict[str, Any]],
+                         n_results: int) -> List[Dict[str, Any]]:
+    """
+    Gộp kết quả BM25 vào kết quả vector nếu HYBRID_SEARCH_ENABLED bật.
+    Lỗi của index từ khóa không làm hỏng tìm kiếm: khi đó giữ nguyên kết quả vector.
+    """
+    if not Config.HYBRID_SEARCH_ENABLED:
+        return outputs
+    try:
+        return fuse_keyword_results(collection, questions, query_embeddings, where_clauses, outputs, n_results)
+    except Exception as e:
+        print(f"Keyword index unavailable, using vector results only: {str(e)}")
+        return outputs
 
 def combined_search_with_filters(question: str, extracted_features: Dict[str, Any], 
-                                n_results: int = 10) -> Dict[str, Any]:
+                                n_results: int = 10, language: Optional[str] = None,
+                                user_location: Optional[Tuple[float, float]] = None,
+                                query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
     """
-    Thực hiện tìm kiếm kết hợp: tìm kiếm ngữ nghĩa + bộ lọc
+    Thực hiện tìm kiếm kết hợp: tìm kiếm ngữ nghĩa + BM25 (gộp bằng RRF) + bộ lọc metadata
     
     Args:
         question (str): Câu hỏi của người dùng
         extracted_features (Dict[str, Any]): Thực thể đã trích xuất
         n_results (int): Số lượng kết quả tối đa
+        language (str, optional): Ưu tiên địa điểm của ngôn ngữ này (lọc theo metadata language,
+            bổ sung bằng kết quả ngôn ngữ khác nếu không đủ)
+        user_location (Tuple[float, float], optional): (vĩ độ, kinh độ) của người dùng; khi có,
+            lấy thêm ứng viên rồi xếp hạng lại theo độ liên quan kết hợp khoảng cách
+        query_embedding (List[float], optional): Embedding câu hỏi đã encode sẵn (mặc định encode qua cache)
         
     Returns:
         Dict[str, Any]: Kết quả tìm kiếm kết hợp
     """
     try:
-        # Lấy collection
-        collection = get_or_create_collection()
+        # Lấy backend tìm kiếm (ChromaDB hoặc NumPy theo cấu hình)
+        collection = get_search_backend()
         
         # Kiểm tra collection có dữ liệu không
         count = collection.count()
@@ -217,59 +262,39 @@ def combined_search_with_filters(question: str, extracted_features: Dict[str, An
                 "results": []
             }
         
+        # Chuyển loai_dia_diem / khu_vuc / gia thành mệnh đề where
+        where = build_where_clause(extracted_features, language=language)
+        
         print(f"=== DEBUG: combined_search_with_filters ===")
         print(f"Question: {question}")
         print(f"Extracted features: {extracted_features}")
+        print(f"Where clause: {where}")
         print(f"Total documents in collection: {count}")
         
-        # Lấy filters từ extracted_features
-        filters = extracted_features.get('filters', {})
+        # Lấy embedding câu hỏi qua cache để không encode lại câu hỏi lặp lại
+        if query_embedding is None:
+            query_embedding = query_embedding_cache.get_embedding(question)
         
-        # Thực hiện tìm kiếm ngữ nghĩa với câu hỏi gốc
-        print(f"Performing semantic search with question: {question}")
-        semantic_results = collection.query(
-            query_texts=[question],
-            n_results=min(n_results * 3, count),  # Lấy nhiều hơn để có thể lọc
-            include=["metadatas", "documents", "distances"]
-        )
+        # Có vị trí người dùng: lấy nhiều ứng viên hơn để địa điểm gần nhưng xếp hạng thấp hơn vẫn được xét
+        candidates = n_results * max(Config.GEO_CANDIDATE_FACTOR, 1) if user_location else n_results
         
-        print(f"Semantic search returned {len(semantic_results['ids'][0])} results")
+        outputs = search_by_embeddings(collection, [query_embedding], [where], candidates, count)
+        output = apply_hybrid_ranking(collection, [question], [query_embedding], [where], outputs, candidates)[0]
         
-        # Chuyển đổi kết quả sang format dễ xử lý
-        results = []
-        for i in range(len(semantic_results['ids'][0])):
-            result = {
-                'id': semantic_results['ids'][0][i],
-                'metadata': semantic_results['metadatas'][0][i],
-                'document': semantic_results['documents'][0][i],
-                'distance': semantic_results['distances'][0][i]
-            }
-            results.append(result)
-        
-        print(f"First few results distances: {[r['distance'] for r in results[:5]]}")
-        
-        # Áp dụng bộ lọc nếu có
-        if filters:
-            print(f"Applying filters: {filters}")
-            filtered_results = apply_filters_to_results(results, filters)
-            print(f"After filtering: {len(filtered_results)} results")
-        else:
-            filtered_results = results
-            print("No filters applied")
+        if user_location:
+            output['results'] = apply_geo_ranking(
+                output['results'], user_location, Config.GEO_RANKING_WEIGHT, Config.GEO_DISTANCE_SCALE_KM
+            )[:n_results]
+            print(f"Geo ranking applied around {user_location}")
         
-        # Sắp xếp theo khoảng cách (gần nhất trước)
-        filtered_results.sort(key=lambda x: x['distance'])
-        
-        # Giới hạn số lượng kết quả
-        final_results = filtered_results[:n_results]
-        
-        print(f"Final results count: {len(final_results)}")
+        print(f"Final results count: {len(output['results'])} (matched filters: {output['total_found']})")
         
         return {
             "success": True,
-            "results": final_results,
-            "total_found": len(filtered_results),
-            "filters_applied": bool(filters)
+            "results": output['results'],
+            "total_found": output['total_found'],
+            "filters_applied": output['filters_applied'],
+            "applied_filters": where or {}
         }
         
     except Exception as e:
@@ -280,6 +305,131 @@ def combined_search_with_filters(question: str, extracted_features: Dict[str, An
             "results": []
         }
 
+def combined_search_batch(questions: List[str], extracted_features_list: Optional[List[Dict[str, Any]]] = None,
+                          n_results: int = 10, language: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Tìm kiếm cho nhiều câu hỏi cùng lúc: encode tất cả câu hỏi trong một lần gọi model
+    và gửi một truy vấn nhiều câu hỏi tới ChromaDB cho mỗi nhóm bộ lọc
+    
+    Args:
+        questions (List[str]): Danh sách câu hỏi
+        extracted_features_list (List[Dict[str, Any]], optional): Thực thể trích xuất cho từng câu hỏi
+        n_results (int): Số lượng kết quả tối đa cho mỗi câu hỏi
+        language (str, optional): Ưu tiên địa điểm của ngôn ngữ này cho tất cả câu hỏi
+        
+    Returns:
+        List[Dict[str, Any]]: Kết quả cho từng câu hỏi, cùng format với combined_search_with_filters
+    """
+    if not questions:
+        return []
+    
+    if extracted_features_list is None:
+        extracted_features_list = [{} for _ in questions]
+    
+    try:
+        collection = get_search_backend()
+        
+        count = collection.count()
+        if count == 0:
+            return [{
+                "success": False,
+                "message": "Không có dữ liệu trong cơ sở dữ liệu",
+                "results": []
+            } for _ in questions]
+        
+        print(f"=== DEBUG: combined_search_batch ===")
+        print(f"Questions: {len(questions)}")
+        
+        # Encode các câu hỏi chưa có trong cache trong một lần gọi model
+        query_embeddings = query_embedding_cache.get_embeddings(questions)
+        where_clauses = [build_where_clause(features or {}, language=language) for features in extracted_features_list]
+        
+        outputs = search_by_embeddings(collection, query_embeddings, where_clauses, n_results, count)
+        outputs = apply_hybrid_ranking(collection, questions, query_embeddings, where_clauses, outputs, n_results)
+        
+        return [{
+            "success": True,
+            "results": output['results'],
+            "total_found": output['total_found'],
+            "filters_applied": output['filters_applied'],
+            "applied_filters": where or {}
+        } for output, where in zip(outputs, where_clauses)]
+        
+    except Exception as e:
+        print(f"Error in combined_search_batch: {str(e)}")
+        return [{
+            "success": False,
+            "message": f"Lỗi tìm kiếm: {str(e)}",
+            "results": []
+        } for _ in questions]
+
+def get_result_language(metadata: Dict[str, Any]) -> str:
+    """
+    Lấy ngôn ngữ của địa điểm từ metadata (trường language được chuẩn hóa khi ingest,
+    hoặc cột ngon_ngu với index cũ)
+    """
+    metadata = metadata or {}
+    language = metadata.get('language')
+    if language and language != 'unknown':
+        return language
+    return normalize_language(metadata.get('ngon_ngu')) or 'unknown'
+
+def format_search_results(results: List[Dict], detected_language: str, limit: int = 8) -> List[Dict]:
+    """
+    Chuyển kết quả tìm kiếm thành danh sách địa điểm trả về cho người dùng:
+    tính similarity từ distance, cộng điểm cho địa điểm cùng ngôn ngữ với câu hỏi (và kết hợp
+    độ gần nếu có vị trí người dùng), bỏ kết quả không liên quan và ưu tiên kết quả cùng ngôn ngữ
+    
+    Args:
+        results (List[Dict]): Kết quả từ combined_search_with_filters (id, metadata, distance)
+        detected_language (str): Ngôn ngữ của câu hỏi
+        limit (int): Số kết quả tối đa
+        
+    Returns:
+        List[Dict]: Danh sách địa điểm đã format và sắp xếp
+    """
+    formatted_results = []
+    for result in results:
+        metadata = result.get('metadata') or {}
+        distance = result.get('distance', 0)
+        
+        # Tính similarity score từ distance
+        similarity = 1 / (1 + distance) if distance > 0 else 0
+        
+        # Ưu tiên kết quả cùng ngôn ngữ với câu hỏi
+        result_language = get_result_language(metadata)
+        language_boost = 0.3 if result_language == detected_language else 0.0
+        adjusted_similarity = min(similarity + language_boost, 1.0)
+        
+        # Kết hợp độ gần nếu kết quả đã được xếp hạng theo vị trí người dùng
+        adjusted_similarity = blend_geo_score(adjusted_similarity, result.get('geo_proximity'), Config.GEO_RANKING_WEIGHT)
+        
+        formatted_results.append({
+            'id': result.get('id', ''),
+            'ten_dia_diem': metadata.get('ten_dia_diem', ''),
+            'mo_ta': metadata.get('mo_ta', ''),
+            'loai_dia_diem': metadata.get('loai_dia_diem', ''),
+            'khu_vuc': metadata.get('khu_vuc', ''),
+            'dia_chi': metadata.get('dia_chi', ''),
+            'similarity': round(adjusted_similarity, 3),
+            'language': result_language,
+            'distance_km': result.get('distance_km')
+        })
+    
+    # Sắp xếp kết quả theo similarity (cao nhất trước) và ưu tiên ngôn ngữ
+    formatted_results.sort(key=lambda x: (x['similarity'], x['language'] == detected_language), reverse=True)
+    
+    # Chỉ giữ lại kết quả có similarity > 0.1 để tránh kết quả không liên quan
+    formatted_results = [r for r in formatted_results if r['similarity'] > 0.1]
+    
+    # Nếu có đủ kết quả cùng ngôn ngữ thì chỉ trả về những kết quả đó,
+    # nếu không thì bổ sung thêm kết quả từ ngôn ngữ khác
+    same_language_results = [r for r in formatted_results if r['language'] == detected_language]
+    other_language_results = [r for r in formatted_results if r['language'] != detected_language]
+    if len(same_language_results) >= 3:
+        return same_language_results[:limit]
+    return same_language_results + other_language_results[:limit - len(same_language_results)]
+
 def extract_user_intent_and_features(question: str) -> Dict[str, Any]:
     """
     Trích xuất ý định và đặc trưng từ câu hỏi của người dùng sử dụng OpenAI API
@@ -342,7 +492,9 @@ Từ khóa tiếng Việt phổ biến:
 Hãy trích xuất chính xác các thông tin từ câu hỏi và trả về dưới dạng JSON."""
 
     try:
-        response = openai.ChatCompletion.create(
+        # Câu hỏi giống hệt cho cùng kết quả trích xuất: dùng cache phản hồi trên đĩa
+        response = cached_chat_completion(
+            INTENT_EXTRACTION_SITE,
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -467,158 +619,9 @@ def detect_language(text: str) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: Kết quả nhận biết ngôn ngữ
     """
-    try:
-        # Fallback detection bằng từ khóa trước khi gọi API
-        text_lower = text.lower().strip()
-        
-        # Từ khóa tiếng Anh phổ biến
-        english_keywords = [
-            'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-            'is', 'are', 'was', 'were', 'be', 'been', 'have', 'has', 'had', 'do', 'does', 'did',
-            'can', 'could', 'will', 'would', 'should', 'may', 'might', 'must',
-            'what', 'where', 'when', 'why', 'how', 'which', 'who', 'whom',
-            'museum', 'park', 'restaurant', 'hotel', 'shopping', 'tourist', 'visit', 'see',
-            'food', 'culture', 'history', 'architecture', 'beautiful', 'famous', 'popular'
-        ]
-        
-        # Từ khóa tiếng Trung phổ biến
-        chinese_keywords = ['的', '是', '在', '有', '和', '与', '或', '但', '因为', '所以', '如果', '虽然']
-        
-        # Từ khóa tiếng Hàn phổ biến
-        korean_keywords = ['은', '는', '이', '가', '을', '를', '의', '에', '에서', '로', '으로', '와', '과']
-        
-        # Từ khóa tiếng Nhật phổ biến
-        japanese_keywords = ['は', 'が', 'を', 'に', 'へ', 'で', 'から', 'まで', 'の', 'と', 'や', 'も']
-        
-        # Từ khóa tiếng Việt phổ biến
-        vietnamese_keywords = [
-            'của', 'và', 'hoặc', 'nhưng', 'trong', 'trên', 'dưới', 'đến', 'cho', 'về', 'với', 'bởi',
-            'là', 'có', 'được', 'bị', 'phải', 'cần', 'muốn', 'thích', 'ghét',
-            'gì', 'đâu', 'khi', 'tại sao', 'như thế nào', 'nào', 'ai', 'của ai',
-            'bảo tàng', 'công viên', 'nhà hàng', 'khách sạn', 'mua sắm', 'du lịch', 'thăm', 'xem',
-            'ẩm thực', 'văn hóa', 'lịch sử', 'kiến trúc', 'đẹp', 'nổi tiếng', 'phổ biến'
-        ]
-        
-        # Đếm từ khóa cho mỗi ngôn ngữ
-        english_count = sum(1 for word in text_lower.split() if word in english_keywords)
-        chinese_count = sum(1 for char in text_lower if char in chinese_keywords)
-        korean_count = sum(1 for char in text_lower if char in korean_keywords)
-        japanese_count = sum(1 for char in text_lower if char in japanese_keywords)
-        vietnamese_count = sum(1 for word in text_lower.split() if word in vietnamese_keywords)
-        
-        # Nếu có đủ từ khóa để xác định ngôn ngữ
-        if english_count >= 2 and english_count > max(chinese_count, korean_count, japanese_count, vietnamese_count):
-            return {
-                "language": "english",
-                "confidence": 0.8,
-                "is_supported": True,
-                "detection_method": "keyword_fallback"
-            }
-        elif chinese_count >= 2:
-            return {
-                "language": "chinese",
-                "confidence": 0.8,
-                "is_supported": True,
-                "detection_method": "keyword_fallback"
-            }
-        elif korean_count >= 2:
-            return {
-                "language": "korean",
-                "confidence": 0.8,
-                "is_supported": True,
-                "detection_method": "keyword_fallback"
-            }
-        elif japanese_count >= 2:
-            return {
-                "language": "japanese",
-                "confidence": 0.8,
-                "is_supported": True,
-                "detection_method": "keyword_fallback"
-            }
-        elif vietnamese_count >= 2:
-            return {
-                "language": "vietnamese",
-                "confidence": 0.8,
-                "is_supported": True,
-                "detection_method": "keyword_fallback"
-            }
-        
-        # Nếu không xác định được bằng từ khóa, gọi OpenAI API
-        response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """Bạn là một chuyên gia nhận biết ngôn ngữ. 
-                    Hãy phân tích văn bản và trả về ngôn ngữ chính xác.
-                    Chỉ hỗ trợ 5 ngôn ngữ: vietnamese, english, chinese, korean, japanese.
-                    Nếu không phải 5 ngôn ngữ này, trả về "unsupported".
-                    Trả về kết quả dưới dạng JSON với format:
-                    {
-                        "language": "tên_ngôn_ngữ",
-                        "confidence": 0.95,
-                        "is_supported": true/false
-                    }"""
-                },
-                {
-                    "role": "user",
-                    "content": f"Văn bản cần nhận biết: {text}"
-                }
-            ],
-            temperature=0.1
-        )
-        
-        # Parse kết quả JSON
-        result_text = response.choices[0].message.content
-        try:
-            result = json.loads(result_text)
-        except json.JSONDecodeError:
-            # Fallback nếu không parse được JSON
-            result = {
-                "language": "unknown",
-                "confidence": 0.0,
-                "is_supported": False
-            }
-        
-        # Đảm bảo có các trường cần thiết và chuẩn hóa ngôn ngữ
-        result.setdefault("language", "unknown")
-        result.setdefault("confidence", 0.0)
-        result.setdefault("is_supported", False)
-        result.setdefault("detection_method", "openai_api")
-        
-        # Chuẩn hóa tên ngôn ngữ về lowercase
-        if result["language"]:
-            result["language"] = result["language"].lower()
-        
-        return result
-        
-    except Exception as e:
-        # Fallback cuối cùng - giả sử là tiếng Việt nếu có dấu tiếng Việt
-        vietnamese_chars = ['à', 'á', 'ạ', 'ả', 'ã', 'â', 'ầ', 'ấ', 'ậ', 'ẩ', 'ẫ', 'ă', 'ằ', 'ắ', 'ặ', 'ẳ', 'ẵ',
-                           'è', 'é', 'ẹ', 'ẻ', 'ẽ', 'ê', 'ề', 'ế', 'ệ', 'ể', 'ễ',
-                           'ì', 'í', 'ị', 'ỉ', 'ĩ',
-                           'ò', 'ó', 'ọ', 'ỏ', 'õ', 'ô', 'ồ', 'ố', 'ộ', 'ổ', 'ỗ', 'ơ', 'ờ', 'ớ', 'ợ', 'ở', 'ỡ',
-                           'ù', 'ú', 'ụ', 'ủ', 'ũ', 'ư', 'ừ', 'ứ', 'ự', 'ử', 'ữ',
-                           'ỳ', 'ý', 'ỵ', 'ỷ', 'ỹ',
-                           'đ']
-        
-        has_vietnamese = any(char in text.lower() for char in vietnamese_chars)
-        
-        if has_vietnamese:
-            return {
-                "language": "vietnamese",
-                "confidence": 0.6,
-                "is_supported": True,
-                "detection_method": "vietnamese_chars_fallback"
-            }
-        else:
-            # Nếu không có dấu tiếng Việt, giả sử là tiếng Anh
-            return {
-                "language": "english",
-                "confidence": 0.5,
-                "is_supported": True,
-                "detection_method": "default_fallback"
-            }
+    # Nhận biết cục bộ theo bảng chữ (Hangul, kana, Hán tự, dấu tiếng Việt) và langdetect,
+    # không gọi OpenAI
+    return detect_script_language(text)
 
 def get_language_info(language: str) -> Dict[str, str]:
     """
@@ -664,11 +667,11 @@ def get_language_info(language: str) -> Dict[str, str]:
         "unsupported_message": "Sorry, this language is not supported."
     })
 
-def generate_natural_response(question: str, search_results: List[Dict], 
-                            extracted_features: Dict[str, Any], 
-                            language: str = "vietnamese") -> Dict[str, Any]:
+def build_natural_response_prompts(question: str, search_results: List[Dict],
+                                   extracted_features: Dict[str, Any],
+                                   language: str = "vietnamese") -> Tuple[str, str, Dict[str, str]]:
     """
-    Sinh câu trả lời tự nhiên cho chatbot hướng dẫn viên du lịch
+    Tạo system prompt / user prompt cho câu trả lời tự nhiên theo ngôn ngữ
     
     Args:
         question (str): Câu hỏi của người dùng
@@ -677,37 +680,28 @@ def generate_natural_response(question: str, search_results: List[Dict],
         language (str): Ngôn ngữ để trả lời
         
     Returns:
-        Dict[str, Any]: Câu trả lời tự nhiên
+        Tuple[str, str, Dict[str, str]]: (system prompt, user prompt, thông tin ngôn ngữ)
     """
-    try:
-        # Debug logging
-        print(f"=== DEBUG: generate_natural_response ===")
-        print(f"Input language: '{language}'")
-        print(f"Language type: {type(language)}")
-        print(f"Search results count: {len(search_results)}")
-        print(f"Search results type: {type(search_results)}")
-        print(f"Extracted features: {extracted_features}")
-        
-        # Chuẩn hóa ngôn ngữ về lowercase
-        language = language.lower().strip()
-        print(f"Normalized language: '{language}'")
-        
-        # Lấy thông tin ngôn ngữ
-        lang_info = get_language_info(language)
-        print(f"Language info: {lang_info}")
-        
-        # Chuẩn bị context cho GPT
-        context = {
-            "question": question,
-            "search_results": search_results,
-            "extracted_features": extracted_features,
-            "language": language,
-            "language_name": lang_info["name"]
-        }
-        
-        # Tạo prompt dựa trên ngôn ngữ
-        if language == "vietnamese":
-            system_prompt = """Bạn là một hướng dẫn viên du lịch thân thiện và chuyên nghiệp tại TP.HCM. 
+    # Chuẩn hóa ngôn ngữ về lowercase
+    language = language.lower().strip()
+    print(f"Normalized language: '{language}'")
+    
+    # Lấy thông tin ngôn ngữ
+    lang_info = get_language_info(language)
+    print(f"Language info: {lang_info}")
+    
+    # Chuẩn bị context cho GPT
+    context = {
+        "question": question,
+        "search_results": search_results,
+        "extracted_features": extracted_features,
+        "language": language,
+        "language_name": lang_info["name"]
+    }
+    
+    # Tạo prompt dựa trên ngôn ngữ
+    if language == "vietnamese":
+        system_prompt = """Bạn là một hướng dẫn viên du lịch thân thiện và chuyên nghiệp tại TP.HCM. 
             Hãy trả lời câu hỏi của khách du lịch một cách tự nhiên, thân thiện và hữu ích.
             
             Yêu cầu:
@@ -719,8 +713,8 @@ def generate_natural_response(question: str, search_results: List[Dict],
             6. Giữ độ dài câu trả lời vừa phải (150-300 từ)
             
             QUAN TRỌNG: Bạn PHẢI trả lời bằng tiếng Việt, không được trả lời bằng tiếng Anh."""
-            
-            user_prompt = f"""
+        
+        user_prompt = f"""
             Câu hỏi của khách: {question}
             
             Thông tin trích xuất:
@@ -730,9 +724,9 @@ def generate_natural_response(question: str, search_results: List[Dict],
             {json.dumps(search_results, ensure_ascii=False, indent=2)}
             
             QUAN TRỌNG: Hãy tạo câu trả lời tự nhiên và hữu ích bằng tiếng Việt. KHÔNG được trả lời bằng tiếng Anh."""
-            
-        elif language == "english":
-            system_prompt = """You are a friendly and professional travel guide in Ho Chi Minh City. 
+        
+    elif language == "english":
+        system_prompt = """You are a friendly and professional travel guide in Ho Chi Minh City. 
             Answer tourists' questions naturally, warmly, and helpfully.
             
             Requirements:
@@ -744,8 +738,8 @@ def generate_natural_response(question: str, search_results: List[Dict],
             6. Keep response length moderate (150-300 words)
             
             IMPORTANT: You MUST respond in English."""
-            
-            user_prompt = f"""
+        
+        user_prompt = f"""
             Tourist's question: {question}
             
             Extracted information:
@@ -755,9 +749,9 @@ def generate_natural_response(question: str, search_results: List[Dict],
             {json.dumps(search_results, ensure_ascii=False, indent=2)}
             
             IMPORTANT: Please create a natural and helpful response in English."""
-            
-        elif language == "chinese":
-            system_prompt = """您是胡志明市的一位友好、专业的旅游指南。
+        
+    elif language == "chinese":
+        system_prompt = """您是胡志明市的一位友好、专业的旅游指南。
             请以自然、热情和有用的方式回答游客的问题。
             
             要求：
@@ -769,8 +763,8 @@ def generate_natural_response(question: str, search_results: List[Dict],
             6. 保持回复长度适中（150-300字）
             
             重要：您必须用中文回复。"""
-            
-            user_prompt = f"""
+        
+        user_prompt = f"""
             游客的问题: {question}
             
             提取的信息:
@@ -780,9 +774,9 @@ def generate_natural_response(question: str, search_results: List[Dict],
             {json.dumps(search_results, ensure_ascii=False, indent=2)}
             
             重要：请用中文创建自然有用的回复。"""
-            
-        elif language == "korean":
-            system_prompt = """당신은 호치민시의 친근하고 전문적인 여행 가이드입니다.
+        
+    elif language == "korean":
+        system_prompt = """당신은 호치민시의 친근하고 전문적인 여행 가이드입니다.
             관광객의 질문에 자연스럽고, 따뜻하고, 도움이 되게 답변해 주세요.
             
             요구사항:
@@ -794,8 +788,8 @@ def generate_natural_response(question: str, search_results: List[Dict],
             6. 응답 길이를 적당히 유지 (150-300단어)
             
             중요: 한국어로 답변해야 합니다."""
-            
-            user_prompt = f"""
+        
+        user_prompt = f"""
             관광객의 질문: {question}
             
             추출된 정보:
@@ -805,9 +799,9 @@ def generate_natural_response(question: str, search_results: List[Dict],
             {json.dumps(search_results, ensure_ascii=False, indent=2)}
             
             중요: 한국어로 자연스럽고 유용한 답변을 만들어 주세요."""
-            
-        elif language == "japanese":
-            system_prompt = """あなたはホーチミン市の親しみやすく、プロフェッショナルな旅行ガイドです。
+        
+    elif language == "japanese":
+        system_prompt = """あなたはホーチミン市の親しみやすく、プロフェッショナルな旅行ガイドです。
             観光客の質問に自然で、温かく、役立つ方法で答えてください。
             
             要件：
@@ -819,8 +813,8 @@ def generate_natural_response(question: str, search_results: List[Dict],
             6. 応答の長さを適度に保つ（150-300語）
             
             重要：日本語で答えてください。"""
-            
-            user_prompt = f"""
+        
+        user_prompt = f"""
             観光客の質問: {question}
             
             抽出された情報:
@@ -830,11 +824,11 @@ def generate_natural_response(question: str, search_results: List[Dict],
             {json.dumps(search_results, ensure_ascii=False, indent=2)}
             
             重要：日本語で自然で有用な回答を作成してください。"""
-        
-        else:
-            print(f"WARNING: Unknown language '{language}', falling back to English")
-            system_prompt = """You are a friendly travel guide. Please respond in English."""
-            user_prompt = f"""
+    
+    else:
+        print(f"WARNING: Unknown language '{language}', falling back to English")
+        system_prompt = """You are a friendly travel guide. Please respond in English."""
+        user_prompt = f"""
             Tourist's question: {question}
             
             Extracted information:
@@ -844,13 +838,45 @@ def generate_natural_response(question: str, search_results: List[Dict],
             {json.dumps(search_results, ensure_ascii=False, indent=2)}
             
             Please create a natural and helpful response in English."""
+    
+    print(f"Selected language branch: '{language}'")
+    print(f"System prompt language instruction: {'Vietnamese' if language == 'vietnamese' else 'Other'}")
+    return system_prompt, user_prompt, lang_info
+
+def generate_natural_response(question: str, search_results: List[Dict], 
+                            extracted_features: Dict[str, Any], 
+                            language: str = "vietnamese") -> Dict[str, Any]:
+    """
+    Sinh câu trả lời tự nhiên cho chatbot hướng dẫn viên du lịch
+    
+    Args:
+        question (str): Câu hỏi của người dùng
+        search_results (List[Dict]): Kết quả tìm kiếm địa điểm
+        extracted_features (Dict[str, Any]): Thực thể đã trích xuất
+        language (str): Ngôn ngữ để trả lời
+        
+    Returns:
+        Dict[str, Any]: Câu trả lời tự nhiên
+    """
+    try:
+        # Debug logging
+        print(f"=== DEBUG: generate_natural_response ===")
+        print(f"Input language: '{language}'")
+        print(f"Language type: {type(language)}")
+        print(f"Search results count: {len(search_results)}")
+        print(f"Search results type: {type(search_results)}")
+        print(f"Extracted features: {extracted_features}")
+        
+        system_prompt, user_prompt, lang_info = build_natural_response_prompts(
+            question, search_results, extracted_features, language
+        )
+        language = language.lower().strip()
         
-        print(f"Selected language branch: '{language}'")
-        print(f"System prompt language instruction: {'Vietnamese' if language == 'vietnamese' else 'Other'}")
         print("About to call OpenAI API...")
         
-        # Gọi OpenAI API
-        response = openai.ChatCompletion.create(
+        # Gọi OpenAI API (qua cache phản hồi trên đĩa)
+        response = cached_chat_completion(
+            NATURAL_RESPONSE_SITE,
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -883,6 +909,44 @@ def generate_natural_response(question: str, search_results: List[Dict],
             "error": str(e)
         }
 
+def stream_natural_response(question: str, search_results: List[Dict],
+                            extracted_features: Dict[str, Any],
+                            language: str = "vietnamese") -> Generator[str, None, Optional[str]]:
+    """
+    Sinh câu trả lời tự nhiên dạng stream: trả về từng đoạn text ngay khi OpenAI sinh ra
+    (cùng prompt và tham số với generate_natural_response nên dùng chung cache phản hồi)
+    
+    Args:
+        question (str): Câu hỏi của người dùng
+        search_results (List[Dict]): Kết quả tìm kiếm địa điểm
+        extracted_features (Dict[str, Any]): Thực thể đã trích xuất
+        language (str): Ngôn ngữ để trả lời
+        
+    Yields:
+        str: Đoạn text tiếp theo của câu trả lời
+        
+    Returns:
+        Optional[str]: finish_reason của OpenAI ('stop' khi câu trả lời kết thúc bình thường)
+    """
+    system_prompt, user_prompt, _ = build_natural_response_prompts(
+        question, search_results, extracted_features, language
+    )
+    return (yield from stream_chat_completion(
+        NATURAL_RESPONSE_SITE,
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        temperature=0.7,
+        max_tokens=700
+    ))
+
+def get_suggested_activities(search_results: List[Dict]) -> List[str]:
+    """Tên tối đa 3 địa điểm có độ tương đồng cao để gợi ý hoạt động"""
+    high_similarity_results = [r for r in search_results if r.get('similarity', 0) > 0.6]
+    return [r['ten_dia_diem'] for r in high_similarity_results[:3]]
+
 def create_chatbot_response(question: str, search_results: List[Dict], 
                            extracted_features: Dict[str, Any], 
                            language: str = "vietnamese") -> Dict[str, Any]:
@@ -907,11 +971,7 @@ def create_chatbot_response(question: str, search_results: List[Dict],
     )
     
     # Tạo danh sách gợi ý hoạt động
-    suggested_activities = []
-    if search_results:
-        # Lấy tên các địa điểm có độ tương đồng cao
-        high_similarity_results = [r for r in search_results if r.get('similarity', 0) > 0.6]
-        suggested_activities = [r['ten_dia_diem'] for r in high_similarity_results[:3]]
+    suggested_activities = get_suggested_activities(search_results) if search_results else []
     
     # Tạo gợi ý câu hỏi tiếp theo
     follow_up_questions = generate_follow_up_questions(language, extracted_features)